@@ -57,6 +57,8 @@ INSERT OR IGNORE INTO coverage (country, vaccine, year, coverage) VALUES
 CREATE INDEX IF NOT EXISTS idx_cov_country ON coverage(country);
 CREATE INDEX IF NOT EXISTS idx_cov_vaccine ON coverage(vaccine);
 CREATE INDEX IF NOT EXISTS idx_cov_year    ON coverage(year);
+-- (coverage, rowid) lets coverage-sorted keyset pages seek instead of sort.
+CREATE INDEX IF NOT EXISTS idx_cov_coverage ON coverage(coverage);
 
 CREATE TABLE IF NOT EXISTS vaccine_info (
     vaccine_code TEXT PRIMARY KEY,
@@ -77,3 +79,98 @@ SELECT
     year,
     coverage
 FROM coverage;
+
+-- Global averages per (vaccine, year), maintained by triggers so compare
+-- lookups are a primary-key fetch instead of an AVG over `coverage`.
+CREATE TABLE IF NOT EXISTS coverage_agg (
+    vaccine  TEXT    NOT NULL,
+    year     INTEGER NOT NULL,
+    n        INTEGER NOT NULL,
+    sum      REAL    NOT NULL,
+    avg      REAL    NOT NULL,
+    min      REAL    NOT NULL,
+    max      REAL    NOT NULL,
+    PRIMARY KEY (vaccine, year)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_cov_vaccine_year ON coverage(vaccine, year);
+
+CREATE TRIGGER IF NOT EXISTS trg_coverage_agg_insert AFTER INSERT ON coverage
+BEGIN
+    INSERT INTO coverage_agg (vaccine, year, n, sum, avg, min, max)
+    VALUES (NEW.vaccine, NEW.year, 1, NEW.coverage, NEW.coverage, NEW.coverage, NEW.coverage)
+    ON CONFLICT(vaccine, year) DO UPDATE SET
+        n   = n + 1,
+        sum = sum + excluded.sum,
+        avg = (sum + excluded.sum) / (n + 1),
+        min = MIN(min, excluded.min),
+        max = MAX(max, excluded.max);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_coverage_agg_delete AFTER DELETE ON coverage
+BEGIN
+    DELETE FROM coverage_agg WHERE vaccine = OLD.vaccine AND year = OLD.year;
+    INSERT INTO coverage_agg (vaccine, year, n, sum, avg, min, max)
+    SELECT vaccine, year, COUNT(*), SUM(coverage), AVG(coverage), MIN(coverage), MAX(coverage)
+    FROM coverage WHERE vaccine = OLD.vaccine AND year = OLD.year
+    GROUP BY vaccine, year;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_coverage_agg_update AFTER UPDATE OF vaccine, year, coverage ON coverage
+BEGIN
+    DELETE FROM coverage_agg
+    WHERE (vaccine = OLD.vaccine AND year = OLD.year) OR (vaccine = NEW.vaccine AND year = NEW.year);
+    INSERT INTO coverage_agg (vaccine, year, n, sum, avg, min, max)
+    SELECT vaccine, year, COUNT(*), SUM(coverage), AVG(coverage), MIN(coverage), MAX(coverage)
+    FROM coverage
+    WHERE (vaccine = OLD.vaccine AND year = OLD.year) OR (vaccine = NEW.vaccine AND year = NEW.year)
+    GROUP BY vaccine, year;
+END;
+
+DELETE FROM coverage_agg;
+INSERT INTO coverage_agg (vaccine, year, n, sum, avg, min, max)
+SELECT vaccine, year, COUNT(*), SUM(coverage), AVG(coverage), MIN(coverage), MAX(coverage)
+FROM coverage
+GROUP BY vaccine, year;
+
+-- Data-version token for HTTP caching: bumped on every change to `coverage`.
+CREATE TABLE IF NOT EXISTS data_state (
+    id          INTEGER PRIMARY KEY CHECK (id = 1),
+    version     INTEGER NOT NULL,
+    updated_at  INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO data_state (id, version, updated_at)
+VALUES (1, 1, CAST(strftime('%s', 'now') AS INTEGER));
+
+CREATE TRIGGER IF NOT EXISTS trg_data_state_insert AFTER INSERT ON coverage
+BEGIN
+    UPDATE data_state SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_data_state_update AFTER UPDATE ON coverage
+BEGIN
+    UPDATE data_state SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_data_state_delete AFTER DELETE ON coverage
+BEGIN
+    UPDATE data_state SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = 1;
+END;
+
+-- Year-over-year coverage drops, one row per declining (country, vaccine, year).
+-- Filled by services/alerts.py after each ingest; thresholds are applied on read.
+CREATE TABLE IF NOT EXISTS coverage_alerts (
+    country        TEXT    NOT NULL,
+    vaccine        TEXT    NOT NULL,
+    year           INTEGER NOT NULL,
+    prev_year      INTEGER NOT NULL,
+    prev_coverage  REAL    NOT NULL,
+    coverage       REAL    NOT NULL,
+    drop_pp        REAL    NOT NULL,
+    region         TEXT,
+    PRIMARY KEY (country, vaccine, year)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_alerts_drop        ON coverage_alerts(drop_pp);
+CREATE INDEX IF NOT EXISTS idx_alerts_region_drop ON coverage_alerts(region, drop_pp);
@@ -0,0 +1,52 @@
+-- Latest point per (country, vaccine), kept current by triggers on `coverage`,
+-- so latest-only trends read one row per series instead of every year.
+CREATE TABLE IF NOT EXISTS coverage_latest (
+    country   TEXT    NOT NULL,
+    vaccine   TEXT    NOT NULL,
+    year      INTEGER NOT NULL,
+    coverage  REAL    NOT NULL,
+    PRIMARY KEY (country, vaccine)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_latest_vaccine_country_year ON coverage_latest(vaccine, country, year);
+
+-- A later year replaces the stored point; an earlier one leaves it alone.
+CREATE TRIGGER IF NOT EXISTS trg_coverage_latest_insert AFTER INSERT ON coverage
+BEGIN
+    INSERT INTO coverage_latest (country, vaccine, year, coverage)
+    VALUES (NEW.country, NEW.vaccine, NEW.year, NEW.coverage)
+    ON CONFLICT(country, vaccine) DO UPDATE SET
+        year     = excluded.year,
+        coverage = excluded.coverage
+    WHERE excluded.year >= coverage_latest.year;
+END;
+
+-- Updates and deletes recompute the affected series from the
+-- UNIQUE(country, vaccine, year) index. With MAX(), SQLite takes the bare
+-- `coverage` column from the row holding the maximum year.
+CREATE TRIGGER IF NOT EXISTS trg_coverage_latest_update AFTER UPDATE OF country, vaccine, year, coverage ON coverage
+BEGIN
+    DELETE FROM coverage_latest
+    WHERE (country = OLD.country AND vaccine = OLD.vaccine) OR (country = NEW.country AND vaccine = NEW.vaccine);
+    INSERT INTO coverage_latest (country, vaccine, year, coverage)
+    SELECT country, vaccine, MAX(year), coverage
+    FROM coverage
+    WHERE (country = OLD.country AND vaccine = OLD.vaccine) OR (country = NEW.country AND vaccine = NEW.vaccine)
+    GROUP BY country, vaccine;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_coverage_latest_delete AFTER DELETE ON coverage
+BEGIN
+    DELETE FROM coverage_latest WHERE country = OLD.country AND vaccine = OLD.vaccine;
+    INSERT INTO coverage_latest (country, vaccine, year, coverage)
+    SELECT country, vaccine, MAX(year), coverage
+    FROM coverage
+    WHERE country = OLD.country AND vaccine = OLD.vaccine
+    GROUP BY country, vaccine;
+END;
+
+DELETE FROM coverage_latest;
+INSERT INTO coverage_latest (country, vaccine, year, coverage)
+SELECT country, vaccine, MAX(year), coverage
+FROM coverage
+GROUP BY country, vaccine;
@@ -0,0 +1,83 @@
+-- Country dimension: region (as grouped in database.sql) and World Bank
+-- income group. Countries missing here roll up under 'Unassigned'.
+CREATE TABLE IF NOT EXISTS country_meta (
+    country       TEXT PRIMARY KEY,
+    region        TEXT NOT NULL,
+    income_group  TEXT NOT NULL
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO country_meta (country, region, income_group) VALUES
+-- Oceania
+('AUS', 'Oceania', 'High income'),
+('NZL', 'Oceania', 'High income'),
+-- Europe
+('GBR', 'Europe', 'High income'),
+('FRA', 'Europe', 'High income'),
+('DEU', 'Europe', 'High income'),
+('ITA', 'Europe', 'High income'),
+('ESP', 'Europe', 'High income'),
+('NLD', 'Europe', 'High income'),
+('SWE', 'Europe', 'High income'),
+('POL', 'Europe', 'High income'),
+('CHE', 'Europe', 'High income'),
+('BEL', 'Europe', 'High income'),
+('IRL', 'Europe', 'High income'),
+('PRT', 'Europe', 'High income'),
+('GRC', 'Europe', 'High income'),
+('NOR', 'Europe', 'High income'),
+('DNK', 'Europe', 'High income'),
+('AUT', 'Europe', 'High income'),
+-- Asia
+('JPN', 'Asia', 'High income'),
+('CHN', 'Asia', 'Upper middle income'),
+('IND', 'Asia', 'Lower middle income'),
+('KOR', 'Asia', 'High income'),
+('THA', 'Asia', 'Upper middle income'),
+('VNM', 'Asia', 'Lower middle income'),
+-- Americas
+('USA', 'Americas', 'High income'),
+('CAN', 'Americas', 'High income'),
+('BRA', 'Americas', 'Upper middle income'),
+('MEX', 'Americas', 'Upper middle income'),
+('ARG', 'Americas', 'Upper middle income'),
+('CHL', 'Americas', 'High income'),
+-- Africa & Middle East
+('ZAF', 'Africa & Middle East', 'Upper middle income'),
+('EGY', 'Africa & Middle East', 'Lower middle income'),
+('KEN', 'Africa & Middle East', 'Lower middle income'),
+('NGA', 'Africa & Middle East', 'Lower middle income'),
+('TUR', 'Africa & Middle East', 'Upper middle income'),
+('SAU', 'Africa & Middle East', 'High income'),
+('ISR', 'Africa & Middle East', 'High income');
+
+-- Rollup cube: one row per (dimension, group, vaccine, year), where dimension
+-- is 'region' or 'income'. Sums of squares give the standard deviation.
+-- Refreshed per vaccine after each ingest (services/aggregates.py).
+CREATE TABLE IF NOT EXISTS coverage_rollup (
+    dimension  TEXT    NOT NULL,
+    grp        TEXT    NOT NULL,
+    vaccine    TEXT    NOT NULL,
+    year       INTEGER NOT NULL,
+    n          INTEGER NOT NULL,
+    sum        REAL    NOT NULL,
+    sumsq      REAL    NOT NULL,
+    min        REAL    NOT NULL,
+    max        REAL    NOT NULL,
+    PRIMARY KEY (dimension, grp, vaccine, year)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_rollup_dimension_vaccine_year ON coverage_rollup(dimension, vaccine, year);
+
+DELETE FROM coverage_rollup;
+INSERT INTO coverage_rollup (dimension, grp, vaccine, year, n, sum, sumsq, min, max)
+SELECT 'region', COALESCE(m.region, 'Unassigned'), c.vaccine, c.year,
+       COUNT(*), SUM(c.coverage), SUM(c.coverage * c.coverage), MIN(c.coverage), MAX(c.coverage)
+FROM coverage c
+LEFT JOIN country_meta m ON m.country = c.country
+GROUP BY 2, c.vaccine, c.year;
+INSERT INTO coverage_rollup (dimension, grp, vaccine, year, n, sum, sumsq, min, max)
+SELECT 'income', COALESCE(m.income_group, 'Unassigned'), c.vaccine, c.year,
+       COUNT(*), SUM(c.coverage), SUM(c.coverage * c.coverage), MIN(c.coverage), MAX(c.coverage)
+FROM coverage c
+LEFT JOIN country_meta m ON m.country = c.country
+GROUP BY 2, c.vaccine, c.year;
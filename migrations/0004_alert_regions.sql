@@ -0,0 +1,20 @@
+-- Alerts take their region from country_meta (migration 0003) rather than a
+-- map in the code: rescan every series so stored regions come from the table.
+-- On a new database this is also the first alert backfill. The statement is
+-- the full rescan of services/alerts.py as of this version, kept here so the
+-- migration does not change when that module does.
+DELETE FROM coverage_alerts;
+
+INSERT INTO coverage_alerts
+    (country, vaccine, year, prev_year, prev_coverage, coverage, drop_pp, region)
+SELECT d.country, d.vaccine, d.year, d.prev_year, d.prev_coverage, d.coverage,
+       ROUND(d.prev_coverage - d.coverage, 4), m.region
+FROM (
+    SELECT c.country, c.vaccine, c.year, c.coverage,
+           LAG(c.year) OVER w AS prev_year,
+           LAG(c.coverage) OVER w AS prev_coverage
+    FROM coverage c
+    WINDOW w AS (PARTITION BY c.country, c.vaccine ORDER BY c.year)
+) d
+LEFT JOIN country_meta m ON m.country = d.country
+WHERE d.prev_coverage > d.coverage;
@@ -1,29 +1,81 @@
-from flask import Flask, jsonify, request
+import csv
+import hmac
+import io
+import json
+import os
+from contextlib import ExitStack
+
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 
 try:
     from vaccine_py.services.coverage import (
         init_db,
         get_filtered_data,
+        get_filtered_columns,
+        get_filtered_page,
+        iter_filtered_rows,
         compare_country,
+        compare_batch,
         get_trends,
-        ISO_TO_NAME,
+        get_aggregate,
+        get_rank,
+        pool_stats,
+        cache_stats,
+        pin_generations,
+        pin_snapshot,
+        snapshot_stats,
+        slow_queries,
+        reset_slow_queries,
+        resolve_country,
+        resolve_countries,
+        suggest_countries,
+        country_index,
     )
 except ImportError:
     from .services.coverage import (
         init_db,
         get_filtered_data,
+        get_filtered_columns,
+        get_filtered_page,
+        iter_filtered_rows,
         compare_country,
+        compare_batch,
         get_trends,
-        ISO_TO_NAME,
+        get_aggregate,
+        get_rank,
+        pool_stats,
+        cache_stats,
+        pin_generations,
+        pin_snapshot,
+        snapshot_stats,
+        slow_queries,
+        reset_slow_queries,
+        resolve_country,
+        resolve_countries,
+        suggest_countries,
+        country_index,
     )
 
-app = Flask(__name__)
+try:
+    from vaccine_py.services.alerts import DEFAULT_THRESHOLD, get_alerts
+except ImportError:
+    from .services.alerts import DEFAULT_THRESHOLD, get_alerts
 
-NAME_TO_ISO = {name.lower(): code for code, name in ISO_TO_NAME.items()}
+try:
+    from vaccine_py.httpcache import apply_default_policy, data_cached, prerender_pages, static_page
+    from vaccine_py.vendor import VENDOR_POLICY, bootstrap_tags, vendor_assets
+    from vaccine_py.compression import compress_response
+    from vaccine_py.httpmetrics import install as install_metrics, metrics_response
+except ImportError:
+    from .httpcache import apply_default_policy, data_cached, prerender_pages, static_page
+    from .vendor import VENDOR_POLICY, bootstrap_tags, vendor_assets
+    from .compression import compress_response
+    from .httpmetrics import install as install_metrics, metrics_response
+
+app = Flask(__name__)
+install_metrics(app)
 
-BOOTSTRAP = """
-<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js"></script>
+THEME_CSS = """
 <style>
 :root{
   --bg-header:#0B1220; --bg:#FFFFFF; --panel:#FFFFFF; --ink:#0F172A;
@@ -57,6 +109,42 @@ html,body{ background:var(--bg); color:var(--ink); font:16px/1.55 system-ui,Sego
 """
 
 
+# Typeahead for inputs marked data-suggest="single" or data-suggest="csv"
+# (completes the last comma-separated token), backed by /countries/suggest.
+COUNTRY_SUGGEST = """
+<script>
+document.addEventListener('DOMContentLoaded', () => {
+  document.querySelectorAll('input[data-suggest]').forEach((input) => {
+    const list = document.createElement('datalist');
+    list.id = input.id + '-suggest';
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.after(list);
+    const multi = input.dataset.suggest === 'csv';
+    let seq = 0;
+    input.addEventListener('input', async () => {
+      const parts = multi ? input.value.split(',') : [input.value];
+      const q = parts[parts.length - 1].trim();
+      const head = parts.slice(0, -1).map((p) => p.trim()).filter(Boolean);
+      const mine = ++seq;
+      if (!q) { list.innerHTML = ''; return; }
+      const res = await fetch('/countries/suggest?q=' + encodeURIComponent(q));
+      if (!res.ok || mine !== seq) return;
+      const js = await res.json();
+      list.innerHTML = '';
+      for (const s of js.suggestions) {
+        const opt = document.createElement('option');
+        opt.value = head.concat(s.code).join(', ');
+        opt.label = s.name;
+        list.appendChild(opt);
+      }
+    });
+  });
+});
+</script>
+"""
+
+
 def layout(page_title: str, active: str, body_html: str) -> str:
     nav = f"""
     <nav class="navbar navbar-expand-lg navbar-dark mb-4">
@@ -84,13 +172,14 @@ def layout(page_title: str, active: str, body_html: str) -> str:
     """
     return f"""<!doctype html>
 <html lang="en"><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
-<title>{page_title}</title>{BOOTSTRAP}</head>
-<body>{nav}<main class="container mb-5">{body_html}</main>{footer}</body></html>"""
+<title>{page_title}</title>{bootstrap_tags()}{THEME_CSS}</head>
+<body>{nav}<main class="container mb-5">{body_html}</main>{footer}{COUNTRY_SUGGEST}</body></html>"""
 
 
 @app.get("/")
+@static_page
 def home():
-    countries_snapshot = ", ".join(sorted(list(ISO_TO_NAME.keys()))[:12]) + "…"
+    countries_snapshot = ", ".join(sorted(country_index().codes)[:12]) + "…"
     body = f"""
     <div class="row g-4">
       <div class="col-lg-7">
@@ -170,6 +259,7 @@ def home():
 
 
 @app.get("/compare")
+@static_page
 def page_compare():
     body = """
     <div class="row g-4">
@@ -184,7 +274,7 @@ def page_compare():
           <div class="row gy-3">
             <div class="col-md-6">
               <label class="form-label">Country (ISO or name)</label>
-              <input id="cmp-country" value="AUS" class="form-control">
+              <input id="cmp-country" value="AUS" class="form-control" data-suggest="single">
             </div>
             <div class="col-md-6">
               <label class="form-label">Year</label>
@@ -248,8 +338,9 @@ def page_compare():
 
 
 @app.get("/explorer")
+@static_page
 def page_explorer():
-    iso_map_js = "{" + ",".join([f"'{k}':'{v}'" for k, v in ISO_TO_NAME.items()]) + "}"
+    iso_map_js = json.dumps(country_index().names, ensure_ascii=False)
     body = f"""
     <div class="card p-4 mb-4">
       <h2 class="h4 mb-2">Data Explorer (Filter & Sort)</h2>
@@ -263,7 +354,7 @@ def page_explorer():
         Case does not matter. Leave the country field empty to show all countries for the selected filters.
       </p>
       <form class="row gy-3 align-items-end" onsubmit="return false;">
-        <div class="col-sm-3"><label class="form-label">Country (ISO or name, CSV)</label><input id="q_country" class="form-control" value="AUS, NZL, GBR"></div>
+        <div class="col-sm-3"><label class="form-label">Country (ISO or name, CSV)</label><input id="q_country" class="form-control" value="AUS, NZL, GBR" data-suggest="csv"></div>
         <div class="col-sm-3"><label class="form-label">Vaccine</label><input id="q_vaccine" class="form-control" value="MMR"></div>
         <div class="col-sm-2"><label class="form-label">Year</label><input id="q_year" class="form-control" type="number" value="2024"></div>
         <div class="col-sm-3">
@@ -291,7 +382,10 @@ def page_explorer():
           <tbody></tbody>
         </table>
       </div>
-      <div class="small text-secondary">Rows: <span id="q_count">0</span></div>
+      <div class="d-flex justify-content-between align-items-center">
+        <div class="small text-secondary">Rows: <span id="q_count">0</span><span id="q_total"></span></div>
+        <button class="btn btn-outline-secondary btn-sm d-none" id="q_more">Load more</button>
+      </div>
     </div>
 
     <script>
@@ -301,15 +395,22 @@ def page_explorer():
     const TBody = document.querySelector('#q_table tbody');
     const Count = document.getElementById('q_count');
     const ErrorBox = document.getElementById('q_error');
+    const Total = document.getElementById('q_total');
+    const More = document.getElementById('q_more');
+    const PAGE_SIZE = 500;
+    let nextCursor = null;
 
-    async function runQuery() {{
+    async function runQuery(append) {{
       const rawCountry = document.getElementById('q_country').value || '';
 
       const payload = {{
         country: rawCountry || null,
         vaccine: (document.getElementById('q_vaccine').value || null),
         year:    (document.getElementById('q_year').value || '') ? parseInt(document.getElementById('q_year').value) : null,
-        sort:    document.getElementById('q_sort').value || 'coverage_desc'
+        sort:    document.getElementById('q_sort').value || 'coverage_desc',
+        limit:   PAGE_SIZE,
+        cursor:  append ? nextCursor : null,
+        total:   !append
       }};
 
       ErrorBox.classList.add('d-none');
@@ -328,10 +429,15 @@ def page_explorer():
         ErrorBox.textContent = '⚠ ' + js.error;
         ErrorBox.classList.remove('d-none');
         window.__lastRows = [];
+        More.classList.add('d-none');
         return;
       }}
 
-      TBody.innerHTML = '';
+      if (!append) {{
+        TBody.innerHTML = '';
+        window.__lastRows = [];
+        Total.textContent = (js.total != null) ? ' of ' + js.total : '';
+      }}
       (js.rows||[]).forEach(function(row) {{
         const tr = document.createElement('tr');
         tr.innerHTML =
@@ -341,37 +447,37 @@ def page_explorer():
           '<td>' + row.coverage + '%</td>';
         TBody.appendChild(tr);
       }});
-      Count.textContent = (js.rows||[]).length;
-      window.__lastRows = js.rows || [];
+      window.__lastRows = window.__lastRows.concat(js.rows || []);
+      Count.textContent = window.__lastRows.length;
+      nextCursor = js.next_cursor || null;
+      More.classList.toggle('d-none', !nextCursor);
     }}
 
-    document.getElementById('q_run').addEventListener('click', runQuery);
+    document.getElementById('q_run').addEventListener('click', function() {{ runQuery(false); }});
+    More.addEventListener('click', function() {{ runQuery(true); }});
 
     document.getElementById('btn_csv').addEventListener('click', function() {{
-      const rows = window.__lastRows || [];
-      const head = ['country','vaccine','year','coverage'];
-      const all = [head].concat(rows.map(function(r) {{ return [r.country, r.vaccine, r.year, r.coverage]; }}));
-      const csv = all.map(function(a) {{
-        return a.map(function(x) {{ return '"' + String(x).replaceAll('"','""') + '"'; }}).join(',');
-      }}).join('\\n');
-      const blob = new Blob([csv], {{type:'text/csv'}});
-      const url = URL.createObjectURL(blob);
-      const a = document.createElement('a');
-      a.href = url;
-      a.download = 'coverage_export.csv';
-      a.click();
-      URL.revokeObjectURL(url);
+      const params = new URLSearchParams({{format: 'csv'}});
+      const country = document.getElementById('q_country').value || '';
+      const vaccine = document.getElementById('q_vaccine').value || '';
+      const year = document.getElementById('q_year').value || '';
+      if (country) params.set('country', country);
+      if (vaccine) params.set('vaccine', vaccine);
+      if (year) params.set('year', year);
+      params.set('sort', document.getElementById('q_sort').value || 'coverage_desc');
+      window.location = '/coverage/export?' + params.toString();
     }});
 
-    runQuery();
+    runQuery(false);
     </script>
     """
     return layout("Explorer — Vaccine Intelligence", "explorer", body)
 
 
 @app.get("/trends-ui")
+@static_page
 def page_trends_ui():
-    iso_map_js = "{" + ",".join([f"'{k}':'{v}'" for k, v in ISO_TO_NAME.items()]) + "}"
+    iso_map_js = json.dumps(country_index().names, ensure_ascii=False)
     body = f"""
     <div class="card p-4 mb-4">
       <h2 class="h4 mb-2">Trends (Multiple Countries)</h2>
@@ -385,8 +491,17 @@ def page_trends_ui():
       </p>
       <form class="row gy-3 align-items-end" onsubmit="return false;">
         <div class="col-sm-4"><label class="form-label">Vaccine</label><input id="t_vaccine" class="form-control" value="MMR"></div>
-        <div class="col-sm-6"><label class="form-label">Countries (ISO or names, CSV)</label><input id="t_countries" class="form-control" value="AUS,NZL,GBR,USA,CAN,JPN"></div>
+        <div class="col-sm-6"><label class="form-label">Countries (ISO or names, CSV)</label><input id="t_countries" class="form-control" value="AUS,NZL,GBR,USA,CAN,JPN" data-suggest="csv"></div>
         <div class="col-sm-2"><button class="btn btn-primary w-100" id="t_run">Load</button></div>
+        <div class="col-sm-4">
+          <label class="form-label">View</label>
+          <select id="t_mode" class="form-select">
+            <option value="latest" selected>Latest year only</option>
+            <option value="series">Full series (year-over-year change)</option>
+          </select>
+        </div>
+        <div class="col-sm-3"><label class="form-label">From year</label><input id="t_from" class="form-control" type="number"></div>
+        <div class="col-sm-3"><label class="form-label">To year</label><input id="t_to" class="form-control" type="number"></div>
       </form>
     </div>
 
@@ -398,14 +513,44 @@ def page_trends_ui():
 
     const Cards = document.getElementById('t_cards');
 
+    function seriesCard(s, points) {{
+      const rows = points.map(function(p) {{
+        const d = (p.delta == null) ? '' : ((p.delta > 0 ? '+' : '') + p.delta + ' pp');
+        return '<tr><td>' + p.year + '</td><td>' + p.coverage + '%</td><td>' + d + '</td></tr>';
+      }}).join('');
+      const decline = (s.largest_decline == null)
+        ? '<div class="text-success small">No year-over-year decline</div>'
+        : '<div class="text-danger small">Largest decline: ' + s.largest_decline + ' pp in ' + s.largest_decline_year + '</div>';
+      return '<div class="col-md-4"><div class="card p-3">' +
+        '<h5 class="mb-2">' + isoToName(s.country) + ' (' + s.country + ') — ' + s.vaccine + '</h5>' +
+        decline +
+        '<table class="table table-sm mt-2 mb-0"><thead><tr><th>Year</th><th>Coverage</th><th>Change</th></tr></thead>' +
+        '<tbody>' + rows + '</tbody></table>' +
+      '</div></div>';
+    }}
+
     async function loadTrends() {{
       const vaccine = document.getElementById('t_vaccine').value || 'MMR';
       const countries = document.getElementById('t_countries').value || 'AUS,NZL,GBR';
-      const r = await fetch('/trends?vaccine=' + encodeURIComponent(vaccine) +
-                            '&countries=' + encodeURIComponent(countries));
+      const mode = document.getElementById('t_mode').value || 'latest';
+      const params = new URLSearchParams({{vaccine: vaccine, countries: countries, mode: mode}});
+      const yFrom = document.getElementById('t_from').value;
+      const yTo = document.getElementById('t_to').value;
+      if (yFrom) params.set('year_from', yFrom);
+      if (yTo) params.set('year_to', yTo);
+      const r = await fetch('/trends?' + params.toString());
       const js = await r.json();
 
       Cards.innerHTML = '';
+      if (mode === 'series') {{
+        (js.series||[]).forEach(function(s) {{
+          const points = (js.points||[]).filter(function(p) {{
+            return p.country === s.country && p.vaccine === s.vaccine;
+          }});
+          Cards.insertAdjacentHTML('beforeend', seriesCard(s, points));
+        }});
+        return;
+      }}
       (js.points||[]).forEach(function(p) {{
         Cards.insertAdjacentHTML('beforeend',
           '<div class="col-md-4">' +
@@ -428,18 +573,116 @@ def page_trends_ui():
     return layout("Trends — Vaccine Intelligence", "trends", body)
 
 
+@app.before_request
+def hold_snapshot():
+    # Snapshot mode: every read in the request sees the same snapshot, even
+    # if ingest publishes a newer one meanwhile. Change probes for the
+    # caches also run once per request rather than on every lookup.
+    g.snapshot = ExitStack()
+    g.snapshot.enter_context(pin_snapshot())
+    g.snapshot.enter_context(pin_generations())
+
+
+@app.teardown_request
+def release_snapshot(exc):
+    stack = g.pop("snapshot", None)
+    if stack is not None:
+        stack.close()
+
+
 @app.after_request
 def no_cache(resp):
-    resp.headers["Cache-Control"] = "no-store, max-age=0"
-    return resp
+    # Routes opt in to caching (see httpcache); anything else is never stored.
+    return apply_default_policy(resp)
+
+
+@app.after_request
+def compress(resp):
+    return compress_response(resp)
+
+
+@app.get("/vendor/<name>")
+def vendor_file(name):
+    asset = (vendor_assets() or {}).get(name)
+    if asset is None:
+        return jsonify({"error": "Not found", "path": request.path}), 404
+    return asset.response(VENDOR_POLICY)
 
 
 @app.get("/health")
 def health():
-    return jsonify({"ok": True, "message": "API is running", "version": "1.0.0"}), 200
+    payload = {
+        "ok": True,
+        "message": "API is running",
+        "version": "1.0.0",
+        "pool": pool_stats(),
+        "cache": cache_stats(),
+    }
+    snapshots = snapshot_stats()
+    if snapshots is not None:
+        payload["snapshots"] = snapshots
+    # Set by vaccine_py.serve in each worker process.
+    worker_status = app.config.get("WORKER_STATUS")
+    if worker_status is not None:
+        payload["workers"] = worker_status()
+    return jsonify(payload), 200
+
+
+@app.get("/metrics")
+def metrics():
+    return metrics_response()
+
+
+# Diagnostics endpoints are off unless a token is configured, and then need
+# `Authorization: Bearer <token>`.
+DIAGNOSTICS_TOKEN = os.environ.get("VACCINE_DIAGNOSTICS_TOKEN", "")
+
+
+def _diagnostics_denied():
+    """An error response, or None when the request may see diagnostics."""
+    if not DIAGNOSTICS_TOKEN:
+        return jsonify({"error": "Not found", "path": request.path}), 404
+    scheme, _, token = (request.headers.get("Authorization") or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), DIAGNOSTICS_TOKEN.encode()):
+        resp = jsonify({"error": "Diagnostics token required"})
+        resp.status_code = 401
+        resp.headers["WWW-Authenticate"] = 'Bearer realm="diagnostics"'
+        return resp
+    return None
+
+
+@app.route("/diagnostics/slow-queries", methods=["GET", "DELETE"])
+def diagnostics_slow_queries():
+    denied = _diagnostics_denied()
+    if denied is not None:
+        return denied
+    if request.method == "DELETE":
+        reset_slow_queries()
+        return "", 204
+    return jsonify(slow_queries()), 200
+
+
+def _country_codes_param(raw_country):
+    """Turn a comma-separated country list into ("AUS,NZL", invalid_tokens)."""
+    if not raw_country:
+        return None, []
+    codes, invalid = resolve_countries(raw_country)
+    return ",".join(codes), invalid
+
+
+RESULT_FORMATS = ("rows", "columns")
+
+
+def _format_param(raw):
+    """("columns" requested?, error message or None) for a `format` parameter."""
+    fmt = (str(raw or "rows")).strip().lower()
+    if fmt not in RESULT_FORMATS:
+        return False, "Invalid format parameter. Use rows or columns."
+    return fmt == "columns", None
 
 
 @app.route("/coverage/query", methods=["GET", "POST"])
+@data_cached
 def query_coverage():
     if request.method == "GET":
         data = {
@@ -447,55 +690,134 @@ def query_coverage():
             "vaccine": request.args.get("vaccine"),
             "year": request.args.get("year", type=int),
             "sort": request.args.get("sort", "coverage_desc"),
+            "limit": request.args.get("limit"),
+            "cursor": request.args.get("cursor"),
+            "total": request.args.get("total"),
+            "fields": request.args.get("fields"),
+            "format": request.args.get("format"),
         }
     else:
         data = request.get_json(silent=True) or {}
 
-    raw_country = data.get("country") or None
-    country_param = None
+    country_param, invalid = _country_codes_param(data.get("country"))
+    if invalid:
+        return jsonify(
+            {
+                "error": (
+                    "Unknown country code(s)/name(s): "
+                    + ", ".join(invalid)
+                    + ". Use 3-letter ISO codes (e.g. AUS,NZL,GBR) "
+                    "or full names (e.g. Australia)."
+                ),
+                "rows": [],
+                "count": 0,
+            }
+        ), 400
+
+    columns, fmt_error = _format_param(data.get("format"))
+    if fmt_error:
+        return jsonify({"error": fmt_error, "rows": [], "count": 0}), 400
+    fields = data.get("fields")
+
+    limit = data.get("limit")
+    cursor = data.get("cursor") or None
+    if limit is not None or cursor:
+        try:
+            limit = int(limit) if limit is not None else 100
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid limit parameter", "rows": [], "count": 0}), 400
+        with_total = str(data.get("total", "true")).strip().lower() not in ("0", "false", "no", "off")
+        try:
+            page = get_filtered_page(
+                country=country_param,
+                vaccine=(data.get("vaccine") or None),
+                year=data.get("year"),
+                sort=data.get("sort", "coverage_desc"),
+                limit=limit,
+                cursor=cursor,
+                with_total=with_total,
+                fields=fields,
+                columns=columns,
+            )
+        except ValueError as exc:  # CursorError or unknown fields
+            return jsonify({"error": str(exc), "rows": [], "count": 0}), 400
+        return jsonify(page), 200
+
+    query = dict(
+        country=country_param,
+        vaccine=(data.get("vaccine") or None),
+        year=data.get("year"),
+        sort=data.get("sort", "coverage_desc"),
+        fields=fields,
+    )
+    try:
+        if columns:
+            return jsonify(get_filtered_columns(**query)), 200
+        rows = get_filtered_data(**query)
+    except ValueError as exc:
+        return jsonify({"error": str(exc), "rows": [], "count": 0}), 400
+    return jsonify({"count": len(rows), "rows": rows}), 200
 
-    if raw_country:
-        tokens = [t.strip() for t in str(raw_country).split(",") if t.strip()]
-        codes = []
-        invalid = []
 
-        for token in tokens:
-            upper = token.upper()
-            code = None
+EXPORT_HEADER = ("country", "vaccine", "year", "coverage")
+EXPORT_CHUNK_ROWS = 500
 
-            if len(upper) == 3 and upper in ISO_TO_NAME:
-                code = upper
-            else:
-                code = NAME_TO_ISO.get(token.lower())
 
-            if code:
-                codes.append(code)
-            else:
-                invalid.append(token)
+def _export_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_HEADER)
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n % EXPORT_CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
 
-        if invalid:
-            return jsonify(
-                {
-                    "error": (
-                        "Unknown country code(s)/name(s): "
-                        + ", ".join(invalid)
-                        + ". Use 3-letter ISO codes (e.g. AUS,NZL,GBR) "
-                        "or full names (e.g. Australia)."
-                    ),
-                    "rows": [],
-                    "count": 0,
-                }
-            ), 400
 
-        country_param = ",".join(codes)
+def _export_ndjson(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_HEADER, row)), separators=(",", ":")))
+        if len(lines) == EXPORT_CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
 
-    rows = get_filtered_data(
+
+EXPORT_FORMATS = {
+    "csv": (_export_csv, "text/csv", "csv"),
+    "ndjson": (_export_ndjson, "application/x-ndjson", "ndjson"),
+}
+
+
+@app.get("/coverage/export")
+@data_cached
+def export_coverage():
+    fmt = (request.args.get("format", "csv") or "csv").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "Invalid format parameter. Use csv or ndjson."}), 400
+
+    country_param, invalid = _country_codes_param(request.args.get("country"))
+    if invalid:
+        return jsonify({"error": "Unknown country code(s)/name(s): " + ", ".join(invalid)}), 400
+
+    rows = iter_filtered_rows(
         country=country_param,
-        vaccine=(data.get("vaccine") or None),
-        year=data.get("year"),
-        sort=data.get("sort", "coverage_desc"),
+        vaccine=request.args.get("vaccine") or None,
+        year=request.args.get("year", type=int),
+        sort=request.args.get("sort", "coverage_desc"),
+    )
+    encoder, mimetype, ext = EXPORT_FORMATS[fmt]
+    return Response(
+        stream_with_context(encoder(rows)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="coverage_export.{ext}"'},
     )
-    return jsonify({"count": len(rows), "rows": rows}), 200
 
 
 @app.get("/coverage/compare")
@@ -504,17 +826,10 @@ def compare_api():
 
 
 @app.get("/compare.json")
+@data_cached
 def compare_json():
     raw = (request.args.get("country", "AUS") or "AUS").strip()
-    token = raw
-    upper = token.upper()
-    code = None
-
-    if len(upper) == 3 and upper in ISO_TO_NAME:
-        code = upper
-    else:
-        code = NAME_TO_ISO.get(token.lower())
-
+    code = resolve_country(raw)
     if not code:
         return (
             jsonify(
@@ -534,13 +849,12 @@ def compare_json():
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid year parameter"}), 400
 
-    result = compare_country(code, year)
+    result = dict(compare_country(code, year, vaccine))
     if "error" in result:
         return jsonify(result), 200
 
     result["country_code"] = code
-    result["country_name"] = ISO_TO_NAME.get(code, code)
-    result["vaccine"] = vaccine
+    result["country_name"] = country_index().name(code)
     if isinstance(result.get("local"), (int, float)):
         result["local"] = round(result["local"], 1)
     if isinstance(result.get("global_avg"), (int, float)):
@@ -549,26 +863,66 @@ def compare_json():
     return jsonify(result), 200
 
 
+def _list_param(data, key):
+    raw = data.get(key)
+    if raw is None:
+        return []
+    if isinstance(raw, (list, tuple)):
+        return [str(x).strip() for x in raw if str(x).strip()]
+    return [t.strip() for t in str(raw).split(",") if t.strip()]
+
+
+@app.route("/coverage/compare/batch", methods=["GET", "POST"])
+@data_cached
+def compare_batch_api():
+    if request.method == "GET":
+        data = request.args
+    else:
+        data = request.get_json(silent=True) or {}
+
+    country_param, invalid = _country_codes_param(",".join(_list_param(data, "countries")))
+    if invalid:
+        return jsonify({"error": "Unknown country code(s)/name(s): " + ", ".join(invalid)}), 400
+
+    result = compare_batch(
+        countries=country_param.split(",") if country_param else [],
+        vaccines=_list_param(data, "vaccines"),
+        years=_list_param(data, "years"),
+    )
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result), 200
+
+
+@app.route("/coverage/rank", methods=["GET", "POST"])
+@data_cached
+def coverage_rank():
+    if request.method == "GET":
+        data = request.args
+    else:
+        data = request.get_json(silent=True) or {}
+
+    try:
+        year = int(data["year"]) if data.get("year") not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid year parameter", "ranks": []}), 400
+    try:
+        result = get_rank(
+            countries=_list_param(data, "countries"),
+            vaccine=data.get("vaccine") or "MMR",
+            year=year,
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc), "ranks": []}), 400
+    return jsonify(result), 200
+
+
 @app.get("/trends")
+@data_cached
 def trends():
     vaccine = request.args.get("vaccine", "MMR")
     raw_countries = request.args.get("countries", "AUS,NZL,GBR")
-
-    tokens = [t.strip() for t in str(raw_countries).split(",") if t.strip()]
-    codes = []
-    invalid = []
-
-    for token in tokens:
-        upper = token.upper()
-        code = None
-        if len(upper) == 3 and upper in ISO_TO_NAME:
-            code = upper
-        else:
-            code = NAME_TO_ISO.get(token.lower())
-        if code:
-            codes.append(code)
-        else:
-            invalid.append(token)
+    codes, invalid = resolve_countries(raw_countries)
 
     if invalid:
         return (
@@ -585,7 +939,98 @@ def trends():
             400,
         )
 
-    return jsonify(get_trends(vaccine, codes)), 200
+    mode = (request.args.get("mode", "latest") or "latest").strip().lower()
+    if mode not in ("latest", "series"):
+        return jsonify({"error": "Invalid mode parameter. Use latest or series.", "points": []}), 400
+
+    years = {}
+    for key in ("year_from", "year_to"):
+        raw = request.args.get(key)
+        if raw in (None, ""):
+            years[key] = None
+            continue
+        try:
+            years[key] = int(raw)
+        except ValueError:
+            return jsonify({"error": f"Invalid {key} parameter", "points": []}), 400
+    if years["year_from"] is not None and years["year_to"] is not None and years["year_from"] > years["year_to"]:
+        return jsonify({"error": "year_from must not be after year_to", "points": []}), 400
+
+    columns, fmt_error = _format_param(request.args.get("format"))
+    if fmt_error:
+        return jsonify({"error": fmt_error, "points": []}), 400
+
+    try:
+        result = get_trends(
+            vaccine,
+            codes,
+            latest_only=(mode == "latest"),
+            fields=request.args.get("fields"),
+            columns=columns,
+            **years,
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc), "points": []}), 400
+    return jsonify(result), 200
+
+
+@app.get("/alerts")
+@data_cached
+def alerts():
+    try:
+        threshold = float(request.args.get("threshold", DEFAULT_THRESHOLD))
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "Invalid threshold or limit parameter", "alerts": []}), 400
+    if threshold < 0:
+        return jsonify({"error": "threshold must not be negative", "alerts": []}), 400
+
+    country_param, invalid = _country_codes_param(request.args.get("country"))
+    if invalid:
+        return jsonify({"error": "Unknown country code(s)/name(s): " + ", ".join(invalid), "alerts": []}), 400
+
+    try:
+        result = get_alerts(
+            threshold=threshold,
+            region=request.args.get("region"),
+            vaccine=request.args.get("vaccine"),
+            country=country_param,
+            limit=limit,
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc), "alerts": []}), 400
+    return jsonify(result), 200
+
+
+@app.get("/aggregate")
+@data_cached
+def aggregate():
+    try:
+        year = int(request.args["year"]) if request.args.get("year") else None
+    except ValueError:
+        return jsonify({"error": "Invalid year parameter", "rows": []}), 400
+    try:
+        result = get_aggregate(
+            group_by=request.args.get("group_by", "region"),
+            vaccine=request.args.get("vaccine"),
+            year=year,
+            groups=request.args.get("groups"),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc), "rows": []}), 400
+    return jsonify(result), 200
+
+
+@app.get("/countries/suggest")
+@data_cached
+def countries_suggest():
+    q = request.args.get("q", "")
+    try:
+        limit = int(request.args.get("limit", 8))
+    except ValueError:
+        return jsonify({"error": "Invalid limit parameter", "suggestions": []}), 400
+    suggestions = suggest_countries(q, limit)
+    return jsonify({"q": q, "suggestions": suggestions, "count": len(suggestions)}), 200
 
 
 @app.errorhandler(404)
@@ -600,4 +1045,5 @@ def server_error(e):
 
 if __name__ == "__main__":
     init_db()
+    prerender_pages(app)
     app.run(host="127.0.0.1", port=5055, debug=False, threaded=True)
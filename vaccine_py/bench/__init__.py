@@ -0,0 +1,7 @@
+"""Benchmarks against synthetic databases of a chosen size.
+
+    python -m vaccine_py.bench.micro --sizes 1e3,1e5,1e6 --out bench.json
+
+`generate` builds the databases; `micro` times the coverage service
+functions on them and compares the results with a stored baseline.
+"""
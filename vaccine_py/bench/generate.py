@@ -0,0 +1,151 @@
+"""Deterministic synthetic coverage data.
+
+    python -m vaccine_py.bench.generate 1e6 [--seed 0] [--db bench.db]
+
+Rows are laid out as country x vaccine x year series: every series covers the
+same run of years (up to `MAX_YEARS`), real ISO codes come first and
+synthetic three-letter codes (`AAA`, `AAB`, ...) follow. Coverage is a
+bounded random walk with occasional sharp drops, so trends and alerts have
+something to find. The same `(rows, seed)` always produces the same rows.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+try:
+    from vaccine_py.ingest import Row, ingest
+    from vaccine_py.services import coverage
+    from vaccine_py.services.countries import ISO_TO_NAME
+except ImportError:
+    from ..ingest import Row, ingest
+    from ..services import coverage
+    from ..services.countries import ISO_TO_NAME
+
+# Bump when the layout or the random walk changes, so cached databases
+# built by an older generator are not reused.
+GENERATOR_VERSION = 1
+
+VACCINES = ("MMR", "POL", "DTP3", "BCG", "HEPB3", "HIB3", "PCV3", "ROTAC", "MCV2", "RCV1")
+LAST_YEAR = 2024
+MAX_YEARS = 45
+DROP_CHANCE = 0.03
+
+DATA_DIR = Path(tempfile.gettempdir()) / "vaccine-bench"
+
+
+def parse_size(text: str) -> int:
+    """`1000`, `1e5` or `100_000`."""
+    n = int(float(str(text).replace("_", "")))
+    if n < 1:
+        raise ValueError(f"size must be positive: {text!r}")
+    return n
+
+
+def country_codes(n: int) -> List[str]:
+    real = sorted(ISO_TO_NAME)
+    if n <= len(real):
+        return real[:n]
+    taken = set(real)
+    synthetic = (
+        "".join(t) for t in itertools.product(string.ascii_uppercase, repeat=3) if "".join(t) not in taken
+    )
+    codes = real + list(itertools.islice(synthetic, n - len(real)))
+    if len(codes) < n:
+        raise ValueError(f"cannot generate {n} distinct country codes")
+    return codes
+
+
+def layout(rows: int) -> tuple:
+    """(countries, vaccines, years) for `rows` rows; the last series may be short."""
+    years = min(MAX_YEARS, rows)
+    vaccines = min(len(VACCINES), -(-rows // years))
+    countries = -(-rows // (years * vaccines))
+    return countries, vaccines, years
+
+
+def synthetic_rows(rows: int, seed: int = 0) -> Iterator[Row]:
+    n_countries, n_vaccines, n_years = layout(rows)
+    rng = random.Random(seed)
+    first = LAST_YEAR - n_years + 1
+    emitted = 0
+    for country in country_codes(n_countries):
+        for vaccine in VACCINES[:n_vaccines]:
+            level = rng.uniform(40.0, 99.0)
+            for year in range(first, LAST_YEAR + 1):
+                if emitted == rows:
+                    return
+                if rng.random() < DROP_CHANCE:
+                    level -= rng.uniform(5.0, 25.0)
+                else:
+                    level += rng.gauss(0.6, 2.0)
+                level = min(99.9, max(1.0, level))
+                yield country, vaccine, year, round(level, 1)
+                emitted += 1
+
+
+def populate(path: Path, rows: int, seed: int = 0) -> Path:
+    """Create (or replace) a database at `path` holding exactly the synthetic
+    rows, with the full schema and derived tables."""
+    path = Path(path)
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(path) + suffix).unlink(missing_ok=True)
+    saved = coverage.DB_PATH
+    coverage.DB_PATH = path
+    try:
+        coverage.init_db()
+        conn = coverage.get_connection()
+        try:
+            with conn:
+                # The baseline seeds the demo rows; the triggers keep
+                # coverage_agg and data_state consistent as they go.
+                conn.execute("DELETE FROM coverage;")
+                conn.execute("DELETE FROM coverage_alerts;")
+            ingest(conn, synthetic_rows(rows, seed), batch_size=20000, bulk=True)
+            conn.execute("ANALYZE;")
+        finally:
+            conn.close()
+    finally:
+        coverage.DB_PATH = saved
+    return path
+
+
+def cached_database(rows: int, seed: int = 0, directory: Optional[Path] = None) -> Path:
+    """Path of a populated database, built on first use and reused after."""
+    directory = Path(directory or DATA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"coverage-v{GENERATOR_VERSION}-{rows}-{seed}.db"
+    if path.exists():
+        try:
+            with sqlite3.connect(str(path)) as conn:
+                if conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0] == rows:
+                    return path
+        except sqlite3.Error:
+            pass
+    return populate(path, rows, seed)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m vaccine_py.bench.generate", description=__doc__.splitlines()[0])
+    ap.add_argument("rows", type=parse_size, help="number of coverage rows, e.g. 1e5")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--db", help=f"database to create (default: cached under {DATA_DIR})")
+    args = ap.parse_args(argv)
+
+    if args.db:
+        path = populate(Path(args.db), args.rows, args.seed)
+    else:
+        path = cached_database(args.rows, args.seed)
+    print(f"{path}: {args.rows:,} rows, {layout(args.rows)[0]:,} countries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+"""Closed-loop load generator with per-endpoint latency percentiles.
+
+    python -m vaccine_py.bench.load [--url http://127.0.0.1:5055] [--concurrency 8]
+                                    [--duration 10] [--mix query=4,compare=3,trends=2]
+                                    [--writers 1] [--checkpoint-every 1] [--out load.json]
+
+Each of `--concurrency` workers sends one request, waits for the full
+response, then sends the next, with endpoints drawn from `--mix` by weight
+and parameters drawn from the countries, vaccines and years in the database.
+Without `--url` requests go through `app.test_client()` in this process.
+
+`--writers` adds threads that upsert single coverage rows through the ingest
+path, so readers see cache invalidation and SQLite write locks, and
+`--checkpoint-every` runs `PRAGMA wal_checkpoint(PASSIVE)` on a timer; both
+are reported alongside the HTTP endpoints. Writers modify the database, so
+point them at a generated one (`--rows 1e5` or `--db`).
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import itertools
+import json
+import random
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    from vaccine_py.bench.generate import cached_database, parse_size
+    from vaccine_py.ingest import ingest
+    from vaccine_py.services import coverage
+except ImportError:
+    from .generate import cached_database, parse_size
+    from ..ingest import ingest
+    from ..services import coverage
+
+DEFAULT_MIX = "query=4,page=2,compare=3,trends=2,series=1"
+PERCENTILES = (50, 95, 99)
+MAX_ERROR_SAMPLES = 5
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+Send = Callable[[str, str, Optional[Dict[str, Any]]], int]
+
+
+class Workload:
+    """Builds requests for each endpoint name from the data in a database."""
+
+    def __init__(self, countries: List[str], vaccines: List[str], years: List[int]) -> None:
+        if not (countries and vaccines and years):
+            raise ValueError("the database has no coverage rows")
+        self.countries = countries
+        self.vaccines = vaccines
+        self.years = years
+
+    @classmethod
+    def from_database(cls, path: Path) -> "Workload":
+        with sqlite3.connect(str(path)) as conn:
+            def distinct(col: str) -> list:
+                return [r[0] for r in conn.execute(f"SELECT DISTINCT {col} FROM coverage ORDER BY {col};")]
+            return cls(distinct("country"), distinct("vaccine"), distinct("year"))
+
+    def _countries(self, rng: random.Random, k: int) -> str:
+        return ",".join(rng.sample(self.countries, min(k, len(self.countries))))
+
+    def request(self, name: str, rng: random.Random) -> Request:
+        v = rng.choice(self.vaccines)
+        if name == "query":
+            sort = rng.choice(list(coverage.SORTS))
+            return "GET", f"/coverage/query?vaccine={v}&country={self._countries(rng, 5)}&sort={sort}", None
+        if name == "page":
+            body = {"vaccine": v, "year": rng.choice(self.years), "limit": 100}
+            return "POST", "/coverage/query", body
+        if name == "compare":
+            c, y = rng.choice(self.countries), rng.choice(self.years)
+            return "GET", f"/compare.json?country={c}&year={y}&vaccine={v}", None
+        if name == "trends":
+            return "GET", f"/trends?vaccine={v}&countries={self._countries(rng, 10)}", None
+        if name == "series":
+            return "GET", f"/trends?vaccine={v}&countries={self._countries(rng, 5)}&mode=series", None
+        raise ValueError(f"unknown endpoint in mix: {name!r}")
+
+
+ENDPOINTS = ("query", "page", "compare", "trends", "series")
+# Reported per endpoint but left out of the HTTP totals.
+BACKGROUND = ("write", "checkpoint")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r} (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError(f"negative weight for {name}")
+    if not any(mix.values()):
+        raise ValueError("the mix has no positive weights")
+    return mix
+
+
+# ---- Targets: each worker gets its own session ----
+class InProcessTarget:
+    name = "test_client"
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    def session(self) -> Send:
+        client = self.app.test_client()
+
+        def send(method: str, path: str, body: Optional[Dict[str, Any]]) -> int:
+            rv = client.open(path, method=method, json=body)
+            rv.get_data()
+            rv.close()
+            return rv.status_code
+
+        return send
+
+
+class HttpTarget:
+    """Keep-alive HTTP/1.1 connections to a running server."""
+
+    def __init__(self, url: str, timeout: float = 30.0) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"expected an http:// URL, got {url!r}")
+        self.name = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+
+    def session(self) -> Send:
+        state: Dict[str, Optional[http.client.HTTPConnection]] = {"conn": None}
+
+        def send(method: str, path: str, body: Optional[Dict[str, Any]]) -> int:
+            if state["conn"] is None:
+                state["conn"] = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            conn = state["conn"]
+            headers = {"Accept-Encoding": "gzip"}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body).encode("utf-8")
+                headers["Content-Type"] = "application/json"
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                rv = conn.getresponse()
+                rv.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                state["conn"] = None
+                raise
+            if rv.will_close:
+                conn.close()
+                state["conn"] = None
+            return rv.status
+
+        return send
+
+
+# ---- Recording ----
+class Recorder:
+    """Latencies and errors per endpoint for one thread; merged at the end."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.samples: List[str] = []
+
+    def record(self, name: str, seconds: float, status: Any, error: Optional[str] = None) -> None:
+        self.latencies.setdefault(name, []).append(seconds * 1000.0)
+        counts = self.statuses.setdefault(name, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+        if error is not None:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            if len(self.samples) < MAX_ERROR_SAMPLES:
+                self.samples.append(f"{name}: {error}")
+
+    def merge(self, other: "Recorder") -> None:
+        for name, values in other.latencies.items():
+            self.latencies.setdefault(name, []).extend(values)
+        for name, n in other.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + n
+        for name, counts in other.statuses.items():
+            mine = self.statuses.setdefault(name, {})
+            for status, n in counts.items():
+                mine[status] = mine.get(status, 0) + n
+        self.samples.extend(other.samples[: MAX_ERROR_SAMPLES - len(self.samples)])
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(rec: Recorder, elapsed: float) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    everything: List[float] = []
+    errors = 0
+    for name in sorted(n for n in rec.latencies if n not in BACKGROUND):
+        values = sorted(rec.latencies[name])
+        everything.extend(values)
+        errors += rec.errors.get(name, 0)
+        out[name] = _stats(values, rec.errors.get(name, 0), elapsed)
+        out[name]["statuses"] = rec.statuses.get(name, {})
+    out["total"] = _stats(sorted(everything), errors, elapsed)
+    for name in BACKGROUND:
+        if name in rec.latencies:
+            out[name] = _stats(sorted(rec.latencies[name]), rec.errors.get(name, 0), elapsed)
+            out[name]["statuses"] = rec.statuses.get(name, {})
+    return out
+
+
+def _stats(values: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    n = len(values)
+    stats: Dict[str, Any] = {
+        "requests": n,
+        "errors": errors,
+        "error_rate": round(errors / n, 4) if n else 0.0,
+        "throughput_rps": round(n / elapsed, 1) if elapsed > 0 else None,
+    }
+    for pct in PERCENTILES:
+        p = percentile(values, pct)
+        stats[f"p{pct}_ms"] = round(p, 3) if p is not None else None
+    stats["max_ms"] = round(values[-1], 3) if values else None
+    return stats
+
+
+# ---- Threads ----
+def _reader(
+    send: Send, workload: Workload, names: List[str], weights: List[float],
+    seed: int, deadline: float, budget: Optional[itertools.count], total: Optional[int], rec: Recorder,
+) -> None:
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        if budget is not None and next(budget) >= total:
+            return
+        name = rng.choices(names, weights)[0]
+        method, path, body = workload.request(name, rng)
+        t0 = time.perf_counter()
+        try:
+            status = send(method, path, body)
+        except Exception as exc:
+            rec.record(name, time.perf_counter() - t0, "exception", f"{type(exc).__name__}: {exc}")
+            continue
+        error = f"HTTP {status} for {method} {path}" if status >= 400 else None
+        rec.record(name, time.perf_counter() - t0, status, error)
+
+
+def _writer(
+    path: Path, workload: Workload, seed: int, interval: float, stop: threading.Event, rec: Recorder
+) -> None:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(str(path))
+    try:
+        while not stop.is_set():
+            row = (
+                rng.choice(workload.countries), rng.choice(workload.vaccines),
+                rng.choice(workload.years), round(rng.uniform(50.0, 99.9), 1),
+            )
+            t0 = time.perf_counter()
+            try:
+                ingest(conn, [row])
+                rec.record("write", time.perf_counter() - t0, "ok")
+            except sqlite3.Error as exc:
+                rec.record("write", time.perf_counter() - t0, "error", f"{type(exc).__name__}: {exc}")
+            stop.wait(interval)
+    finally:
+        conn.close()
+
+
+def _checkpointer(path: Path, every: float, stop: threading.Event, rec: Recorder) -> None:
+    conn = sqlite3.connect(str(path))
+    try:
+        while not stop.wait(every):
+            t0 = time.perf_counter()
+            try:
+                busy, _, _ = conn.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchone()
+            except sqlite3.Error as exc:
+                rec.record("checkpoint", time.perf_counter() - t0, "error", f"{type(exc).__name__}: {exc}")
+                continue
+            # A busy checkpoint could not finish because readers hold old snapshots.
+            rec.record("checkpoint", time.perf_counter() - t0, "busy" if busy else "ok")
+    finally:
+        conn.close()
+
+
+def run(
+    target,
+    db_path: Path,
+    mix: Dict[str, float],
+    concurrency: int = 8,
+    duration: float = 10.0,
+    requests: Optional[int] = None,
+    writers: int = 0,
+    write_interval: float = 0.01,
+    checkpoint_every: Optional[float] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Drive `target` with `concurrency` closed-loop readers until
+    `duration` seconds pass or `requests` requests are sent."""
+    workload = Workload.from_database(db_path)
+    names = [n for n in mix if mix[n] > 0]
+    weights = [mix[n] for n in names]
+    budget = itertools.count() if requests else None
+    stop = threading.Event()
+    recorders: List[Recorder] = []
+
+    def thread(fn, *args) -> threading.Thread:
+        rec = Recorder()
+        recorders.append(rec)
+        return threading.Thread(target=fn, args=args + (rec,), daemon=True)
+
+    started = time.monotonic()
+    deadline = started + duration
+    readers = [
+        thread(_reader, target.session(), workload, names, weights, seed + i, deadline, budget, requests)
+        for i in range(concurrency)
+    ]
+    background = [thread(_writer, db_path, workload, seed + 1000 + i, write_interval, stop) for i in range(writers)]
+    if checkpoint_every:
+        background.append(thread(_checkpointer, db_path, checkpoint_every, stop))
+
+    for t in background + readers:
+        t.start()
+    for t in readers:
+        t.join()
+    elapsed = time.monotonic() - started
+    stop.set()
+    for t in background:
+        t.join()
+
+    merged = Recorder()
+    for rec in recorders:
+        merged.merge(rec)
+    wal = Path(str(db_path) + "-wal")
+    return {
+        "meta": {
+            "target": target.name,
+            "database": str(db_path),
+            "concurrency": concurrency,
+            "writers": writers,
+            "mix": mix,
+            "seed": seed,
+            "elapsed_s": round(elapsed, 3),
+        },
+        "endpoints": summarize(merged, elapsed),
+        "error_samples": merged.samples,
+        "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+    }
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    cols = ("requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "error_rate")
+    lines = [f"{'endpoint':<12}" + "".join(f"{c:>15}" for c in cols)]
+    for name, stats in report["endpoints"].items():
+        cells = []
+        for c in cols:
+            value = stats[c]
+            cells.append(f"{'-' if value is None else (f'{value:.2%}' if c == 'error_rate' else value):>15}")
+        lines.append(f"{name:<12}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m vaccine_py.bench.load", description=__doc__.splitlines()[0])
+    ap.add_argument("--url", help="base URL of a running server (default: app.test_client() in-process)")
+    ap.add_argument("--db", help=f"database the workload and writers use (default: {coverage.DB_PATH})")
+    ap.add_argument("--rows", type=parse_size, help="use a generated database of this size instead of --db")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    ap.add_argument("--requests", type=int, help="stop after this many requests")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (endpoints: {', '.join(ENDPOINTS)})")
+    ap.add_argument("--writers", type=int, default=0, help="threads upserting single rows concurrently")
+    ap.add_argument("--write-interval", type=float, default=0.01, help="seconds between a writer's upserts")
+    ap.add_argument("--checkpoint-every", type=float, help="seconds between PASSIVE WAL checkpoints")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write the report as JSON")
+    args = ap.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        ap.error(str(exc))
+    if args.concurrency < 1:
+        ap.error("--concurrency must be at least 1")
+
+    if args.rows:
+        db_path = cached_database(args.rows, args.seed)
+    else:
+        db_path = Path(args.db) if args.db else coverage.DB_PATH
+
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        try:
+            from vaccine_py.app import app
+        except ImportError:
+            from ..app import app
+        coverage.DB_PATH = db_path
+        coverage.init_db()
+        target = InProcessTarget(app)
+
+    report = run(
+        target, db_path, mix, args.concurrency, args.duration, args.requests,
+        args.writers, args.write_interval, args.checkpoint_every, args.seed,
+    )
+    print(format_table(report))
+    for msg in report["error_samples"]:
+        print(f"  error {msg}", file=sys.stderr)
+    if report["wal_bytes"]:
+        print(f"WAL at exit: {report['wal_bytes'] / 1024:,.0f} KiB")
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return 1 if report["endpoints"]["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
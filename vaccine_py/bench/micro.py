@@ -0,0 +1,221 @@
+"""Microbenchmarks for the coverage service functions.
+
+    python -m vaccine_py.bench.micro [--sizes 1e3,1e5,1e6] [--backends sql,memory]
+                                     [--out bench.json] [--baseline baseline.json]
+
+Each case runs against a synthetic database (see bench/generate.py) with the
+result cache disabled, so the numbers are query cost rather than LRU hits.
+After one warm-up call (which also builds the memory snapshot) a case is
+repeated `--repeat` times or for `--min-time` seconds, whichever is longer.
+
+With `--baseline`, a case whose median is slower than the baseline's by more
+than `--tolerance` (and by more than `--floor-ms`) is a regression and the
+exit status is 1. `--update-baseline` writes the results to the baseline file.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from vaccine_py.bench.generate import GENERATOR_VERSION, cached_database, country_codes, layout, parse_size
+    from vaccine_py.services import coverage
+except ImportError:
+    from .generate import GENERATOR_VERSION, cached_database, country_codes, layout, parse_size
+    from ..services import coverage
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_FLOOR_MS = 0.5
+TRENDS_COUNTRIES = 20
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def cases(rows: int) -> List[Case]:
+    """(name, call) pairs for a database generated with `rows` rows."""
+    n_countries, _, _ = layout(rows)
+    codes = country_codes(n_countries)
+    country = codes[len(codes) // 2]
+    sample = codes[:: max(1, len(codes) // TRENDS_COUNTRIES)][:TRENDS_COUNTRIES]
+    out: List[Case] = [
+        (f"filter_{sort}", lambda sort=sort: coverage.get_filtered_data(vaccine="MMR", sort=sort))
+        for sort in coverage.SORTS
+    ]
+    out += [
+        ("compare", lambda: coverage.compare_country(country, 2024, "MMR")),
+        ("trends_latest", lambda: coverage.get_trends("MMR", sample, latest_only=True)),
+        ("trends_full", lambda: coverage.get_trends("MMR", sample, latest_only=False)),
+        ("rank", lambda: coverage.get_rank(sample, "MMR", 2024)),
+    ]
+    return out
+
+
+def _size(result: Any) -> int:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return int(result.get("count", 1))
+    return 1
+
+
+def measure(call: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    """Warm up once, then time `call`; durations in milliseconds."""
+    result = call()
+    times: List[float] = []
+    started = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "median_ms": round(statistics.median(times), 4),
+        "min_ms": round(min(times), 4),
+        "mean_ms": round(statistics.fmean(times), 4),
+        "runs": len(times),
+        "result_size": _size(result),
+    }
+
+
+@contextmanager
+def using(path: Path, backend: str) -> Iterator[None]:
+    """Point the coverage service at `path` with `backend`, uncached."""
+    saved = (coverage.DB_PATH, coverage.BACKEND, coverage.RESULT_CACHE.maxsize)
+    coverage.DB_PATH = Path(path)
+    coverage.set_backend(backend)
+    coverage.RESULT_CACHE.maxsize = 0
+    try:
+        coverage.init_db()
+        yield
+    finally:
+        coverage.DB_PATH = saved[0]
+        coverage.set_backend(saved[1])
+        coverage.RESULT_CACHE.maxsize = saved[2]
+
+
+def run(
+    sizes=DEFAULT_SIZES,
+    backends=coverage.BACKENDS,
+    seed: int = 0,
+    repeat: int = 5,
+    min_time: float = 0.2,
+    data_dir: Optional[Path] = None,
+    only: Optional[str] = None,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Results keyed `<backend>/<rows>/<case>`, plus run metadata."""
+    results: Dict[str, Dict[str, Any]] = {}
+    for rows in sizes:
+        path = cached_database(rows, seed, data_dir)
+        for backend in backends:
+            with using(path, backend):
+                for name, call in cases(rows):
+                    if only and only not in name:
+                        continue
+                    key = f"{backend}/{rows}/{name}"
+                    results[key] = measure(call, repeat, min_time)
+                    if progress:
+                        progress(key, results[key])
+    return {
+        "meta": {
+            "generator": GENERATOR_VERSION,
+            "seed": seed,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    floor_ms: float = DEFAULT_FLOOR_MS,
+) -> List[Dict[str, Any]]:
+    """Cases in both runs whose median regressed past the budget."""
+    regressions = []
+    base = baseline.get("results", {})
+    for key, now in sorted(current.get("results", {}).items()):
+        before = base.get(key)
+        if not before:
+            continue
+        old, new = before["median_ms"], now["median_ms"]
+        if new - old > floor_ms and new > old * (1.0 + tolerance):
+            regressions.append(
+                {"case": key, "baseline_ms": old, "median_ms": new, "ratio": round(new / old, 2) if old else None}
+            )
+    return regressions
+
+
+def _print_row(key: str, r: Dict[str, Any]) -> None:
+    print(f"{key:<40} {r['median_ms']:>11.3f} {r['min_ms']:>11.3f} {r['runs']:>6} {r['result_size']:>9}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m vaccine_py.bench.micro", description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                    help="comma-separated row counts, e.g. 1e3,1e5")
+    ap.add_argument("--backends", default=",".join(coverage.BACKENDS))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds to keep repeating each case")
+    ap.add_argument("--only", help="run only cases whose name contains this")
+    ap.add_argument("--data-dir", help="where generated databases are cached")
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--baseline", help="JSON results to compare against")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="allowed slowdown as a fraction of the baseline median")
+    ap.add_argument("--floor-ms", type=float, default=DEFAULT_FLOOR_MS,
+                    help="ignore slowdowns smaller than this many milliseconds")
+    ap.add_argument("--update-baseline", action="store_true", help="write the results to --baseline")
+    args = ap.parse_args(argv)
+
+    try:
+        sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError as exc:
+        ap.error(str(exc))
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = sorted(set(backends) - set(coverage.BACKENDS))
+    if unknown:
+        ap.error(f"unknown backend(s): {', '.join(unknown)}")
+
+    print(f"{'case':<40} {'median ms':>11} {'min ms':>11} {'runs':>6} {'rows':>9}")
+    report = run(
+        sizes, backends, args.seed, args.repeat, args.min_time,
+        Path(args.data_dir) if args.data_dir else None, args.only, _print_row,
+    )
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if not args.baseline:
+        return 0
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline written to {baseline_path}")
+        return 0
+
+    regressions = compare(
+        report, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance, args.floor_ms
+    )
+    for r in regressions:
+        print(f"REGRESSION {r['case']}: {r['baseline_ms']:.3f} -> {r['median_ms']:.3f} ms (x{r['ratio']})")
+    if regressions:
+        return 1
+    print(f"no regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Content-Encoding negotiation, precompressed bodies and on-the-fly compression.
+
+Brotli is used for precompressed bodies when the optional `brotli` package is
+installed; gzip is always available. Dynamic responses (JSON, NDJSON, CSV)
+are compressed with gzip or deflate by `compress_response`.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+IDENTITY = "identity"
+# Preference order when the client accepts several encodings equally.
+PREFERRED = ("br", "gzip")
+
+
+def negotiate(available: Iterable[str], preferred: Tuple[str, ...] = PREFERRED) -> str:
+    """Best encoding in `available` that the request's Accept-Encoding allows."""
+    accept = request.accept_encodings
+    best, best_q = IDENTITY, 0.0
+    for enc in preferred:
+        if enc not in available:
+            continue
+        q = accept.quality(enc)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class Precompressed:
+    """One response body stored once per encoding, each with a strong ETag.
+
+    Variants that would not be smaller than the identity body are dropped.
+    """
+
+    def __init__(self, body: bytes, mimetype: str) -> None:
+        self.mimetype = mimetype
+        self.digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        variants: Dict[str, bytes] = {IDENTITY: body}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+        variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        self.variants = {
+            enc: data for enc, data in variants.items() if enc == IDENTITY or len(data) < len(body)
+        }
+
+    def etag(self, encoding: str) -> str:
+        return self.digest if encoding == IDENTITY else f"{self.digest}-{encoding}"
+
+    def response(self, cache_control: str, encoding: Optional[str] = None) -> Response:
+        enc = encoding or negotiate(self.variants)
+        etag = self.etag(enc)
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(self.variants[enc], mimetype=self.mimetype)
+            if enc != IDENTITY:
+                resp.headers["Content-Encoding"] = enc
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = cache_control
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+
+# ----------------------- Dynamic responses -----------------------
+# zlib level for dynamic responses; 0 turns compression off.
+COMPRESS_LEVEL = int(os.environ.get("VACCINE_COMPRESS_LEVEL", "6"))
+# Buffered bodies smaller than this are sent as-is; streamed bodies have no
+# known size and are always compressed.
+COMPRESS_MIN_SIZE = int(os.environ.get("VACCINE_COMPRESS_MIN_SIZE", "1024"))
+COMPRESSIBLE = frozenset({"application/json", "application/x-ndjson", "text/csv"})
+# Encoding -> zlib wbits (31: gzip container, 15: zlib stream as HTTP "deflate").
+DYNAMIC_ENCODINGS: Dict[str, int] = {"gzip": 31, "deflate": 15}
+
+
+def _compressor(encoding: str):
+    return zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, DYNAMIC_ENCODINGS[encoding])
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    # Each chunk is flushed as it arrives, so the client sees rows as soon as
+    # the producer yields them and nothing is held back beyond one chunk.
+    comp = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if chunk:
+                out = comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)
+                if out:
+                    yield out
+        yield comp.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(resp: Response) -> Response:
+    """Compress a 200 JSON/NDJSON/CSV response for clients that accept it.
+
+    Buffered bodies are compressed once, in place; streamed bodies are
+    wrapped so each chunk is compressed as it is produced. A strong ETag
+    gets the encoding appended, matching `Precompressed.etag`.
+    """
+    if (
+        COMPRESS_LEVEL <= 0
+        or resp.status_code != 200
+        or resp.mimetype not in COMPRESSIBLE
+        or "Content-Encoding" in resp.headers
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    enc = negotiate(DYNAMIC_ENCODINGS, preferred=tuple(DYNAMIC_ENCODINGS))
+    if enc == IDENTITY:
+        return resp
+
+    if resp.is_streamed:
+        resp.response = _compress_stream(resp.iter_encoded(), enc)
+        resp.headers.pop("Content-Length", None)
+    else:
+        body = resp.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return resp
+        comp = _compressor(enc)
+        resp.set_data(comp.compress(body) + comp.flush())
+    resp.headers["Content-Encoding"] = enc
+
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(f"{etag}-{enc}")
+    return resp
@@ -0,0 +1,126 @@
+"""Conditional-GET helpers: data-version ETags and per-route cache policies."""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Flask, Response, current_app, request
+
+try:
+    from vaccine_py.compression import DYNAMIC_ENCODINGS, Precompressed
+    from vaccine_py.services.coverage import country_index, data_version
+    from vaccine_py.vendor import bootstrap_tags
+except ImportError:
+    from .compression import DYNAMIC_ENCODINGS, Precompressed
+    from .services.coverage import country_index, data_version
+    from .vendor import bootstrap_tags
+
+# JSON results may be stored, but must be revalidated; unchanged data answers 304.
+DATA_POLICY = "public, no-cache"
+# HTML pages only change on deploy.
+PAGE_POLICY = "public, max-age=300"
+# Everything else (health, errors, POST results) is never stored.
+DEFAULT_POLICY = "no-store, max-age=0"
+
+
+def _request_key() -> str:
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    h = hashlib.blake2b(digest_size=8)
+    h.update(request.path.encode("utf-8"))
+    h.update(b"?")
+    h.update(args.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _not_modified(etag: str, last_modified: datetime) -> Optional[str]:
+    """The ETag the client already holds (`etag` or a compressed variant of
+    it, see compression.py), or None when the view has to run."""
+    if request.if_none_match:
+        for candidate in (etag, *(f"{etag}-{enc}" for enc in DYNAMIC_ENCODINGS)):
+            if request.if_none_match.contains_weak(candidate):
+                return candidate
+        return None
+    ims = request.if_modified_since
+    return etag if ims is not None and last_modified <= ims else None
+
+
+def data_cached(view: Callable) -> Callable:
+    """Tag a GET view's response with a strong ETag and Last-Modified derived
+    from the `data_state` version, answering 304 before running the view when
+    the client already has the current representation."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+
+        state = data_version()
+        etag = f"v{state['version']}-{_request_key()}"
+        last_modified = datetime.fromtimestamp(int(state["updated_at"]), tz=timezone.utc)
+
+        held = _not_modified(etag, last_modified)
+        if held:
+            etag = held
+            resp = Response(status=304)
+        else:
+            resp = current_app.make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+
+        resp.set_etag(etag)
+        resp.last_modified = last_modified
+        resp.headers["Cache-Control"] = DATA_POLICY
+        return resp
+
+    return wrapper
+
+
+# Rendered pages by path, with the inputs they were rendered from. Pages embed
+# the country list and the Bootstrap tags; either changing re-renders them.
+_PAGES: Dict[str, Tuple[tuple, Precompressed]] = {}
+
+
+def _page_inputs() -> tuple:
+    return (country_index(), bootstrap_tags())
+
+
+def _rendered(view: Callable, args: tuple, kwargs: dict) -> Precompressed:
+    inputs = _page_inputs()
+    cached = _PAGES.get(request.path)
+    if cached is not None and cached[0] == inputs:
+        return cached[1]
+    resp = current_app.make_response(view(*args, **kwargs))
+    page = Precompressed(resp.get_data(), resp.mimetype)
+    _PAGES[request.path] = (inputs, page)
+    return page
+
+
+def static_page(view: Callable) -> Callable:
+    """Render an HTML page once and serve it precompressed (gzip, and brotli
+    when installed) with a strong per-encoding ETag and `PAGE_POLICY`."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return _rendered(view, args, kwargs).response(PAGE_POLICY)
+
+    wrapper.static_page = True
+    return wrapper
+
+
+def prerender_pages(app: Flask) -> int:
+    """Render every `static_page` route ahead of the first request."""
+    count = 0
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if getattr(view, "static_page", False) and not rule.arguments:
+            with app.test_request_context(rule.rule):
+                _rendered(view.__wrapped__, (), {})
+            count += 1
+    return count
+
+
+def apply_default_policy(resp: Response) -> Response:
+    resp.headers.setdefault("Cache-Control", DEFAULT_POLICY)
+    return resp
@@ -0,0 +1,129 @@
+"""Per-route request metrics and the `/metrics` exposition.
+
+Routes are labelled by their rule (`/trends`, `/vendor/<name>`), never the raw
+path, so label cardinality stays bounded; unmatched paths share one label.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from flask import Flask, Response, g, request
+
+try:
+    from vaccine_py.services.coverage import SQL_STATS, cache_stats, pool_stats
+    from vaccine_py.services.metrics import DEFAULT_BUCKETS, Histogram, render, render_histograms, render_values
+except ImportError:
+    from .services.coverage import SQL_STATS, cache_stats, pool_stats
+    from .services.metrics import DEFAULT_BUCKETS, Histogram, render, render_histograms, render_values
+
+UNMATCHED = "<unmatched>"
+EXPOSITION_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestMetrics:
+    """Latency histograms, request/error counters and in-flight gauges,
+    keyed by (method, route)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._durations: Dict[Tuple[str, str], Histogram] = {}
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._in_flight: Dict[Tuple[str, str], int] = {}
+
+    def start(self, method: str, route: str) -> None:
+        key = (method, route)
+        with self._lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+    def finish(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route)
+        with self._lock:
+            self._in_flight[key] -= 1
+            h = self._durations.get(key)
+            if h is None:
+                h = self._durations[key] = Histogram(self.buckets)
+            h.observe(seconds)
+            rkey = (method, route, str(status))
+            self._requests[rkey] = self._requests.get(rkey, 0) + 1
+            if status >= 500:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._requests.clear()
+            self._errors.clear()
+
+    def exposition(self, prefix: str = "vaccine_http") -> List[str]:
+        def labels(key: tuple) -> tuple:
+            return tuple(zip(("method", "route", "status"), key))
+
+        with self._lock:
+            durations = {labels(k): h.copy() for k, h in self._durations.items()}
+            requests = {labels(k): n for k, n in self._requests.items()}
+            errors = {labels(k): n for k, n in self._errors.items()}
+            in_flight = {labels(k): n for k, n in self._in_flight.items()}
+        lines = render_histograms(f"{prefix}_request_duration_seconds", "Request latency by route.", durations)
+        lines += render_values(f"{prefix}_requests_total", "counter", "Requests by route and status.", requests)
+        lines += render_values(f"{prefix}_request_errors_total", "counter",
+                               "Requests that failed with a 5xx or an exception.", errors)
+        lines += render_values(f"{prefix}_requests_in_flight", "gauge", "Requests being handled now.", in_flight)
+        return lines
+
+
+REQUEST_METRICS = RequestMetrics()
+
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED
+
+
+def install(app: Flask, metrics: RequestMetrics = REQUEST_METRICS) -> None:
+    """Time every request from `before_request` to `teardown_request` (for
+    streamed responses: until the stream is closed)."""
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics = (time.perf_counter(), request.method, _route())
+        metrics.start(request.method, g._metrics[2])
+
+    @app.after_request
+    def _metrics_status(resp):
+        g._metrics_status = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def _metrics_finish(exc):
+        started = g.pop("_metrics", None)
+        if started is None:
+            return
+        status = 500 if exc is not None else g.pop("_metrics_status", 500)
+        metrics.finish(started[1], started[2], status, time.perf_counter() - started[0])
+
+
+def exposition() -> str:
+    lines = render_values("vaccine_process_info", "gauge", "Serving process.", {(("pid", str(os.getpid())),): 1})
+    lines += REQUEST_METRICS.exposition()
+    lines += SQL_STATS.exposition()
+
+    pool = pool_stats()
+    for key, kind in (("in_use", "gauge"), ("idle", "gauge"), ("size", "gauge"),
+                      ("checkouts", "counter"), ("waits", "counter"), ("timeouts", "counter")):
+        name = f"vaccine_pool_{key}" + ("_total" if kind == "counter" else "")
+        lines += render_values(name, kind, f"Read connection pool: {key.replace('_', ' ')}.", {(): pool[key]})
+
+    cache = cache_stats()
+    for key in ("hits", "misses", "evictions", "invalidations"):
+        lines += render_values(f"vaccine_result_cache_{key}_total", "counter",
+                               f"Result cache {key}.", {(): cache[key]})
+    lines += render_values("vaccine_result_cache_size", "gauge", "Result cache entries.", {(): cache["size"]})
+    return render(lines)
+
+
+def metrics_response() -> Response:
+    return Response(exposition(), content_type=EXPOSITION_MIMETYPE)
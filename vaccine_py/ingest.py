@@ -0,0 +1,284 @@
+"""Bulk-load WHO/UNICEF (WUENIC) coverage CSVs into the `coverage` table.
+
+    python -m vaccine_py.ingest wuenic.csv [--batch-size 5000] [--bulk auto|always|never]
+
+Rows are streamed from the file, validated against the `coverage` CHECK
+constraints and upserted in `executemany` batches inside one transaction, so
+memory stays flat regardless of file size.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from vaccine_py.services import coverage
+    from vaccine_py.services.aggregates import rebuild_coverage_agg, rebuild_coverage_latest, refresh_coverage_rollup
+    from vaccine_py.services.alerts import detect_alerts
+except ImportError:
+    from .services import coverage
+    from .services.aggregates import rebuild_coverage_agg, rebuild_coverage_latest, refresh_coverage_rollup
+    from .services.alerts import detect_alerts
+
+Row = Tuple[str, str, int, float]
+
+# Accepted header names per column, in order of preference (case-insensitive).
+# WUENIC exports use iso3/vaccine/coverage, the WHO data portal CODE/ANTIGEN/COVERAGE.
+COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "country": ("iso3", "code", "iso_code", "country_code", "country"),
+    "vaccine": ("vaccine", "antigen", "vaccine_code"),
+    "year": ("year",),
+    "coverage": ("coverage", "wuenic", "value"),
+    "category": ("coverage_category",),
+}
+
+UPSERT_SQL = """
+    INSERT INTO coverage (country, vaccine, year, coverage) VALUES (?, ?, ?, ?)
+    ON CONFLICT(country, vaccine, year) DO UPDATE SET coverage = excluded.coverage
+    WHERE coverage <> excluded.coverage;
+"""
+
+MAX_REJECT_SAMPLES = 20
+
+# Loads from files at least this large switch to bulk mode under --bulk auto.
+BULK_MIN_BYTES = 1_000_000
+
+# Derived tables rebuilt from `coverage` after a bulk load, in place of the
+# per-row triggers that are dropped for its duration.
+REBUILDERS: List[Callable[[sqlite3.Connection], Any]] = [
+    rebuild_coverage_agg,
+    rebuild_coverage_latest,
+    coverage.bump_data_version,
+]
+
+# Incremental maintenance run after every load with the set of
+# (country, vaccine) series the load touched.
+POST_INGEST: List[Callable[[sqlite3.Connection, Set[Tuple[str, str]]], Any]] = [
+    detect_alerts,
+    refresh_coverage_rollup,
+]
+
+
+class IngestError(ValueError):
+    pass
+
+
+def _resolve_columns(header: Iterable[str]) -> Dict[str, str]:
+    by_lower = {h.strip().lower(): h for h in header if h}
+    cols: Dict[str, str] = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_lower:
+                cols[field] = by_lower[alias]
+                break
+    missing = [f for f in ("country", "vaccine", "year", "coverage") if f not in cols]
+    if missing:
+        raise IngestError(f"CSV is missing column(s): {', '.join(missing)}")
+    return cols
+
+
+def validate_row(country: Any, vaccine: Any, year: Any, cov: Any) -> Row:
+    """Normalise one record; raises IngestError if `coverage` would reject it."""
+    c = str(country or "").strip().upper()
+    if len(c) != 3 or not c.isalpha():
+        raise IngestError(f"invalid country code: {country!r}")
+    v = str(vaccine or "").strip().upper()
+    if not v:
+        raise IngestError("missing vaccine")
+    try:
+        y = int(str(year).strip())
+    except (TypeError, ValueError):
+        raise IngestError(f"invalid year: {year!r}") from None
+    try:
+        pct = float(str(cov).strip())
+    except (TypeError, ValueError):
+        raise IngestError(f"invalid coverage: {cov!r}") from None
+    if not 0 <= pct <= 100:
+        raise IngestError(f"coverage out of range 0-100: {pct}")
+    return c, v, y, pct
+
+
+def read_rows(
+    fh: Iterable[str],
+    category: Optional[str] = "WUENIC",
+    rejects: Optional[Dict[str, Any]] = None,
+) -> Iterator[Row]:
+    """Yield validated rows from a CSV stream.
+
+    Bad rows are counted in `rejects["count"]`; the first `MAX_REJECT_SAMPLES`
+    messages are kept in `rejects["samples"]`.
+    """
+    reader = csv.DictReader(fh)
+    cols = _resolve_columns(reader.fieldnames or [])
+    cat_col = cols.get("category")
+    for line_no, rec in enumerate(reader, start=2):
+        if cat_col and category and (rec.get(cat_col) or "").strip().upper() != category.upper():
+            continue
+        try:
+            yield validate_row(
+                rec.get(cols["country"]),
+                rec.get(cols["vaccine"]),
+                rec.get(cols["year"]),
+                rec.get(cols["coverage"]),
+            )
+        except IngestError as exc:
+            if rejects is not None:
+                rejects["count"] = rejects.get("count", 0) + 1
+                samples = rejects.setdefault("samples", [])
+                if len(samples) < MAX_REJECT_SAMPLES:
+                    samples.append(f"line {line_no}: {exc}")
+
+
+def _batches(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _coverage_objects(conn: sqlite3.Connection) -> List[Tuple[str, str, str]]:
+    """`idx_cov_*` indexes and all triggers on `coverage`, as (type, name, sql)."""
+    return [
+        tuple(r)
+        for r in conn.execute(
+            """
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name = 'coverage' AND sql IS NOT NULL
+              AND ((type = 'index' AND name LIKE 'idx\\_cov\\_%' ESCAPE '\\') OR type = 'trigger');
+            """
+        ).fetchall()
+    ]
+
+
+def ingest(
+    conn: sqlite3.Connection,
+    rows: Iterable[Row],
+    batch_size: int = 5000,
+    bulk: bool = False,
+    progress: Optional[Callable[[int, float], None]] = None,
+) -> Dict[str, Any]:
+    """Upsert `rows` into `coverage` in one transaction, then run the
+    `POST_INGEST` hooks on the (country, vaccine) series it touched.
+
+    With `bulk=True` the `idx_cov_*` indexes and the triggers on `coverage`
+    are dropped for the load, then recreated and the derived tables rebuilt
+    once at the end instead of row by row. In snapshot mode the committed
+    database is then published as the next read snapshot.
+    """
+    started = time.perf_counter()
+    loaded = 0
+    saved: List[Tuple[str, str, str]] = []
+    touched: Set[Tuple[str, str]] = set()
+
+    def track(batch: List[Row]) -> List[Row]:
+        touched.update((r[0], r[1]) for r in batch)
+        return batch
+
+    isolation = conn.isolation_level
+    conn.isolation_level = None
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        if bulk:
+            saved = _coverage_objects(conn)
+            for kind, name, _ in saved:
+                conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}";')
+
+        for batch in _batches(rows, batch_size):
+            conn.executemany(UPSERT_SQL, track(batch))
+            loaded += len(batch)
+            if progress:
+                progress(loaded, time.perf_counter() - started)
+
+        if bulk:
+            for _, _, sql in saved:
+                conn.execute(sql)
+            for rebuild in REBUILDERS:
+                rebuild(conn)
+        for hook in POST_INGEST:
+            hook(conn, touched)
+        conn.execute("COMMIT;")
+    except BaseException:
+        conn.execute("ROLLBACK;")
+        raise
+    finally:
+        conn.isolation_level = isolation
+
+    snapshot = coverage.publish_snapshot(conn) if coverage.SNAPSHOTS else None
+    seconds = time.perf_counter() - started
+    return {
+        "rows": loaded,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(loaded / seconds, 1) if seconds > 0 else None,
+        "bulk": bulk,
+        "series": len(touched),
+        "snapshot": snapshot.name if snapshot else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m vaccine_py.ingest", description=__doc__.splitlines()[0])
+    ap.add_argument("csv", help="CSV file to load, or - for stdin")
+    ap.add_argument("--db", help=f"SQLite database (default: {coverage.DB_PATH})")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--bulk", choices=("auto", "always", "never"), default="auto",
+                    help="drop and rebuild idx_cov_* indexes and triggers around the load")
+    ap.add_argument("--category", default="WUENIC",
+                    help="keep only rows with this COVERAGE_CATEGORY when the column exists ('' keeps all)")
+    args = ap.parse_args(argv)
+
+    if args.db:
+        coverage.DB_PATH = Path(args.db)
+    coverage.init_db()
+
+    if args.csv == "-":
+        fh = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+        size = 0
+    else:
+        fh = open(args.csv, "r", encoding="utf-8-sig", newline="")
+        size = Path(args.csv).stat().st_size
+    bulk = args.bulk == "always" or (args.bulk == "auto" and size >= BULK_MIN_BYTES)
+
+    calls = [0]
+
+    def report(n: int, secs: float) -> None:
+        calls[0] += 1
+        if calls[0] % 20 == 0:
+            print(f"  {n:>10,} rows  {n / secs if secs else 0:>10,.0f} rows/s", file=sys.stderr)
+
+    rejects: Dict[str, Any] = {"count": 0, "samples": []}
+    try:
+        with fh, closing(coverage.get_connection()) as conn:
+            stats = ingest(
+                conn,
+                read_rows(fh, category=args.category or None, rejects=rejects),
+                batch_size=args.batch_size,
+                bulk=bulk,
+                progress=report,
+            )
+    except IngestError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    for msg in rejects["samples"]:
+        print(f"  rejected {msg}", file=sys.stderr)
+    print(
+        f"loaded {stats['rows']:,} rows in {stats['seconds']}s "
+        f"({stats['rows_per_sec'] or 0:,.0f} rows/s, bulk={stats['bulk']}), "
+        f"rejected {rejects['count']:,}"
+        + (f", published {stats['snapshot']}" if stats["snapshot"] else "")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+"""Pre-forking production server.
+
+    python -m vaccine_py.serve --workers 4 --port 5055
+
+The master binds the listening socket, initializes the database and
+pre-renders the HTML pages once, then forks `--workers` processes that all
+accept on the shared socket; each worker opens its own read-only connection
+pool. Signals to the master:
+
+    SIGTERM / SIGINT   graceful stop: workers finish in-flight requests
+    SIGHUP             rolling restart: re-run init_db, start a new set of
+                       workers, retire the old ones as the new ones come up
+    SIGUSR1            log the worker table
+
+Workers send a heartbeat over a pipe every second; a worker that misses
+heartbeats for `--timeout` seconds is killed and replaced, as is one that
+exits unexpectedly. The worker table is written to `--status-file` and
+served under `workers` by `GET /health`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    from vaccine_py.app import app
+    from vaccine_py.httpcache import prerender_pages
+    from vaccine_py.services.coverage import init_db
+    from vaccine_py.services.pool import reset_pool
+    from vaccine_py.services.snapshots import reset_snapshots
+except ImportError:
+    from .app import app
+    from .httpcache import prerender_pages
+    from .services.coverage import init_db
+    from .services.pool import reset_pool
+    from .services.snapshots import reset_snapshots
+
+log = logging.getLogger("vaccine_py.serve")
+
+HEARTBEAT_INTERVAL = 1.0
+# A worker that dies this soon after starting counts as a crash loop.
+MIN_UPTIME = 2.0
+MAX_FAST_CRASHES = 5
+
+
+# ----------------------- Worker -----------------------
+class _RequestCounter:
+    """WSGI middleware counting requests served and in flight; a response
+    stays in flight until its body iterator is closed."""
+
+    def __init__(self, wsgi_app) -> None:
+        self.wsgi_app = wsgi_app
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        return ClosingIterator(body, self._done)
+
+    def _done(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+def _read_status(path: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["workers"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _run_worker(worker_id: int, sock: socket.socket, heartbeat_fd: int, opts: argparse.Namespace) -> None:
+    signal.set_wakeup_fd(-1)
+    for sig in (signal.SIGHUP, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    # Ctrl-C reaches the whole process group; the master decides what to do.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    counter = _RequestCounter(app.wsgi_app)
+    app.wsgi_app = counter
+    started = time.time()
+
+    def status() -> Dict[str, Any]:
+        return {
+            "id": worker_id,
+            "pid": os.getpid(),
+            "started_at": int(started),
+            "requests": counter.requests,
+            "in_flight": counter.in_flight,
+        }
+
+    def health() -> Dict[str, Any]:
+        return {"self": status(), "all": _read_status(opts.status_file)}
+
+    app.config["WORKER_STATUS"] = health
+    server = make_server(opts.host, opts.port, app, threaded=True, fd=sock.fileno())
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+
+    def beat() -> None:
+        while not stopping.is_set():
+            try:
+                os.write(heartbeat_fd, (json.dumps(status()) + "\n").encode("utf-8"))
+            except OSError:
+                return  # master is gone
+            stopping.wait(HEARTBEAT_INTERVAL)
+
+    threading.Thread(target=beat, daemon=True).start()
+    server.serve_forever()
+
+    deadline = time.monotonic() + opts.graceful_timeout
+    while counter.in_flight > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    server.server_close()
+
+
+# ----------------------- Master -----------------------
+class Worker:
+    def __init__(self, worker_id: int, pid: int, fd: int) -> None:
+        self.id = worker_id
+        self.pid = pid
+        self.fd = fd
+        self.started = time.monotonic()
+        self.last_seen = self.started
+        self.ready = False
+        self.retiring = False
+        self.signalled = False
+        self.stats: Dict[str, Any] = {}
+        self._buf = b""
+
+    def feed(self, data: bytes) -> None:
+        self._buf += data
+        *lines, self._buf = self._buf.split(b"\n")
+        for line in lines:
+            try:
+                self.stats = json.loads(line)
+            except ValueError:
+                continue
+            self.last_seen = time.monotonic()
+            self.ready = True
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            id=self.id,
+            pid=self.pid,
+            ready=self.ready,
+            retiring=self.retiring,
+            seconds_since_heartbeat=round(time.monotonic() - self.last_seen, 1),
+        )
+
+
+class Master:
+    def __init__(self, opts: argparse.Namespace) -> None:
+        self.opts = opts
+        self.workers: Dict[int, Worker] = {}
+        self.selector = selectors.DefaultSelector()
+        self.sock: Optional[socket.socket] = None
+        self.running = True
+        self.pending: List[int] = []
+        self.wake_fds: List[int] = []
+        self.fast_crashes = 0
+        self.restarts = 0
+
+    # ---- setup ----
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.opts.host, self.opts.port))
+        sock.listen(self.opts.backlog)
+        sock.set_inheritable(True)
+        self.sock = sock
+        return sock
+
+    def prepare(self) -> None:
+        """Work done once in the master and inherited by every worker."""
+        init_db()
+        prerender_pages(app)
+        # Never carry open SQLite connections (or snapshot locks) across fork().
+        reset_pool()
+        reset_snapshots()
+
+    # ---- workers ----
+    def spawn(self, worker_id: int) -> Worker:
+        rfd, wfd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(rfd)
+                self.selector.close()
+                for fd in self.wake_fds + [w.fd for w in self.workers.values()]:
+                    os.close(fd)
+                _run_worker(worker_id, self.sock, wfd, self.opts)
+            except BaseException:
+                log.exception("worker %d failed", worker_id)
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(wfd)
+        os.set_blocking(rfd, False)
+        worker = Worker(worker_id, pid, rfd)
+        self.workers[pid] = worker
+        self.selector.register(rfd, selectors.EVENT_READ, worker)
+        log.info("worker %d started (pid %d)", worker_id, pid)
+        return worker
+
+    def _free_ids(self) -> List[int]:
+        used = {w.id for w in self.workers.values() if not w.retiring}
+        return [i for i in range(self.opts.workers) if i not in used]
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            self.selector.unregister(worker.fd)
+            os.close(worker.fd)
+            code = os.waitstatus_to_exitcode(status)
+            if worker.retiring or not self.running:
+                log.info("worker %d (pid %d) stopped", worker.id, pid)
+                continue
+            uptime = time.monotonic() - worker.started
+            log.warning("worker %d (pid %d) exited with %s after %.1fs", worker.id, pid, code, uptime)
+            self.fast_crashes = self.fast_crashes + 1 if uptime < MIN_UPTIME else 0
+            if self.fast_crashes >= MAX_FAST_CRASHES:
+                log.error("workers keep crashing on start; shutting down")
+                self.running = False
+                return
+            self.restarts += 1
+
+    def check_heartbeats(self) -> None:
+        now = time.monotonic()
+        for w in list(self.workers.values()):
+            if now - w.last_seen > self.opts.timeout:
+                log.warning("worker %d (pid %d) missed heartbeats; killing", w.id, w.pid)
+                self._kill(w.pid, signal.SIGKILL)
+                w.last_seen = now
+
+    def rolling_restart(self) -> None:
+        log.info("rolling restart")
+        try:
+            init_db()
+            reset_pool()
+            reset_snapshots()
+        except Exception:
+            log.exception("init_db failed; keeping current workers")
+            return
+        for w in self.workers.values():
+            w.retiring = True
+
+    def retire_replaced(self) -> None:
+        """TERM one old worker for every new worker that is ready."""
+        ready = sum(1 for w in self.workers.values() if not w.retiring and w.ready)
+        old = [w for w in self.workers.values() if w.retiring]
+        signalled = sum(1 for w in old if w.signalled)
+        for w in old:
+            if signalled >= ready:
+                break
+            if not w.signalled:
+                self._kill(w.pid, signal.SIGTERM)
+                w.signalled = True
+                signalled += 1
+
+    def _kill(self, pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    # ---- status ----
+    def status(self) -> Dict[str, Any]:
+        return {
+            "master_pid": os.getpid(),
+            "restarts": self.restarts,
+            "workers": sorted((w.describe() for w in self.workers.values()), key=lambda d: (d["id"], d["pid"])),
+        }
+
+    def write_status(self) -> None:
+        tmp = f"{self.opts.status_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.status(), f)
+        os.replace(tmp, self.opts.status_file)
+
+    # ---- main loop ----
+    def _on_signal(self, signum, frame) -> None:
+        self.pending.append(signum)
+
+    def run(self) -> int:
+        wake_r, wake_w = os.pipe()
+        self.wake_fds = [wake_r, wake_w]
+        os.set_blocking(wake_r, False)
+        os.set_blocking(wake_w, False)
+        signal.set_wakeup_fd(wake_w)
+        self.selector.register(wake_r, selectors.EVENT_READ, None)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+        last_status = 0.0
+        while self.running:
+            for worker_id in self._free_ids():
+                self.spawn(worker_id)
+
+            for key, _ in self.selector.select(timeout=HEARTBEAT_INTERVAL):
+                if key.data is None:
+                    try:
+                        os.read(wake_r, 512)
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    data = os.read(key.fd, 65536)
+                except BlockingIOError:
+                    continue
+                if data:
+                    key.data.feed(data)
+
+            while self.pending:
+                signum = self.pending.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self.running = False
+                elif signum == signal.SIGHUP:
+                    self.rolling_restart()
+                elif signum == signal.SIGUSR1:
+                    log.info("status: %s", json.dumps(self.status()))
+
+            self.reap()
+            self.check_heartbeats()
+            self.retire_replaced()
+            if time.monotonic() - last_status >= HEARTBEAT_INTERVAL:
+                self.write_status()
+                last_status = time.monotonic()
+
+        self.stop()
+        return 0 if self.fast_crashes < MAX_FAST_CRASHES else 1
+
+    def stop(self) -> None:
+        log.info("stopping %d workers", len(self.workers))
+        for w in self.workers.values():
+            self._kill(w.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.opts.graceful_timeout + 1
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for w in self.workers.values():
+            self._kill(w.pid, signal.SIGKILL)
+        while self.workers:
+            pid, _ = os.waitpid(-1, 0)
+            self.workers.pop(pid, None)
+        try:
+            os.unlink(self.opts.status_file)
+        except OSError:
+            pass
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m vaccine_py.serve", description=__doc__.split("\n")[0])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=5055, help="0 picks a free port")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--backlog", type=int, default=2048)
+    p.add_argument("--timeout", type=float, default=30.0, help="seconds without a heartbeat before a worker is killed")
+    p.add_argument("--graceful-timeout", type=float, default=30.0, help="seconds a stopping worker may finish requests")
+    p.add_argument("--status-file", default=None, help="worker table as JSON (default: a file in the temp dir)")
+    opts = p.parse_args(argv)
+    if opts.workers < 1:
+        p.error("--workers must be at least 1")
+    return opts
+
+
+def main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+    opts = parse_args(argv)
+    if not hasattr(os, "fork"):
+        print("vaccine_py.serve needs os.fork(); use python -m vaccine_py.app on this platform", file=sys.stderr)
+        return 2
+
+    master = Master(opts)
+    sock = master.bind()
+    opts.port = sock.getsockname()[1]
+    opts.status_file = opts.status_file or os.path.join(
+        tempfile.gettempdir(), f"vaccine-serve-{os.getpid()}.json"
+    )
+    master.prepare()
+    print(f"Serving on http://{opts.host}:{opts.port} with {opts.workers} workers", flush=True)
+    return master.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,201 @@
+"""Maintenance for the derived tables kept current by triggers on `coverage`:
+`coverage_agg` (global averages per vaccine/year) and `coverage_latest`
+(latest point per country/vaccine), plus the `coverage_rollup` cube, which
+is refreshed after each ingest instead (see `refresh_coverage_rollup`).
+
+    python -m vaccine_py.services.aggregates rebuild
+    python -m vaccine_py.services.aggregates check
+"""
+from __future__ import annotations
+
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+try:
+    from vaccine_py.services.coverage import ROLLUP_DIMENSIONS, UNASSIGNED, get_connection, init_db
+except ImportError:
+    from .coverage import ROLLUP_DIMENSIONS, UNASSIGNED, get_connection, init_db
+
+REBUILD_SQL = """
+    INSERT INTO coverage_agg (vaccine, year, n, sum, avg, min, max)
+    SELECT vaccine, year, COUNT(*), SUM(coverage), AVG(coverage), MIN(coverage), MAX(coverage)
+    FROM coverage
+    GROUP BY vaccine, year;
+"""
+
+CHECK_SQL = """
+    SELECT l.vaccine, l.year, l.n AS live_n, l.avg AS live_avg, l.min AS live_min, l.max AS live_max,
+           a.n AS agg_n, a.avg AS agg_avg, a.min AS agg_min, a.max AS agg_max
+    FROM (
+        SELECT vaccine, year, COUNT(*) AS n, AVG(coverage) AS avg,
+               MIN(coverage) AS min, MAX(coverage) AS max
+        FROM coverage
+        GROUP BY vaccine, year
+    ) l
+    LEFT JOIN coverage_agg a ON a.vaccine = l.vaccine AND a.year = l.year
+    UNION ALL
+    SELECT a.vaccine, a.year, NULL, NULL, NULL, NULL, a.n, a.avg, a.min, a.max
+    FROM coverage_agg a
+    WHERE NOT EXISTS (
+        SELECT 1 FROM coverage c WHERE c.vaccine = a.vaccine AND c.year = a.year
+    );
+"""
+
+
+LATEST_REBUILD_SQL = """
+    INSERT INTO coverage_latest (country, vaccine, year, coverage)
+    SELECT country, vaccine, MAX(year), coverage
+    FROM coverage
+    GROUP BY country, vaccine;
+"""
+
+# Both directions: series whose stored point is missing or stale, and stored
+# points for series that no longer exist.
+LATEST_CHECK_SQL = """
+    SELECT c.country, c.vaccine, c.year AS live_year, c.coverage AS live_coverage,
+           l.year AS latest_year, l.coverage AS latest_coverage
+    FROM coverage c
+    LEFT JOIN coverage_latest l ON l.country = c.country AND l.vaccine = c.vaccine
+    WHERE c.year = (SELECT MAX(year) FROM coverage m WHERE m.country = c.country AND m.vaccine = c.vaccine)
+      AND (l.year IS NOT c.year OR l.coverage IS NOT c.coverage)
+    UNION ALL
+    SELECT l.country, l.vaccine, NULL, NULL, l.year, l.coverage
+    FROM coverage_latest l
+    WHERE NOT EXISTS (
+        SELECT 1 FROM coverage c WHERE c.country = l.country AND c.vaccine = l.vaccine
+    );
+"""
+
+
+def _rollup_select(dimension: str, where: str = "") -> str:
+    col = ROLLUP_DIMENSIONS[dimension]
+    return f"""
+        SELECT '{dimension}', COALESCE(m.{col}, '{UNASSIGNED}'), c.vaccine, c.year,
+               COUNT(*), SUM(c.coverage), SUM(c.coverage * c.coverage), MIN(c.coverage), MAX(c.coverage)
+        FROM coverage c
+        LEFT JOIN country_meta m ON m.country = c.country
+        {where}
+        GROUP BY 2, c.vaccine, c.year
+    """
+
+
+_ROLLUP_INSERT = "INSERT INTO coverage_rollup (dimension, grp, vaccine, year, n, sum, sumsq, min, max) "
+
+
+def rebuild_coverage_agg(conn: sqlite3.Connection) -> int:
+    """Recompute `coverage_agg` from scratch; returns the number of groups."""
+    conn.execute("DELETE FROM coverage_agg;")
+    conn.execute(REBUILD_SQL)
+    return conn.execute("SELECT COUNT(*) FROM coverage_agg;").fetchone()[0]
+
+
+def check_coverage_agg(conn: sqlite3.Connection, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+    """Groups where `coverage_agg` disagrees with a live AVG over `coverage`."""
+    mismatches = []
+    for r in conn.execute(CHECK_SQL).fetchall():
+        row = dict(r)
+        ok = (
+            row["live_n"] is not None
+            and row["agg_n"] == row["live_n"]
+            and abs(row["agg_avg"] - row["live_avg"]) <= tolerance
+            and row["agg_min"] == row["live_min"]
+            and row["agg_max"] == row["live_max"]
+        )
+        if not ok:
+            mismatches.append(row)
+    return mismatches
+
+
+def rebuild_coverage_latest(conn: sqlite3.Connection) -> int:
+    """Backfill `coverage_latest` from scratch; returns the number of series."""
+    conn.execute("DELETE FROM coverage_latest;")
+    conn.execute(LATEST_REBUILD_SQL)
+    return conn.execute("SELECT COUNT(*) FROM coverage_latest;").fetchone()[0]
+
+
+def check_coverage_latest(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Series where `coverage_latest` disagrees with the latest row in `coverage`."""
+    return [dict(r) for r in conn.execute(LATEST_CHECK_SQL).fetchall()]
+
+
+def rebuild_coverage_rollup(conn: sqlite3.Connection) -> int:
+    """Recompute the whole cube, e.g. after editing `country_meta`; returns
+    the number of cells."""
+    conn.execute("DELETE FROM coverage_rollup;")
+    for dimension in ROLLUP_DIMENSIONS:
+        conn.execute(_ROLLUP_INSERT + _rollup_select(dimension))
+    return conn.execute("SELECT COUNT(*) FROM coverage_rollup;").fetchone()[0]
+
+
+def refresh_coverage_rollup(conn: sqlite3.Connection, touched: Iterable[Tuple[str, str]]) -> int:
+    """POST_INGEST hook: recompute the cube cells of every vaccine a load
+    touched, one pass over that vaccine's rows per dimension."""
+    vaccines: Set[str] = {v for _, v in touched}
+    for v in sorted(vaccines):
+        for dimension in ROLLUP_DIMENSIONS:
+            conn.execute("DELETE FROM coverage_rollup WHERE dimension = ? AND vaccine = ?;", (dimension, v))
+            conn.execute(_ROLLUP_INSERT + _rollup_select(dimension, "WHERE c.vaccine = ?"), (v,))
+    return len(vaccines)
+
+
+def check_coverage_rollup(conn: sqlite3.Connection, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+    """Cube cells that disagree with a live GROUP BY over `coverage`."""
+    live: Dict[tuple, tuple] = {}
+    for dimension in ROLLUP_DIMENSIONS:
+        for r in conn.execute(_rollup_select(dimension)).fetchall():
+            live[tuple(r[:4])] = tuple(r[4:])
+    stored = {
+        tuple(r[:4]): tuple(r[4:])
+        for r in conn.execute(
+            "SELECT dimension, grp, vaccine, year, n, sum, sumsq, min, max FROM coverage_rollup;"
+        ).fetchall()
+    }
+    mismatches = []
+    for key in sorted(set(live) | set(stored)):
+        a, b = live.get(key), stored.get(key)
+        same = (
+            a is not None and b is not None and a[0] == b[0] and a[3:] == b[3:]
+            and all(abs(x - y) <= tolerance * max(1.0, abs(x)) for x, y in zip(a[1:3], b[1:3]))
+        )
+        if not same:
+            mismatches.append({"cell": key, "live": a, "stored": b})
+    return mismatches
+
+
+def main(argv: List[str]) -> int:
+    cmd = argv[0] if argv else "check"
+    if cmd not in ("rebuild", "check"):
+        print("usage: python -m vaccine_py.services.aggregates [rebuild|check]", file=sys.stderr)
+        return 2
+
+    init_db()
+    with get_connection() as conn:
+        if cmd == "rebuild":
+            groups = rebuild_coverage_agg(conn)
+            series = rebuild_coverage_latest(conn)
+            cells = rebuild_coverage_rollup(conn)
+            print(f"coverage_agg rebuilt: {groups} (vaccine, year) groups")
+            print(f"coverage_latest rebuilt: {series} (country, vaccine) series")
+            print(f"coverage_rollup rebuilt: {cells} cells")
+            return 0
+        mismatches = check_coverage_agg(conn)
+        stale = check_coverage_latest(conn)
+        cube = check_coverage_rollup(conn)
+    for m in mismatches:
+        print(f"MISMATCH {m['vaccine']} {m['year']}: live={m['live_avg']} agg={m['agg_avg']}")
+    for m in stale:
+        print(
+            f"MISMATCH latest {m['country']} {m['vaccine']}: live={m['live_year']}/{m['live_coverage']} "
+            f"stored={m['latest_year']}/{m['latest_coverage']}"
+        )
+    for m in cube:
+        print(f"MISMATCH rollup {' '.join(map(str, m['cell']))}: live={m['live']} stored={m['stored']}")
+    if mismatches or stale or cube:
+        return 1
+    print("coverage_agg, coverage_latest and coverage_rollup are consistent with coverage")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
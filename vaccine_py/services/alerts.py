@@ -0,0 +1,175 @@
+"""Coverage-drop detection backing the `/alerts` endpoint.
+
+    python -m vaccine_py.services.alerts rebuild
+
+`detect_alerts` rescans only the (country, vaccine) series it is given and
+rewrites their rows in `coverage_alerts`; ingest passes the series its rows
+touched, so the cost follows the size of the load, not of the table. Each
+alert stores its country's region from `country_meta`; run `rebuild` after
+editing that table.
+"""
+from __future__ import annotations
+
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from vaccine_py.services.coverage import (
+        UNASSIGNED,
+        cached_result,
+        country_groups,
+        country_name,
+        get_connection,
+        init_db,
+        norm_country_list,
+        norm_vaccine,
+        select_rows,
+    )
+except ImportError:
+    from .coverage import (
+        UNASSIGNED,
+        cached_result,
+        country_groups,
+        country_name,
+        get_connection,
+        init_db,
+        norm_country_list,
+        norm_vaccine,
+        select_rows,
+    )
+
+Series = Tuple[str, str]
+
+DEFAULT_THRESHOLD = 1.0
+MAX_ALERTS = 1000
+
+_DECLINES_SQL = """
+    INSERT INTO coverage_alerts
+        (country, vaccine, year, prev_year, prev_coverage, coverage, drop_pp, region)
+    SELECT d.country, d.vaccine, d.year, d.prev_year, d.prev_coverage, d.coverage,
+           ROUND(d.prev_coverage - d.coverage, 4), m.region
+    FROM (
+        SELECT c.country, c.vaccine, c.year, c.coverage,
+               LAG(c.year) OVER w AS prev_year,
+               LAG(c.coverage) OVER w AS prev_coverage
+        FROM coverage c
+        {join}
+        WINDOW w AS (PARTITION BY c.country, c.vaccine ORDER BY c.year)
+    ) d
+    LEFT JOIN country_meta m ON m.country = d.country
+    WHERE d.prev_coverage > d.coverage;
+"""
+
+
+def detect_alerts(conn: sqlite3.Connection, series: Optional[Iterable[Series]] = None) -> int:
+    """Recompute declines for `series` (all series when None); returns rows stored."""
+    if series is None:
+        conn.execute("DELETE FROM coverage_alerts;")
+        cur = conn.execute(_DECLINES_SQL.format(join=""))
+    else:
+        touched = sorted(set(series))
+        if not touched:
+            return 0
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _alert_series "
+            "(country TEXT, vaccine TEXT, PRIMARY KEY (country, vaccine));"
+        )
+        conn.execute("DELETE FROM _alert_series;")
+        conn.executemany("INSERT INTO _alert_series VALUES (?, ?);", touched)
+        conn.execute(
+            "DELETE FROM coverage_alerts "
+            "WHERE (country, vaccine) IN (SELECT country, vaccine FROM _alert_series);"
+        )
+        cur = conn.execute(
+            _DECLINES_SQL.format(
+                join="JOIN _alert_series s ON s.country = c.country AND s.vaccine = c.vaccine"
+            )
+        )
+    return cur.rowcount
+
+
+def resolve_region(name: Optional[str]) -> Optional[str]:
+    """Canonical region name for a case-insensitive `name`; raises ValueError.
+    UNASSIGNED, as in /aggregate, selects countries without a region."""
+    if not name or not name.strip():
+        return None
+    wanted = name.strip().lower()
+    regions = country_groups("region") + (UNASSIGNED,)
+    for region in regions:
+        if region.lower() == wanted:
+            return region
+    raise ValueError(f"Unknown region: {name}. Use one of: {', '.join(regions)}")
+
+
+def get_alerts(
+    threshold: float = DEFAULT_THRESHOLD,
+    region: Optional[str] = None,
+    vaccine: Optional[str] = None,
+    country: Optional[str] = None,
+    limit: int = 100,
+) -> Dict[str, Any]:
+    """Stored drops of at least `threshold` percentage points, largest first."""
+    reg = resolve_region(region)
+    v = norm_vaccine(vaccine)
+    countries = norm_country_list(country)
+    threshold = float(threshold)
+    limit = max(1, min(int(limit), MAX_ALERTS))
+    return cached_result(
+        ("alerts", threshold, reg, v, tuple(sorted(countries)), limit),
+        lambda: _query_alerts(threshold, reg, v, countries, limit),
+    )
+
+
+def _query_alerts(
+    threshold: float, region: Optional[str], v: Optional[str], countries: List[str], limit: int
+) -> Dict[str, Any]:
+    where = ["drop_pp >= ?"]
+    params: List[Any] = [threshold]
+    if region == UNASSIGNED:
+        where.append("region IS NULL")
+    elif region:
+        where.append("region = ?")
+        params.append(region)
+    if v:
+        where.append("vaccine = ?")
+        params.append(v)
+    if countries:
+        where.append(f"country IN ({','.join('?' for _ in countries)})")
+        params.extend(countries)
+
+    rows = select_rows(
+        f"""
+        SELECT country, vaccine, year, prev_year, prev_coverage, coverage, drop_pp, region
+        FROM coverage_alerts
+        WHERE {' AND '.join(where)}
+        ORDER BY drop_pp DESC, country, vaccine, year
+        LIMIT ?;
+        """,
+        tuple(params) + (limit,),
+    )
+    for r in rows:
+        r["country_name"] = country_name(r["country"])
+        r["drop_pp"] = round(r["drop_pp"], 1)
+    return {
+        "threshold": threshold,
+        "region": region,
+        "vaccine": v,
+        "alerts": rows,
+        "count": len(rows),
+    }
+
+
+def main(argv: List[str]) -> int:
+    if argv[:1] != ["rebuild"]:
+        print("usage: python -m vaccine_py.services.alerts rebuild", file=sys.stderr)
+        return 2
+    init_db()
+    with get_connection() as conn:
+        n = detect_alerts(conn)
+    print(f"coverage_alerts rebuilt: {n} declines")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from vaccine_py.services.pool import ConnectionPool, get_pool
+    from vaccine_py.services.watch import get_watch
+except ImportError:
+    from .pool import ConnectionPool, get_pool
+    from .watch import get_watch
+
+
+def _f32(x: float) -> float:
+    # array('f') stores float32; print it back with float32 precision so
+    # 95.1 comes out as 95.1 rather than 95.09999847412109.
+    return float(f"{x:.7g}")
+
+
+class ColumnarSnapshot:
+    """Immutable, array-backed copy of the `coverage` table.
+
+    Country and vaccine codes are interned into small lookup lists and stored
+    as `array('H')` indexes; years are `array('h')`, coverage `array('f')`.
+    """
+
+    def __init__(self, rows: List[Tuple[int, str, str, int, float]]) -> None:
+        self.countries: List[str] = []
+        self.vaccines: List[str] = []
+        country_ix: Dict[str, int] = {}
+        vaccine_ix: Dict[str, int] = {}
+
+        self.ids = array("q")
+        self.country = array("H")
+        self.vaccine = array("H")
+        self.year = array("h")
+        self.coverage = array("f")
+
+        self.by_country: Dict[int, array] = {}
+        self.by_vaccine: Dict[int, array] = {}
+
+        for pos, (rid, c, v, y, cov) in enumerate(rows):
+            ci = country_ix.get(c)
+            if ci is None:
+                ci = country_ix[c] = len(self.countries)
+                self.countries.append(c)
+                self.by_country[ci] = array("I")
+            vi = vaccine_ix.get(v)
+            if vi is None:
+                vi = vaccine_ix[v] = len(self.vaccines)
+                self.vaccines.append(v)
+                self.by_vaccine[vi] = array("I")
+            self.ids.append(rid)
+            self.country.append(ci)
+            self.vaccine.append(vi)
+            self.year.append(y)
+            self.coverage.append(cov)
+            self.by_country[ci].append(pos)
+            self.by_vaccine[vi].append(pos)
+
+        self.country_ix = country_ix
+        self.vaccine_ix = vaccine_ix
+
+        # (vaccine index, year) -> [n, sum] for compare's global average.
+        self.vy_totals: Dict[Tuple[int, int], List[float]] = {}
+        for pos in range(len(self.ids)):
+            key = (self.vaccine[pos], self.year[pos])
+            acc = self.vy_totals.setdefault(key, [0, 0.0])
+            acc[0] += 1
+            acc[1] += _f32(self.coverage[pos])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ---- helpers ----
+    def _row(self, pos: int) -> Dict[str, Any]:
+        return {
+            "country": self.countries[self.country[pos]],
+            "vaccine": self.vaccines[self.vaccine[pos]],
+            "year": self.year[pos],
+            "coverage": _f32(self.coverage[pos]),
+        }
+
+    def _positions(
+        self,
+        countries: Optional[List[str]] = None,
+        vaccine: Optional[str] = None,
+        year: Optional[int] = None,
+    ) -> List[int]:
+        vi = self.vaccine_ix.get(vaccine) if vaccine else None
+        if vaccine and vi is None:
+            return []
+        if countries:
+            cis = [self.country_ix[c] for c in countries if c in self.country_ix]
+            candidates: Any = sorted(p for ci in cis for p in self.by_country[ci])
+        elif vi is not None:
+            candidates = self.by_vaccine[vi]
+        else:
+            candidates = range(len(self.ids))
+
+        out = []
+        for pos in candidates:
+            if vi is not None and self.vaccine[pos] != vi:
+                continue
+            if year is not None and self.year[pos] != year:
+                continue
+            out.append(pos)
+        return out
+
+    def columns(self, positions: List[int], cols: Tuple[str, ...]) -> Dict[str, List[Any]]:
+        """Parallel lists of `cols` (table column names) for `positions`."""
+        out: Dict[str, List[Any]] = {}
+        for col in cols:
+            if col == "country":
+                names, cix = self.countries, self.country
+                out[col] = [names[cix[p]] for p in positions]
+            elif col == "vaccine":
+                names, vix = self.vaccines, self.vaccine
+                out[col] = [names[vix[p]] for p in positions]
+            elif col == "coverage":
+                cov = self.coverage
+                out[col] = [_f32(cov[p]) for p in positions]
+            elif col == "year":
+                out[col] = [self.year[p] for p in positions]
+            elif col == "id":
+                out[col] = [self.ids[p] for p in positions]
+            else:
+                raise KeyError(col)
+        return out
+
+    # ---- queries ----
+    def filter(
+        self,
+        countries: Optional[List[str]] = None,
+        vaccine: Optional[str] = None,
+        year: Optional[int] = None,
+        sort: str = "coverage_desc",
+        with_ids: bool = False,
+    ) -> List[Dict[str, Any]]:
+        positions = self.sorted_positions(countries, vaccine, year, sort)
+        rows = [self._row(p) for p in positions]
+        if with_ids:
+            for p, r in zip(positions, rows):
+                r["id"] = self.ids[p]
+        return rows
+
+    def sorted_positions(
+        self,
+        countries: Optional[List[str]] = None,
+        vaccine: Optional[str] = None,
+        year: Optional[int] = None,
+        sort: str = "coverage_desc",
+    ) -> List[int]:
+        positions = self._positions(countries, vaccine, year)
+        ids, cov, yr = self.ids, self.coverage, self.year
+        names = self.countries
+        cix = self.country
+        keys = {
+            "coverage_desc": lambda p: (-cov[p], ids[p]),
+            "coverage_asc": lambda p: (cov[p], ids[p]),
+            "year_desc": lambda p: (-yr[p], ids[p]),
+            "year_asc": lambda p: (yr[p], ids[p]),
+            "country_desc": lambda p: (_Desc(names[cix[p]]), ids[p]),
+            "country_asc": lambda p: (names[cix[p]], ids[p]),
+        }
+        positions.sort(key=keys.get(sort, keys["coverage_desc"]))
+        return positions
+
+    def seek(self, positions: List[int], sort: str, value: Any, row_id: int) -> int:
+        """Index of the first of `positions` (ordered by `sorted_positions`
+        with `sort`) that comes after the row with sort value `value` and id
+        `row_id`, as a page cursor holds them: a bisect, not a scan."""
+        col, order = _ORDER_KEYS.get(sort, _ORDER_KEYS["coverage_desc"])
+        ids = self.ids
+
+        def key(p: int) -> tuple:
+            return order(self.columns((p,), (col,))[col][0], ids[p])
+
+        return bisect_right(_Keyed(positions, key), order(value, row_id))
+
+    def compare(
+        self, country: str, year: int, vaccine: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        ci = self.country_ix.get(country)
+        if ci is None:
+            return None
+        vi = self.vaccine_ix.get(vaccine) if vaccine else None
+        if vaccine and vi is None:
+            return None
+        best = None
+        for pos in self.by_country[ci]:
+            if self.year[pos] != year:
+                continue
+            if vi is not None and self.vaccine[pos] != vi:
+                continue
+            if best is None or self.vaccines[self.vaccine[pos]] < self.vaccines[self.vaccine[best]]:
+                best = pos
+        if best is None:
+            return None
+        n, total = self.vy_totals[(self.vaccine[best], year)]
+        row = self._row(best)
+        row["avg_cov"] = total / n if n else None
+        return row
+
+    def compare_matrix(
+        self, countries: List[str], vaccines: List[str], years: List[int]
+    ) -> List[Dict[str, Any]]:
+        """Rows shaped like compare_batch's coverage_agg LEFT JOIN coverage."""
+        vis = {self.vaccine_ix[v] for v in vaccines if v in self.vaccine_ix}
+        yrs = set(years)
+        cis = {self.country_ix[c] for c in countries if c in self.country_ix}
+        out = []
+        for (vi, y), (n, total) in self.vy_totals.items():
+            if (vaccines and vi not in vis) or (years and y not in yrs):
+                continue
+            base = {"vaccine": self.vaccines[vi], "year": y, "global_avg": total / n, "n": n}
+            out.append(dict(base, country=None, coverage=None))
+            for pos in self.by_vaccine[vi]:
+                if self.year[pos] != y or (countries and self.country[pos] not in cis):
+                    continue
+                out.append(
+                    dict(base, country=self.countries[self.country[pos]], coverage=_f32(self.coverage[pos]))
+                )
+        return out
+
+    def matrix_counts(self, vaccines: List[str], years: List[int]) -> Tuple[int, int, int]:
+        """How many countries, vaccines and years `compare_matrix` would return
+        with no country filter, without building its rows."""
+        vis = {self.vaccine_ix[v] for v in vaccines if v in self.vaccine_ix}
+        yrs = set(years)
+        groups = {
+            (vi, y) for vi, y in self.vy_totals if (not vaccines or vi in vis) and (not years or y in yrs)
+        }
+        group_vaccines = {vi for vi, _ in groups}
+        if not vaccines and not years:
+            countries = len(self.countries)
+        else:
+            seen = set()
+            for vi in group_vaccines:
+                for pos in self.by_vaccine[vi]:
+                    if (vi, self.year[pos]) in groups:
+                        seen.add(self.country[pos])
+            countries = len(seen)
+        return countries, len(group_vaccines), len({y for _, y in groups})
+
+    def _in_years(self, pos: int, year_from: Optional[int], year_to: Optional[int]) -> bool:
+        y = self.year[pos]
+        return (year_from is None or y >= year_from) and (year_to is None or y <= year_to)
+
+    def latest(
+        self,
+        countries: Optional[List[str]] = None,
+        vaccine: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        return [self._row(p) for p in self.latest_positions(countries, vaccine, year_from, year_to)]
+
+    def latest_positions(
+        self,
+        countries: Optional[List[str]] = None,
+        vaccine: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+    ) -> List[int]:
+        positions = [
+            p for p in self._positions(countries, vaccine) if self._in_years(p, year_from, year_to)
+        ]
+        max_year: Dict[int, int] = {}
+        for pos in positions:
+            ci = self.country[pos]
+            if self.year[pos] > max_year.get(ci, -32768):
+                max_year[ci] = self.year[pos]
+        picked = [p for p in positions if self.year[p] == max_year[self.country[p]]]
+        picked.sort(
+            key=lambda p: (self.countries[self.country[p]], self.vaccines[self.vaccine[p]])
+        )
+        return picked
+
+    def series(
+        self,
+        countries: Optional[List[str]] = None,
+        vaccine: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Rows with `delta` to the previous year of the same series (null when
+        that year has no value), plus the series' `worst_delta`/`worst_year`
+        (as the SQL window query returns)."""
+        lowest = year_from - 1 if year_from is not None else None
+        positions = [
+            p for p in self._positions(countries, vaccine) if self._in_years(p, lowest, year_to)
+        ]
+        positions.sort(
+            key=lambda p: (self.country[p], self.vaccine[p], self.year[p])
+        )
+        rows: List[Dict[str, Any]] = []
+        prev_key = prev = None
+        start = 0
+        for pos in positions:
+            key = (self.country[pos], self.vaccine[pos])
+            row = self._row(pos)
+            if key != prev_key:
+                self._close_series(rows, start)
+                start = len(rows)
+                prev = None
+            if prev is not None and row["year"] - prev["year"] == 1:
+                row["delta"] = row["coverage"] - prev["coverage"]
+            else:
+                row["delta"] = None
+            prev, prev_key = row, key
+            if year_from is None or row["year"] >= year_from:
+                rows.append(row)
+        self._close_series(rows, start)
+        rows.sort(key=lambda r: (r["country"], r["year"], r["vaccine"]))
+        return rows
+
+    @staticmethod
+    def _close_series(rows: List[Dict[str, Any]], start: int) -> None:
+        group = rows[start:]
+        if not group:
+            return
+        deltas = [r for r in group if r["delta"] is not None]
+        worst = min(deltas, key=lambda r: (r["delta"], r["year"])) if deltas else group[0]
+        for r in group:
+            r["worst_delta"] = worst["delta"]
+            r["worst_year"] = worst["year"]
+
+
+class _Desc:
+    __slots__ = ("value",)
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+    def __lt__(self, other: "_Desc") -> bool:
+        return self.value > other.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Desc) and self.value == other.value
+
+
+# sort -> (column, key of (value, id)) giving `sorted_positions` order for
+# values as `columns` returns them.
+_ORDER_KEYS: Dict[str, Tuple[str, Callable[[Any, int], tuple]]] = {
+    "coverage_desc": ("coverage", lambda v, i: (-v, i)),
+    "coverage_asc": ("coverage", lambda v, i: (v, i)),
+    "year_desc": ("year", lambda v, i: (-v, i)),
+    "year_asc": ("year", lambda v, i: (v, i)),
+    "country_desc": ("country", lambda v, i: (_Desc(v), i)),
+    "country_asc": ("country", lambda v, i: (v, i)),
+}
+
+
+class _Keyed:
+    """`positions` seen through a sort key, for `bisect`."""
+
+    __slots__ = ("positions", "key")
+
+    def __init__(self, positions: List[int], key: Callable[[int], tuple]) -> None:
+        self.positions = positions
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, i: int) -> tuple:
+        return self.key(self.positions[i])
+
+
+class ColumnarEngine:
+    """Keeps a `ColumnarSnapshot` of one database, reloading it only when
+    `PRAGMA data_version` or the database file changes. Reads through `pool`
+    when given (a snapshot's), else the process-wide pool for `path`."""
+
+    def __init__(self, path: Path, pool: Optional[ConnectionPool] = None) -> None:
+        self.path = Path(path)
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ColumnarSnapshot] = None
+        self._generation = -1
+        self.loads = 0
+
+    def _load(self) -> ColumnarSnapshot:
+        with (self.pool or get_pool(self.path)).connection() as conn:
+            rows = conn.execute(
+                "SELECT id, country, vaccine, year, coverage FROM coverage ORDER BY id;"
+            ).fetchall()
+        self.loads += 1
+        return ColumnarSnapshot([tuple(r) for r in rows])
+
+    def snapshot(self) -> ColumnarSnapshot:
+        gen = get_watch(self.path).generation()
+        snap = self._snapshot
+        if snap is not None and gen == self._generation:
+            return snap
+        with self._lock:
+            if self._snapshot is None or gen != self._generation:
+                self._snapshot = self._load()
+                self._generation = gen
+            return self._snapshot
+
+
+_ENGINES: Dict[str, ColumnarEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(path: Path, pool: Optional[ConnectionPool] = None) -> ColumnarEngine:
+    engine = _ENGINES.get(str(path))
+    if engine is None:
+        with _ENGINES_LOCK:
+            engine = _ENGINES.setdefault(str(path), ColumnarEngine(path, pool))
+    return engine
+
+
+def drop_engine(path: Path) -> None:
+    with _ENGINES_LOCK:
+        _ENGINES.pop(str(path), None)
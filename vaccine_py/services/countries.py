@@ -0,0 +1,219 @@
+"""Country lookup shared by every endpoint that accepts country tokens.
+
+`CountryIndex` is built once from ISO codes, display names and aliases and
+answers `resolve()` (exact token -> ISO code) and `suggest()` (typeahead)
+with dictionary lookups: every prefix of every name, alias and word is
+precomputed, and trigram posting lists back a fuzzy fallback for typos.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+ISO_TO_NAME: Dict[str, str] = {
+    "AUS": "Australia",
+    "NZL": "New Zealand",
+    "GBR": "United Kingdom",
+    "USA": "United States",
+    "CAN": "Canada",
+    "JPN": "Japan",
+    "DEU": "Germany",
+    "FRA": "France",
+    "ITA": "Italy",
+    "ESP": "Spain",
+    "NLD": "Netherlands",
+    "SWE": "Sweden",
+    "NOR": "Norway",
+    "DNK": "Denmark",
+    "IRL": "Ireland",
+    "CHE": "Switzerland",
+    "BEL": "Belgium",
+    "AUT": "Austria",
+    "PRT": "Portugal",
+    "GRC": "Greece",
+    "POL": "Poland",
+    "CHN": "China",
+    "IND": "India",
+    "KOR": "South Korea",
+    "THA": "Thailand",
+    "VNM": "Viet Nam",
+    "BRA": "Brazil",
+    "MEX": "Mexico",
+    "ARG": "Argentina",
+    "CHL": "Chile",
+    "ZAF": "South Africa",
+    "TUR": "Türkiye",
+    "EGY": "Egypt",
+    "KEN": "Kenya",
+    "NGA": "Nigeria",
+    "SAU": "Saudi Arabia",
+    "ISR": "Israel",
+}
+
+# Other spellings accepted for a code, on top of the code and its name.
+ALIASES: Dict[str, Tuple[str, ...]] = {
+    "USA": ("United States of America", "US", "U.S.", "U.S.A.", "America"),
+    "GBR": ("UK", "U.K.", "Great Britain", "Britain", "England"),
+    "KOR": ("Republic of Korea", "Korea"),
+    "VNM": ("Vietnam",),
+    "TUR": ("Turkey",),
+    "NLD": ("Holland", "The Netherlands"),
+    "DEU": ("Deutschland",),
+}
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 50
+# Minimum Dice similarity for a fuzzy (trigram) suggestion.
+FUZZY_MIN_SCORE = 0.35
+
+# Match kinds, best first: the order suggestions are ranked in.
+EXACT, PREFIX, WORD, FUZZY = "exact", "prefix", "word", "fuzzy"
+_RANK = {EXACT: 0, PREFIX: 1, WORD: 2, FUZZY: 3}
+
+_DROP = re.compile(r"[.'’]")
+_SPACE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Casefolded, accent-free, punctuation-free key: "Türkiye" -> "turkiye",
+    "U.K." -> "uk"."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    return _SPACE.sub(" ", _DROP.sub("", plain)).strip()
+
+
+def _trigrams(key: str) -> FrozenSet[str]:
+    padded = f"  {key} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+class CountryIndex:
+    """Immutable lookup tables for a fixed set of countries."""
+
+    def __init__(
+        self,
+        names: Dict[str, str],
+        aliases: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> None:
+        self.names: Dict[str, str] = {c.upper(): n for c, n in names.items()}
+        self.codes: FrozenSet[str] = frozenset(self.names)
+
+        keys: Dict[str, str] = {}
+        for code, name in sorted(self.names.items()):
+            keys.setdefault(normalize(code), code)
+            keys.setdefault(normalize(name), code)
+        for code, spellings in (aliases or {}).items():
+            code = code.upper()
+            if code not in self.codes:
+                continue
+            for spelling in spellings:
+                keys.setdefault(normalize(spelling), code)
+        keys.pop("", None)
+        self._exact: Dict[str, str] = keys
+
+        prefixes: Dict[str, Dict[str, str]] = {}
+        for key, code in keys.items():
+            for i in range(1, len(key) + 1):
+                self._offer(prefixes, key[:i], code, PREFIX)
+            for start in (m.end() for m in re.finditer(" ", key)):
+                word = key[start:]
+                for i in range(1, len(word) + 1):
+                    self._offer(prefixes, word[:i], code, WORD)
+        self._prefix: Dict[str, Tuple[Tuple[str, str], ...]] = {
+            p: tuple(sorted(found.items(), key=lambda cm: (_RANK[cm[1]], self.names[cm[0]])))
+            for p, found in prefixes.items()
+        }
+
+        self._grams: Dict[str, FrozenSet[str]] = {k: _trigrams(k) for k in keys if len(k) > 3}
+        postings: Dict[str, List[str]] = {}
+        for key, grams in self._grams.items():
+            for g in grams:
+                postings.setdefault(g, []).append(key)
+        self._postings: Dict[str, Tuple[str, ...]] = {g: tuple(ks) for g, ks in postings.items()}
+
+    @staticmethod
+    def _offer(table: Dict[str, Dict[str, str]], prefix: str, code: str, kind: str) -> None:
+        found = table.setdefault(prefix, {})
+        if code not in found or _RANK[kind] < _RANK[found[code]]:
+            found[code] = kind
+
+    @classmethod
+    def build(cls, extra_codes: Iterable[str] = ()) -> "CountryIndex":
+        """Index of the built-in names plus any `extra_codes` (e.g. the codes
+        present in the coverage table), which are known by their code only."""
+        names = dict(ISO_TO_NAME)
+        for code in extra_codes:
+            if code:
+                names.setdefault(str(code).upper(), str(code).upper())
+        return cls(names, ALIASES)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def name(self, code: str) -> str:
+        return self.names.get((code or "").upper(), code or "")
+
+    def resolve(self, token: Optional[str]) -> Optional[str]:
+        """ISO code for a code, name or alias in any case; None if unknown."""
+        return self._exact.get(normalize(token))
+
+    def resolve_list(self, raw) -> Tuple[List[str], List[str]]:
+        """`(codes, invalid_tokens)` for a comma-separated string or a list;
+        codes keep their input order and are de-duplicated."""
+        if raw is None:
+            return [], []
+        tokens = raw if isinstance(raw, (list, tuple)) else str(raw).split(",")
+        codes: List[str] = []
+        invalid: List[str] = []
+        for token in (str(t).strip() for t in tokens):
+            if not token:
+                continue
+            code = self.resolve(token)
+            if code is None:
+                invalid.append(token)
+            elif code not in codes:
+                codes.append(code)
+        return codes, invalid
+
+    def suggest(self, query: Optional[str], limit: int = SUGGEST_LIMIT) -> List[Dict[str, str]]:
+        """Ranked `{code, name, match}` candidates for a partial token."""
+        key = normalize(query)
+        limit = max(1, min(int(limit), MAX_SUGGEST_LIMIT))
+        if not key:
+            return []
+
+        ranked: Dict[str, str] = {}
+        exact = self._exact.get(key)
+        if exact:
+            ranked[exact] = EXACT
+        for code, kind in self._prefix.get(key, ()):
+            if len(ranked) >= limit:
+                break
+            ranked.setdefault(code, kind)
+        if len(ranked) < limit and len(key) >= 3:
+            for code in self._fuzzy(key):
+                if len(ranked) >= limit:
+                    break
+                ranked.setdefault(code, FUZZY)
+
+        return [
+            {"code": code, "name": self.names[code], "match": kind}
+            for code, kind in list(ranked.items())[:limit]
+        ]
+
+    def _fuzzy(self, key: str) -> List[str]:
+        grams = _trigrams(key)
+        shared: Dict[str, int] = {}
+        for g in grams:
+            for k in self._postings.get(g, ()):
+                shared[k] = shared.get(k, 0) + 1
+        best: Dict[str, float] = {}
+        for k, n in shared.items():
+            score = 2.0 * n / (len(grams) + len(self._grams[k]))
+            if score >= FUZZY_MIN_SCORE:
+                code = self._exact[k]
+                best[code] = max(best.get(code, 0.0), score)
+        return sorted(best, key=lambda c: (-best[c], self.names[c]))
@@ -1,8 +1,37 @@
 from __future__ import annotations
 
+import base64
+import json
+import math
+import os
 import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from vaccine_py.services.cache import ResultCache
+    from vaccine_py.services.columnar import ColumnarSnapshot, get_engine
+    from vaccine_py.services.countries import ISO_TO_NAME, SUGGEST_LIMIT, CountryIndex
+    from vaccine_py.services.metrics import StatementStats
+    from vaccine_py.services.migrations import discover, latest_version, migrate, schema_version
+    from vaccine_py.services.pool import get_pool
+    from vaccine_py.services.ranking import RankIndex
+    from vaccine_py.services.slowlog import SlowQueryLog
+    from vaccine_py.services.snapshots import SnapshotSet, collect, get_snapshots, publish
+    from vaccine_py.services.watch import get_watch, pin_generations
+except ImportError:
+    from .cache import ResultCache
+    from .columnar import ColumnarSnapshot, get_engine
+    from .countries import ISO_TO_NAME, SUGGEST_LIMIT, CountryIndex
+    from .metrics import StatementStats
+    from .migrations import discover, latest_version, migrate, schema_version
+    from .pool import get_pool
+    from .ranking import RankIndex
+    from .slowlog import SlowQueryLog
+    from .snapshots import SnapshotSet, collect, get_snapshots, publish
+    from .watch import get_watch, pin_generations
 
 
 def _detect_root() -> Path:
@@ -16,101 +45,108 @@ def _detect_root() -> Path:
 ROOT: Path = _detect_root()
 DB_PATH: Path = ROOT / "database.db"
 SQL_PATH: Path = ROOT / "database.sql"
+MIGRATIONS_DIR: Path = ROOT / "migrations"
 
-ISO_TO_NAME: Dict[str, str] = {
-    "AUS": "Australia",
-    "NZL": "New Zealand",
-    "GBR": "United Kingdom",
-    "USA": "United States",
-    "CAN": "Canada",
-    "JPN": "Japan",
-    "DEU": "Germany",
-    "FRA": "France",
-    "ITA": "Italy",
-    "ESP": "Spain",
-    "NLD": "Netherlands",
-    "SWE": "Sweden",
-    "NOR": "Norway",
-    "DNK": "Denmark",
-    "IRL": "Ireland",
-    "CHE": "Switzerland",
-    "BEL": "Belgium",
-    "AUT": "Austria",
-    "PRT": "Portugal",
-    "GRC": "Greece",
-    "CHN": "China",
-    "IND": "India",
-    "KOR": "South Korea",
-    "THA": "Thailand",
-    "VNM": "Viet Nam",
-    "BRA": "Brazil",
-    "MEX": "Mexico",
-    "ARG": "Argentina",
-    "ZAF": "South Africa",
-    "TUR": "Türkiye",
-}
+# Read backend: "sql" queries SQLite per request, "memory" answers from a
+# columnar snapshot of the coverage table (see services/columnar.py).
+BACKENDS = ("sql", "memory")
+
+
+def _backend(name: str) -> str:
+    name = (name or "").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name!r} (expected one of {', '.join(BACKENDS)})")
+    return name
+
+
+BACKEND: str = _backend(os.environ.get("VACCINE_BACKEND", "").strip() or "sql")
 
-NAME_TO_ISO: Dict[str, str] = {v.upper(): k for k, v in ISO_TO_NAME.items()}
-
-NAME_TO_ISO.update(
-    {
-        "UNITED STATES OF AMERICA": "USA",
-        "UNITED STATES": "USA",
-        "US": "USA",
-        "U.S.": "USA",
-        "UK": "GBR",
-        "U.K.": "GBR",
-        "GREAT BRITAIN": "GBR",
-        "ENGLAND": "GBR",
-        "SOUTH KOREA": "KOR",
-        "REPUBLIC OF KOREA": "KOR",
-        "VIETNAM": "VNM",
-    }
-)
+
+def set_backend(name: str) -> None:
+    global BACKEND
+    BACKEND = _backend(name)
+
+
+# Snapshot mode (services/snapshots.py): requests read immutable copies in
+# SNAPSHOT_DIR that init_db and every ingest publish, never DB_PATH itself.
+SNAPSHOTS: bool = os.environ.get("VACCINE_SNAPSHOTS", "").strip().lower() in ("1", "true", "yes", "on")
+SNAPSHOT_DIR: Path = Path(os.environ.get("VACCINE_SNAPSHOT_DIR") or ROOT / "snapshots")
+
+# Country groupings live only in the country_meta table (migration 0003):
+# /aggregate dimension -> country_meta column. Countries without a
+# country_meta row roll up under UNASSIGNED.
+ROLLUP_DIMENSIONS: Dict[str, str] = {"region": "region", "income": "income_group"}
+UNASSIGNED = "Unassigned"
 
 
 def country_name(code: str) -> str:
     return ISO_TO_NAME.get((code or "").upper(), code or "")
 
 
-def resolve_country(query: Optional[str]) -> Optional[str]:
-    if not query:
-        return None
-    q = query.strip()
-    if not q:
-        return None
+_COUNTRY_GROUPS: Dict[str, Any] = {"path": None, "generation": None, "groups": None}
+
 
-    up = q.upper()
+def country_groups(dimension: str = "region") -> Tuple[str, ...]:
+    """Group names `country_meta` uses for `dimension` (a ROLLUP_DIMENSIONS
+    key), e.g. the regions; re-read only when the data changes."""
+    path = read_path()
+    gen = get_watch(path).generation()
+    cached = _COUNTRY_GROUPS
+    if cached["path"] != path or cached["generation"] != gen:
+        groups = {
+            dim: tuple(r["grp"] for r in select_rows(f"SELECT DISTINCT {col} AS grp FROM country_meta ORDER BY grp;"))
+            for dim, col in ROLLUP_DIMENSIONS.items()
+        }
+        _COUNTRY_GROUPS.update(path=path, generation=gen, groups=groups)
+    return _COUNTRY_GROUPS["groups"][dimension]
 
-    if up in ISO_TO_NAME:
-        return up
 
-    if up in NAME_TO_ISO:
-        return NAME_TO_ISO[up]
+_COUNTRY_INDEX: Dict[str, Any] = {"path": None, "generation": None, "codes": None, "index": None}
 
-    if len(up) == 3 and up.isalpha():
-        return up
 
-    return None
+def country_index() -> CountryIndex:
+    """Resolver over the built-in names plus every code in the coverage table;
+    rebuilt only when the set of codes changes."""
+    path = read_path()
+    gen = get_watch(path).generation()
+    cached = _COUNTRY_INDEX
+    if cached["path"] == path and cached["generation"] == gen:
+        return cached["index"]
+    try:
+        codes = frozenset(r["country"] for r in select_rows("SELECT DISTINCT country FROM coverage;"))
+    except sqlite3.OperationalError:
+        codes = frozenset()
+    index = cached["index"]
+    if index is None or cached["codes"] != codes:
+        index = CountryIndex.build(codes)
+    _COUNTRY_INDEX.update(path=path, generation=gen, codes=codes, index=index)
+    return index
+
+
+def resolve_country(query: Optional[str]) -> Optional[str]:
+    return country_index().resolve(query)
+
+
+def resolve_countries(raw) -> Tuple[List[str], List[str]]:
+    """`(codes, invalid_tokens)` for a comma-separated string or a list."""
+    return country_index().resolve_list(raw)
+
+
+def suggest_countries(query: Optional[str], limit: int = SUGGEST_LIMIT) -> List[Dict[str, str]]:
+    return country_index().suggest(query, limit)
 
 
 def _norm_country(x: Optional[str]) -> Optional[str]:
     return resolve_country(x)
 
 
-def _norm_country_list(x: Optional[str]) -> List[str]:
+def norm_country_list(x: Optional[str]) -> List[str]:
     if not x:
         return []
-    parts = [p.strip() for p in str(x).split(",") if p.strip()]
-    codes: List[str] = []
-    for p in parts:
-        c = resolve_country(p)
-        if c and c not in codes:
-            codes.append(c)
-    return codes
+    return resolve_countries(x)[0]
 
 
-def _norm_vaccine(x: Optional[str]) -> Optional[str]:
+def norm_vaccine(x: Optional[str]) -> Optional[str]:
     return (x or "").strip().upper() or None
 
 
@@ -131,42 +167,279 @@ def get_connection() -> sqlite3.Connection:
 
 
 def init_db() -> None:
-    needs_init = True
-    if DB_PATH.exists():
+    """Bring the database to the latest schema version (see
+    services/migrations.py). When it is already current this is one
+    `PRAGMA user_version` read. In snapshot mode it publishes the first
+    snapshot, and a new one after migrating."""
+    migrations = discover(MIGRATIONS_DIR)
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        current = schema_version(conn) == latest_version(migrations)
+    finally:
+        conn.close()
+    if not current:
+        if not SQL_PATH.exists():
+            raise FileNotFoundError(f"SQL file not found: {SQL_PATH}")
+        conn = get_connection()
         try:
-            with get_connection() as c:
-                c.execute("SELECT 1 FROM coverage LIMIT 1;")
-            needs_init = False
-        except sqlite3.Error:
-            needs_init = True
+            migrate(conn, SQL_PATH, migrations)
+        finally:
+            conn.close()
+    if SNAPSHOTS and (not current or snapshot_set().current() is None):
+        publish_snapshot()
+
+
+@contextmanager
+def read_connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled read-only connection: `with read_connection() as conn:`.
+    In snapshot mode it reads the request's snapshot."""
+    if SNAPSHOTS:
+        snaps = snapshot_set()
+        with snaps.held() as path:
+            if path is not None:
+                with snaps.pool(path).connection() as conn:
+                    yield conn
+                return
+    with get_pool(DB_PATH).connection() as conn:
+        yield conn
+
+
+@contextmanager
+def export_connection() -> Iterator[sqlite3.Connection]:
+    """Like `read_connection()`, but a connection of its own that takes no
+    pool slot, so a slow export client cannot starve other requests."""
+    if SNAPSHOTS:
+        snaps = snapshot_set()
+        with snaps.held() as path:
+            if path is not None:
+                with snaps.pool(path).dedicated() as conn:
+                    yield conn
+                return
+    with get_pool(DB_PATH).dedicated() as conn:
+        yield conn
+
+
+def pool_stats() -> Dict[str, Any]:
+    if SNAPSHOTS:
+        snaps = snapshot_set()
+        with snaps.held() as path:
+            if path is not None:
+                return snaps.pool(path).stats()
+    return get_pool(DB_PATH).stats()
+
+
+# ----------------------- Snapshots -----------------------
+def snapshot_set() -> SnapshotSet:
+    return get_snapshots(SNAPSHOT_DIR)
+
+
+def read_path() -> Path:
+    """The file reads go to: DB_PATH, or in snapshot mode the request's
+    snapshot (the current one outside a request). Caches key on it."""
+    if SNAPSHOTS:
+        path = snapshot_set().path()
+        if path is not None:
+            return path
+    return DB_PATH
+
+
+def pin_snapshot():
+    """Context manager keeping one snapshot for a whole request; a no-op
+    outside snapshot mode."""
+    return snapshot_set().pinned() if SNAPSHOTS else nullcontext()
+
+
+def publish_snapshot(conn: Optional[sqlite3.Connection] = None) -> Path:
+    """Publish `conn`'s database (default DB_PATH) as the next snapshot,
+    then delete superseded snapshots no process still reads."""
+    if conn is None:
+        conn = get_connection()
+        try:
+            return publish_snapshot(conn)
+        finally:
+            conn.close()
+    path = publish(conn, SNAPSHOT_DIR)
+    snapshot_set().current()  # let go of our hold on the previous one
+    collect(SNAPSHOT_DIR)
+    return path
+
+
+def snapshot_stats() -> Optional[Dict[str, Any]]:
+    return snapshot_set().stats() if SNAPSHOTS else None
+
+
+_DATA_VERSION: Dict[str, Any] = {"path": None, "generation": None, "state": None}
+
+
+def data_version() -> Dict[str, int]:
+    """`{"version", "updated_at"}` from `data_state`, re-read only when the
+    database has changed since the last call."""
+    path = read_path()
+    gen = get_watch(path).generation()
+    cached = _DATA_VERSION
+    if cached["path"] == path and cached["generation"] == gen:
+        return cached["state"]
+    rows = select_rows("SELECT version, updated_at FROM data_state WHERE id = 1;")
+    state = rows[0] if rows else {"version": 0, "updated_at": 0}
+    _DATA_VERSION.update(path=path, generation=gen, state=state)
+    return state
+
+
+def bump_data_version(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "UPDATE data_state SET version = version + 1, "
+        "updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = 1;"
+    )
+
+
+def memory_snapshot() -> ColumnarSnapshot:
+    if SNAPSHOTS:
+        snaps = snapshot_set()
+        with snaps.held() as path:
+            if path is not None:
+                return get_engine(path, snaps.pool(path)).snapshot()
+    return get_engine(DB_PATH).snapshot()
+
+
+# Results of get_filtered_data / compare_country / get_trends, keyed by their
+# normalized parameters. Cached values are shared: callers must not mutate them.
+RESULT_CACHE = ResultCache(
+    maxsize=int(os.environ.get("VACCINE_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("VACCINE_CACHE_TTL", "300")),
+)
+
+
+def cached_result(key: tuple, compute: Callable[[], Any]) -> Any:
+    """`compute()`, memoized under `key` in RESULT_CACHE until the data changes."""
+    path = read_path()
+    gen = get_watch(path).generation()
+    return RESULT_CACHE.get_or_compute((str(path), BACKEND) + key, gen, compute)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return RESULT_CACHE.stats()
+
+
+# Time and rows per statement shape for every query run through select_rows,
+# _select_columns and the export cursor; exposed on /metrics.
+SQL_STATS = StatementStats()
+# Statements over VACCINE_SLOW_QUERY_MS, with their query plans.
+SLOW_QUERIES = SlowQueryLog()
+
+
+def sql_stats() -> Dict[str, Dict[str, float]]:
+    return SQL_STATS.stats()
 
-    if not needs_init:
-        return
 
-    if not SQL_PATH.exists():
-        raise FileNotFoundError(f"SQL file not found: {SQL_PATH}")
+def slow_queries() -> Dict[str, Any]:
+    return SLOW_QUERIES.report()
 
-    with sqlite3.connect(str(DB_PATH)) as conn, open(SQL_PATH, "r", encoding="utf-8") as f:
-        conn.executescript(f.read())
 
+def reset_slow_queries() -> None:
+    SLOW_QUERIES.clear()
 
-def _select(sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
-    with get_connection() as conn:
-        cur = conn.execute(sql, params)
-        return [dict(r) for r in cur.fetchall()]
+
+def _fetch(conn: sqlite3.Connection, sql: str, params: tuple, row_factory: Any) -> list:
+    started = time.perf_counter()
+    try:
+        cur = conn.cursor()
+        cur.row_factory = row_factory
+        rows = cur.execute(sql, params).fetchall()
+    except sqlite3.Error:
+        SQL_STATS.observe(sql, time.perf_counter() - started, 0, error=True)
+        raise
+    elapsed = time.perf_counter() - started
+    SQL_STATS.observe(sql, elapsed, len(rows))
+    if SLOW_QUERIES.is_slow(elapsed):
+        SLOW_QUERIES.record(conn, sql, params, elapsed, len(rows))
+    return rows
+
+
+def select_rows(sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    """Rows of `sql` as dicts, read on a pooled connection."""
+    with read_connection() as conn:
+        return [dict(r) for r in _fetch(conn, sql, params, sqlite3.Row)]
+
+
+def _select_columns(sql: str, params: tuple, cols: Tuple[str, ...]) -> Dict[str, Sequence[Any]]:
+    """Run `sql` (selecting exactly `cols`) into column-major form: plain
+    tuples are transposed once, with no per-row dict."""
+    with read_connection() as conn:
+        rows = _fetch(conn, sql, params, None)
+    data = list(zip(*rows)) if rows else [() for _ in cols]
+    return dict(zip(cols, data))
+
+
+# ----------------------- Projection & columnar results -----------------------
+ROW_FIELDS: Tuple[str, ...] = ("country", "vaccine", "year", "coverage", "country_name")
+
+
+def _norm_fields(fields: Any, allowed: Tuple[str, ...] = ROW_FIELDS) -> Tuple[str, ...]:
+    """Requested fields in `allowed` order; all of them when none are given.
+    Raises ValueError for unknown names."""
+    if fields is None:
+        return allowed
+    parts = fields if isinstance(fields, (list, tuple)) else str(fields).split(",")
+    wanted = {str(p).strip().lower() for p in parts if str(p).strip()}
+    if not wanted:
+        return allowed
+    unknown = sorted(wanted - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Use: {', '.join(allowed)}")
+    return tuple(f for f in allowed if f in wanted)
+
+
+def _source_columns(fields: Tuple[str, ...], *extra: str) -> Tuple[str, ...]:
+    """Table columns needed for `fields` (`country_name` is derived from
+    `country`) plus any `extra` columns the query itself needs."""
+    cols = [f for f in fields if f != "country_name"]
+    if "country_name" in fields:
+        cols.append("country")
+    cols.extend(extra)
+    return tuple(dict.fromkeys(cols))
+
+
+def _as_rows(data: Dict[str, Sequence[Any]], fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    keys = [f for f in fields if f != "country_name"]
+    columns = [data[k] for k in keys]
+    if "country_name" in fields:
+        names: Dict[str, str] = {}
+        columns.append([names.get(c) or names.setdefault(c, country_name(c)) for c in data["country"]])
+        keys.append("country_name")
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def _as_columns(data: Dict[str, Sequence[Any]], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """`{"columns": {field: [...]}}`; `country_name` becomes a `country_names`
+    lookup sent once instead of a per-row column."""
+    out: Dict[str, Any] = {
+        "columns": {f: list(data[f]) for f in fields if f != "country_name"},
+    }
+    if "country_name" in fields:
+        out["country_names"] = {c: country_name(c) for c in sorted(set(data["country"]))}
+    return out
 
 
 # ----------------------- Level 2: Explorer -----------------------
-def get_filtered_data(
-    country: Optional[str] = None,
-    vaccine: Optional[str] = None,
-    year: Optional[int] = None,
-    sort: str = "coverage_desc",
-) -> List[Dict[str, Any]]:
-    countries = _norm_country_list(country)
-    v = _norm_vaccine(vaccine)
-    y = _norm_year(year)
+# Sort key -> (column, direction). Every ordering ends with `id` so rows with
+# equal sort values have a stable order and keyset cursors stay unique.
+SORTS: Dict[str, tuple] = {
+    "coverage_desc": ("coverage", "DESC"),
+    "coverage_asc": ("coverage", "ASC"),
+    "year_desc": ("year", "DESC"),
+    "year_asc": ("year", "ASC"),
+    "country_desc": ("country", "DESC"),
+    "country_asc": ("country", "ASC"),
+}
+DEFAULT_SORT = "coverage_desc"
+
+
+def _norm_sort(x: Optional[str]) -> str:
+    key = (x or "").strip().lower()
+    return key if key in SORTS else DEFAULT_SORT
 
+
+def _filter_where(countries: List[str], v: Optional[str], y: Optional[int]) -> tuple:
     where = ["1=1"]
     params: List[Any] = []
 
@@ -183,59 +456,279 @@ def get_filtered_data(
         where.append("year = ?")
         params.append(y)
 
-    order_sql = {
-        "coverage_desc": "coverage DESC",
-        "coverage_asc": "coverage ASC",
-        "year_desc": "year DESC",
-        "year_asc": "year ASC",
-        "country_desc": "country DESC",
-        "country_asc": "country ASC",
-    }.get((sort or "").lower(), "coverage DESC")
+    return where, params
+
+
+def get_filtered_data(
+    country: Optional[str] = None,
+    vaccine: Optional[str] = None,
+    year: Optional[int] = None,
+    sort: str = "coverage_desc",
+    fields: Any = None,
+) -> List[Dict[str, Any]]:
+    """Matching rows holding only `fields` (default: all of `ROW_FIELDS`)."""
+    countries = norm_country_list(country)
+    v = norm_vaccine(vaccine)
+    y = _norm_year(year)
+    sort_key = _norm_sort(sort)
+    f = _norm_fields(fields)
+
+    return cached_result(
+        ("filter", tuple(sorted(countries)), v, y, sort_key, f),
+        lambda: _as_rows(_query_filtered(countries, v, y, sort_key, _source_columns(f)), f),
+    )
+
+
+def get_filtered_columns(
+    country: Optional[str] = None,
+    vaccine: Optional[str] = None,
+    year: Optional[int] = None,
+    sort: str = "coverage_desc",
+    fields: Any = None,
+) -> Dict[str, Any]:
+    """`get_filtered_data` as parallel arrays: `{count, columns, country_names}`."""
+    countries = norm_country_list(country)
+    v = norm_vaccine(vaccine)
+    y = _norm_year(year)
+    sort_key = _norm_sort(sort)
+    f = _norm_fields(fields)
+
+    def compute() -> Dict[str, Any]:
+        cols = _source_columns(f)
+        data = _query_filtered(countries, v, y, sort_key, cols)
+        return dict(count=len(data[cols[0]]), **_as_columns(data, f))
+
+    return cached_result(("filter_columns", tuple(sorted(countries)), v, y, sort_key, f), compute)
+
+
+def _query_filtered(
+    countries: List[str], v: Optional[str], y: Optional[int], sort_key: str, cols: Tuple[str, ...]
+) -> Dict[str, Sequence[Any]]:
+    if BACKEND == "memory":
+        snap = memory_snapshot()
+        return snap.columns(snap.sorted_positions(countries, v, y, sort_key), cols)
+
+    where, params = _filter_where(countries, v, y)
+    col, direction = SORTS[sort_key]
 
+    sql = f"""
+        SELECT {', '.join(cols)}
+        FROM coverage
+        WHERE {' AND '.join(where)}
+        ORDER BY {col} {direction}, id;
+    """
+    return _select_columns(sql, tuple(params), cols)
+
+
+EXPORT_FETCH_SIZE = 1000
+
+
+def iter_filtered_rows(
+    country: Optional[str] = None,
+    vaccine: Optional[str] = None,
+    year: Optional[int] = None,
+    sort: str = "coverage_desc",
+) -> Iterator[tuple]:
+    """Stream `(country, vaccine, year, coverage)` tuples for an export.
+
+    Rows are read in `EXPORT_FETCH_SIZE` batches, so memory stays bounded
+    however large the export. The SQL backend reads from an open cursor on an
+    `export_connection()`, held until the client has read the whole stream.
+    """
+    countries = norm_country_list(country)
+    v = norm_vaccine(vaccine)
+    y = _norm_year(year)
+    sort_key = _norm_sort(sort)
+
+    if BACKEND == "memory":
+        snap = memory_snapshot()
+        positions = snap.sorted_positions(countries, v, y, sort_key)
+        cols = ("country", "vaccine", "year", "coverage")
+        for start in range(0, len(positions), EXPORT_FETCH_SIZE):
+            batch = snap.columns(positions[start : start + EXPORT_FETCH_SIZE], cols)
+            yield from zip(*(batch[c] for c in cols))
+        return
+
+    where, params = _filter_where(countries, v, y)
+    col, direction = SORTS[sort_key]
     sql = f"""
         SELECT country, vaccine, year, coverage
         FROM coverage
         WHERE {' AND '.join(where)}
-        ORDER BY {order_sql};
+        ORDER BY {col} {direction}, id;
     """
+    # Timed from execute to the last fetch, which includes the time the
+    # client takes to read the stream.
+    started, rows = time.perf_counter(), 0
+    with export_connection() as conn:
+        cur = conn.execute(sql, tuple(params))
+        try:
+            while True:
+                batch = cur.fetchmany(EXPORT_FETCH_SIZE)
+                if not batch:
+                    return
+                rows += len(batch)
+                for r in batch:
+                    yield tuple(r)
+        finally:
+            cur.close()
+            SQL_STATS.observe(sql, time.perf_counter() - started, rows)
 
-    rows = _select(sql, tuple(params))
-    for r in rows:
-        r["country_name"] = country_name(r["country"])
-    return rows
+
+# ----------------------- Level 2: Explorer paging -----------------------
+MAX_PAGE_SIZE = 10000
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(sort_key: str, value: Any, row_id: int) -> str:
+    raw = json.dumps([sort_key, value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor") from None
+    if key != sort_key:
+        raise CursorError("Cursor does not match the requested sort")
+    # The value must have its sort column's type: the memory backend
+    # compares it with column values directly.
+    if SORTS[sort_key][0] == "country":
+        valid = isinstance(value, str)
+    else:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not valid or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise CursorError("Invalid cursor")
+    return value, row_id
+
+
+def get_filtered_page(
+    country: Optional[str] = None,
+    vaccine: Optional[str] = None,
+    year: Optional[int] = None,
+    sort: str = "coverage_desc",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    fields: Any = None,
+    columns: bool = False,
+) -> Dict[str, Any]:
+    """One keyset page of `get_filtered_data` (`columns=True`: of
+    `get_filtered_columns`).
+
+    The cursor encodes the last row's sort value and `id`, so every page is a
+    range seek on `(sort column, id)` regardless of how deep it is.
+    """
+    countries = norm_country_list(country)
+    v = norm_vaccine(vaccine)
+    y = _norm_year(year)
+    sort_key = _norm_sort(sort)
+    col, direction = SORTS[sort_key]
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor, sort_key) if cursor else None
+    f = _norm_fields(fields)
+    cols = _source_columns(f, col, "id")
+
+    total: Optional[int] = None
+    if BACKEND == "memory":
+        snap = memory_snapshot()
+        positions = snap.sorted_positions(countries, v, y, sort_key)
+        if with_total:
+            total = len(positions)
+        start = snap.seek(positions, sort_key, *after) if after is not None else 0
+        data = snap.columns(positions[start : start + limit + 1], cols)
+    else:
+        where, params = _filter_where(countries, v, y)
+        if with_total:
+            total = select_rows(
+                f"SELECT COUNT(*) AS n FROM coverage WHERE {' AND '.join(where)};", tuple(params)
+            )[0]["n"]
+        if after is not None:
+            op = "<" if direction == "DESC" else ">"
+            where.append(f"({col} {op} ? OR ({col} = ? AND id > ?))")
+            params.extend([after[0], after[0], after[1]])
+        sql = f"""
+            SELECT {', '.join(cols)}
+            FROM coverage
+            WHERE {' AND '.join(where)}
+            ORDER BY {col} {direction}, id
+            LIMIT ?;
+        """
+        data = _select_columns(sql, tuple(params) + (limit + 1,), cols)
+
+    next_cursor = None
+    count = len(data["id"])
+    if count > limit:
+        count = limit
+        data = {k: vals[:limit] for k, vals in data.items()}
+        next_cursor = encode_cursor(sort_key, data[col][-1], data["id"][-1])
+
+    page: Dict[str, Any] = {"count": count}
+    if columns:
+        page.update(_as_columns(data, f))
+    else:
+        page["rows"] = _as_rows(data, f)
+    page["next_cursor"] = next_cursor
+    if with_total:
+        page["total"] = total
+    return page
 
 
 # ----------------------- Level 3: Compare & Trends -----------------------
-def compare_country(country: str, year: Any) -> Dict[str, Any]:
-    """Сравнение конкретной страны с глобальным средним по одному году."""
+def compare_country(country: str, year: Any, vaccine: Optional[str] = None) -> Dict[str, Any]:
+    """Сравнение конкретной страны с глобальным средним по одному году.
+
+    Without `vaccine` the first vaccine (alphabetically) with data is used.
+    """
     c = _norm_country(country)
     y = _norm_year(year)
+    v = norm_vaccine(vaccine)
     if not y:
         return {"error": "Invalid year parameter"}
     if not c:
         return {"error": f"Unknown country: {country}"}
 
+    return cached_result(("compare", c, y, v), lambda: _query_compare(c, y, v))
+
+
+def _query_compare(c: str, y: int, v: Optional[str]) -> Dict[str, Any]:
+    if BACKEND == "memory":
+        local = memory_snapshot().compare(c, y, v)
+        if local is None:
+            return {"error": _no_compare_data(c, y, v)}
+        return _compare_result(c, y, local["vaccine"], local["coverage"], local["avg_cov"])
+
+    # Global averages come from the trigger-maintained coverage_agg table,
+    # so this is an index lookup plus a primary-key fetch.
     local_sql = """
-        SELECT country, vaccine, year, coverage
-        FROM coverage
-        WHERE country = ? AND year = ?
-        ORDER BY vaccine
+        SELECT c.vaccine, c.coverage, a.avg AS avg_cov
+        FROM coverage c
+        LEFT JOIN coverage_agg a ON a.vaccine = c.vaccine AND a.year = c.year
+        WHERE c.country = ? AND c.year = ? AND (? IS NULL OR c.vaccine = ?)
+        ORDER BY c.vaccine
         LIMIT 1;
     """
-    local_rows = _select(local_sql, (c, y))
+    local_rows = select_rows(local_sql, (c, y, v, v))
     if not local_rows:
-        return {"error": f"No data for {country_name(c)} ({c}) in {y}"}
+        return {"error": _no_compare_data(c, y, v)}
 
     local = local_rows[0]
     vac = local["vaccine"]
+    avg = local["avg_cov"]
+    return _compare_result(c, y, vac, local["coverage"], avg)
 
-    avg_sql = """
-        SELECT AVG(coverage) AS avg_cov
-        FROM coverage
-        WHERE vaccine = ? AND year = ?;
-    """
-    avg_row = _select(avg_sql, (vac, y))[0]
-    avg = avg_row.get("avg_cov")
+
+def _no_compare_data(c: str, y: int, v: Optional[str]) -> str:
+    what = f"{v} data" if v else "data"
+    return f"No {what} for {country_name(c)} ({c}) in {y}"
+
+
+def _compare_result(c: str, y: int, vac: str, local: float, avg: Optional[float]) -> Dict[str, Any]:
     if avg is None:
         return {"error": f"No global data for vaccine {vac} in {y}"}
 
@@ -245,70 +738,451 @@ def compare_country(country: str, year: Any) -> Dict[str, Any]:
         "country_name": country_name(c),
         "year": y,
         "vaccine": vac,
-        "local": round(float(local["coverage"]), 1),
+        "local": round(float(local), 1),
         "global_avg": round(float(avg), 1),
     }
 
 
+MAX_BATCH_CELLS = 50000
+
+
+def _round1(x: Optional[float]) -> Optional[float]:
+    return None if x is None else round(float(x), 1)
+
+
+def compare_batch(
+    countries: Optional[List[str]] = None,
+    vaccines: Optional[List[str]] = None,
+    years: Optional[List[Any]] = None,
+) -> Dict[str, Any]:
+    """Countries x vaccines x years compared with the global average.
+
+    An empty list means "all" for that dimension. Local values and global
+    averages come back from one query (coverage_agg LEFT JOIN coverage);
+    cells without local data are kept with `local`/`delta` set to null.
+    """
+    cs: List[str] = []
+    for x in countries or []:
+        code = _norm_country(x)
+        if not code:
+            return {"error": f"Unknown country: {x}"}
+        if code not in cs:
+            cs.append(code)
+    vs: List[str] = []
+    for x in vaccines or []:
+        vac = norm_vaccine(x)
+        if vac and vac not in vs:
+            vs.append(vac)
+    ys: List[int] = []
+    for x in years or []:
+        yr = _norm_year(x)
+        if yr is None:
+            return {"error": f"Invalid year: {x}"}
+        if yr not in ys:
+            ys.append(yr)
+
+    return cached_result(("compare_batch", tuple(cs), tuple(vs), tuple(ys)), lambda: _query_compare_batch(cs, vs, ys))
+
+
+def _batch_cells(cs: List[str], vs: List[str], ys: List[int]) -> int:
+    """Cells in compare_batch's matrix, from counts alone, so a request too
+    large to serve is refused before any coverage row is read. Empty lists
+    count what the query would find: the (vaccine, year) groups in
+    coverage_agg and the countries with data in them."""
+    if cs and vs and ys:
+        return len(cs) * len(vs) * len(ys)
+    if BACKEND == "memory":
+        nc, nv, ny = memory_snapshot().matrix_counts(vs, ys)
+    else:
+        where = ["1=1"]
+        params: List[Any] = []
+        if vs:
+            where.append(f"vaccine IN ({','.join('?' for _ in vs)})")
+            params.extend(vs)
+        if ys:
+            where.append(f"year IN ({','.join('?' for _ in ys)})")
+            params.extend(ys)
+        cond = " AND ".join(where)
+        counts = select_rows(
+            f"SELECT COUNT(DISTINCT vaccine) AS nv, COUNT(DISTINCT year) AS ny FROM coverage_agg WHERE {cond};",
+            tuple(params),
+        )[0]
+        nv, ny = counts["nv"], counts["ny"]
+        nc = 0
+        if not cs:
+            nc = select_rows(f"SELECT COUNT(DISTINCT country) AS n FROM coverage WHERE {cond};", tuple(params))[0]["n"]
+    return (len(cs) or nc) * (len(vs) or nv) * (len(ys) or ny)
+
+
+def _query_compare_batch(cs: List[str], vs: List[str], ys: List[int]) -> Dict[str, Any]:
+    if _batch_cells(cs, vs, ys) > MAX_BATCH_CELLS:
+        return {"error": f"Too many cells requested (limit {MAX_BATCH_CELLS}); narrow the lists."}
+    if BACKEND == "memory":
+        rows = memory_snapshot().compare_matrix(cs, vs, ys)
+    else:
+        where = ["1=1"]
+        params: List[Any] = []
+        join_params: List[Any] = []
+        if vs:
+            where.append(f"a.vaccine IN ({','.join('?' for _ in vs)})")
+            params.extend(vs)
+        if ys:
+            where.append(f"a.year IN ({','.join('?' for _ in ys)})")
+            params.extend(ys)
+        country_on = ""
+        if cs:
+            country_on = f" AND c.country IN ({','.join('?' for _ in cs)})"
+            join_params.extend(cs)
+        sql = f"""
+            SELECT a.vaccine, a.year, a.avg AS global_avg, a.n, c.country, c.coverage
+            FROM coverage_agg a
+            LEFT JOIN coverage c ON c.vaccine = a.vaccine AND c.year = a.year{country_on}
+            WHERE {' AND '.join(where)};
+        """
+        rows = select_rows(sql, tuple(join_params + params))
+
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    local: Dict[tuple, float] = {}
+    seen_countries = set()
+    for r in rows:
+        groups[(r["vaccine"], r["year"])] = {"global_avg": r["global_avg"], "n": r["n"]}
+        if r["country"] is not None:
+            local[(r["country"], r["vaccine"], r["year"])] = r["coverage"]
+            seen_countries.add(r["country"])
+
+    out_countries = cs or sorted(seen_countries)
+    out_vaccines = vs or sorted({k[0] for k in groups})
+    out_years = ys or sorted({k[1] for k in groups})
+
+    cells = []
+    for c in out_countries:
+        for v in out_vaccines:
+            for y in out_years:
+                g = groups.get((v, y))
+                val = local.get((c, v, y))
+                avg = g["global_avg"] if g else None
+                cells.append(
+                    {
+                        "country": c,
+                        "country_name": country_name(c),
+                        "vaccine": v,
+                        "year": y,
+                        "local": _round1(val),
+                        "global_avg": _round1(avg),
+                        "delta": _round1(val - avg) if val is not None and avg is not None else None,
+                        "n": g["n"] if g else 0,
+                    }
+                )
+
+    return {
+        "countries": out_countries,
+        "vaccines": out_vaccines,
+        "years": out_years,
+        "cells": cells,
+        "count": len(cells),
+    }
+
+
+# Point fields for /trends: `delta` (to the previous year) exists in series mode only.
+SERIES_FIELDS: Tuple[str, ...] = ("country", "vaccine", "year", "coverage", "delta", "country_name")
+_SERIES_COLUMNS = ("country", "vaccine", "year", "coverage", "delta", "worst_delta", "worst_year")
+
+
 def get_trends(
     vaccine: Optional[str],
     countries: Optional[List[str]],
     latest_only: bool = True,
+    year_from: Any = None,
+    year_to: Any = None,
+    fields: Any = None,
+    columns: bool = False,
 ) -> Dict[str, Any]:
-    v = _norm_vaccine(vaccine)
+    """Latest point per country, or (latest_only=False) full series with
+    year-over-year `delta` per point and each series' largest decline.
+
+    Points hold only `fields`; with `columns=True` they are returned as
+    parallel arrays under `columns` instead of `points`."""
+    v = norm_vaccine(vaccine)
     raw_list = countries or []
     cs = [_norm_country(x) for x in raw_list if _norm_country(x)]
+    y_from = _norm_year(year_from)
+    y_to = _norm_year(year_to)
+    f = _norm_fields(fields, ROW_FIELDS if latest_only else SERIES_FIELDS)
 
     if raw_list and not cs:
-        return {"vaccine": v, "countries": [], "points": [], "count": 0}
+        result: Dict[str, Any] = {"vaccine": v, "countries": []}
+        if columns:
+            result.update(_as_columns({c: [] for c in _SERIES_COLUMNS}, f))
+        else:
+            result["points"] = []
+        result["count"] = 0
+        return result
 
-    where = ["1=1"]
-    params: List[Any] = []
+    return cached_result(
+        ("trends", v, tuple(cs), bool(latest_only), y_from, y_to, f, bool(columns)),
+        lambda: _query_trends(v, cs, latest_only, y_from, y_to, f, columns),
+    )
 
+
+def _query_trends(
+    v: Optional[str],
+    cs: List[str],
+    latest_only: bool,
+    y_from: Optional[int] = None,
+    y_to: Optional[int] = None,
+    fields: Tuple[str, ...] = ROW_FIELDS,
+    columns: bool = False,
+) -> Dict[str, Any]:
+    cols = _source_columns(fields) if latest_only else _SERIES_COLUMNS
+    if BACKEND == "memory":
+        snap = memory_snapshot()
+        if latest_only:
+            data = snap.columns(snap.latest_positions(cs, v, y_from, y_to), cols)
+        else:
+            rows = snap.series(cs, v, y_from, y_to)
+            data = {c: [r[c] for r in rows] for c in cols}
+    else:
+        where = ["1=1"]
+        params: List[Any] = []
+
+        if v:
+            where.append("vaccine = ?")
+            params.append(v)
+
+        if cs:
+            placeholders = ",".join("?" for _ in cs)
+            where.append(f"country IN ({placeholders})")
+            params.extend(cs)
+
+        if y_to is not None:
+            where.append("year <= ?")
+            params.append(y_to)
+
+        if latest_only:
+            if y_from is not None:
+                where.append("year >= ?")
+                params.append(y_from)
+            # The window tags every row with its country's latest year. Without
+            # an upper year bound that year is always some series' latest point,
+            # so the scan can run over coverage_latest (one row per series).
+            source = "coverage_latest" if y_to is None else "coverage"
+            sql = f"""
+                SELECT {', '.join(cols)}
+                FROM (
+                    SELECT country, vaccine, year, coverage,
+                           MAX(year) OVER (PARTITION BY country) AS max_year
+                    FROM {source}
+                    WHERE {' AND '.join(where)}
+                )
+                WHERE year = max_year
+                ORDER BY country, vaccine;
+            """
+        else:
+            # A delta is to the year just before, so the window also reads the
+            # year before `year_from`; that year is dropped after LAG, and
+            # gaps in a series give a null delta. PARTITION BY country, vaccine
+            # ORDER BY year follows the UNIQUE(country, vaccine, year) index,
+            # so no extra sort is needed.
+            outer = "1=1"
+            if y_from is not None:
+                where.append("year >= ?")
+                params.append(y_from - 1)
+                outer = "year >= ?"
+                params.append(y_from)
+            sql = f"""
+                WITH d AS (
+                    SELECT country, vaccine, year, coverage,
+                           CASE WHEN year - LAG(year) OVER w = 1
+                                THEN coverage - LAG(coverage) OVER w END AS delta
+                    FROM coverage
+                    WHERE {' AND '.join(where)}
+                    WINDOW w AS (PARTITION BY country, vaccine ORDER BY year)
+                )
+                SELECT country, vaccine, year, coverage, delta,
+                       MIN(delta) OVER (PARTITION BY country, vaccine) AS worst_delta,
+                       FIRST_VALUE(year) OVER (
+                           PARTITION BY country, vaccine ORDER BY delta IS NULL, delta, year
+                       ) AS worst_year
+                FROM d
+                WHERE {outer}
+                ORDER BY country, year, vaccine;
+            """
+        data = _select_columns(sql, tuple(params), cols)
+
+    count = len(data[cols[0]])
+    result: Dict[str, Any] = {"vaccine": v, "countries": cs}
+    if not latest_only:
+        data = dict(data, delta=[_round1(d) for d in data["delta"]])
+    if columns:
+        result.update(_as_columns(data, fields))
+    else:
+        result["points"] = _as_rows(data, fields)
+    result["count"] = count
+    if not latest_only:
+        result["year_from"] = y_from
+        result["year_to"] = y_to
+        result["series"] = _series_summary(data)
+    return result
+
+
+def _series_summary(data: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Fold the per-row window columns into one summary per (country, vaccine)."""
+    series: Dict[tuple, Dict[str, Any]] = {}
+    for c, v, y, worst, worst_year in zip(
+        data["country"], data["vaccine"], data["year"], data["worst_delta"], data["worst_year"]
+    ):
+        s = series.get((c, v))
+        if s is None:
+            declined = worst is not None and worst < 0
+            s = series[(c, v)] = {
+                "country": c,
+                "country_name": country_name(c),
+                "vaccine": v,
+                "first_year": y,
+                "last_year": y,
+                "points": 0,
+                "largest_decline": _round1(-worst) if declined else None,
+                "largest_decline_year": worst_year if declined else None,
+            }
+        s["points"] += 1
+        s["first_year"] = min(s["first_year"], y)
+        s["last_year"] = max(s["last_year"], y)
+    return sorted(series.values(), key=lambda s: (s["country"], s["vaccine"]))
+
+
+# ----------------------- Level 4: Regional rollups -----------------------
+def _norm_groups(dimension: str, groups: Any) -> Tuple[str, ...]:
+    """Canonical group names for a comma-separated string or list; raises
+    ValueError on unknown names."""
+    if not groups:
+        return ()
+    known = country_groups(dimension) + (UNASSIGNED,)
+    by_lower = {g.lower(): g for g in known}
+    tokens = groups if isinstance(groups, (list, tuple)) else str(groups).split(",")
+    out, unknown = [], []
+    for token in (str(t).strip() for t in tokens):
+        if not token:
+            continue
+        if token.lower() in by_lower:
+            out.append(by_lower[token.lower()])
+        else:
+            unknown.append(token)
+    if unknown:
+        raise ValueError(f"Unknown {dimension} group(s): {', '.join(unknown)}. Use one of: {', '.join(known)}")
+    return tuple(sorted(set(out)))
+
+
+def get_aggregate(
+    group_by: Optional[str] = "region",
+    vaccine: Optional[str] = None,
+    year: Any = None,
+    groups: Any = None,
+) -> Dict[str, Any]:
+    """n, mean, min, max and (population) standard deviation of coverage per
+    group, vaccine and year, read from the `coverage_rollup` cube."""
+    dimension = (group_by or "region").strip().lower()
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"Unknown group_by: {group_by}. Use one of: {', '.join(ROLLUP_DIMENSIONS)}")
+    v = norm_vaccine(vaccine)
+    y = _norm_year(year)
+    gs = _norm_groups(dimension, groups)
+
+    return cached_result(("aggregate", dimension, v, y, gs), lambda: _query_aggregate(dimension, v, y, gs))
+
+
+def _query_aggregate(dimension: str, v: Optional[str], y: Optional[int], gs: Tuple[str, ...]) -> Dict[str, Any]:
+    where = ["dimension = ?"]
+    params: List[Any] = [dimension]
     if v:
         where.append("vaccine = ?")
         params.append(v)
+    if y is not None:
+        where.append("year = ?")
+        params.append(y)
+    if gs:
+        where.append(f"grp IN ({','.join('?' for _ in gs)})")
+        params.extend(gs)
 
-    if cs:
-        placeholders = ",".join("?" for _ in cs)
-        where.append(f"country IN ({placeholders})")
-        params.extend(cs)
-
-    if latest_only:
-        inner_where = " AND ".join(where)
-        outer_where = (
-            inner_where.replace("country", "t.country")
-            .replace("vaccine", "t.vaccine")
-            .replace("year", "t.year")
+    rows = []
+    for r in select_rows(
+        f"""
+        SELECT grp, vaccine, year, n, sum, sumsq, min, max
+        FROM coverage_rollup
+        WHERE {' AND '.join(where)}
+        ORDER BY grp, vaccine, year;
+        """,
+        tuple(params),
+    ):
+        mean = r["sum"] / r["n"]
+        rows.append(
+            {
+                "group": r["grp"],
+                "vaccine": r["vaccine"],
+                "year": r["year"],
+                "n": r["n"],
+                "mean": _round1(mean),
+                "min": r["min"],
+                "max": r["max"],
+                # Clamped: rounding can leave a tiny negative variance.
+                "stddev": _round1(math.sqrt(max(0.0, r["sumsq"] / r["n"] - mean * mean))),
+            }
         )
-        sql = f"""
-            SELECT t.country, t.vaccine, t.year, t.coverage
-            FROM coverage t
-            JOIN (
-                SELECT country, MAX(year) AS max_year
-                FROM coverage
-                WHERE {inner_where}
-                GROUP BY country
-            ) m ON m.country = t.country AND m.max_year = t.year
-            WHERE {outer_where}
-            ORDER BY t.country;
-        """
-        points = _select(sql, tuple(params * 2))
-    else:
-        sql = f"""
-            SELECT country, vaccine, year, coverage
-            FROM coverage
-            WHERE {' AND '.join(where)}
-            ORDER BY country, year;
-        """
-        points = _select(sql, tuple(params))
+    return {
+        "group_by": dimension,
+        "vaccine": v,
+        "year": y,
+        "groups": sorted({r["group"] for r in rows}),
+        "count": len(rows),
+        "rows": rows,
+    }
+
+
+# ----------------------- Level 4: Rank & percentile -----------------------
+_RANK_INDEX: Dict[str, Any] = {"path": None, "generation": None, "index": None}
+
 
-    for p in points:
-        p["country_name"] = country_name(p["country"])
+def rank_index() -> RankIndex:
+    """Sorted coverage per (vaccine, year), rebuilt on the first lookup after
+    the data changes."""
+    path = read_path()
+    gen = get_watch(path).generation()
+    cached = _RANK_INDEX
+    if cached["path"] == path and cached["generation"] == gen:
+        return cached["index"]
+    cols = ("vaccine", "year", "country", "coverage")
+    data = _select_columns("SELECT vaccine, year, country, coverage FROM coverage;", (), cols)
+    index = RankIndex(zip(*(data[c] for c in cols)))
+    _RANK_INDEX.update(path=path, generation=gen, index=index)
+    return index
 
+
+def get_rank(countries: Any = None, vaccine: Optional[str] = "MMR", year: Any = None) -> Dict[str, Any]:
+    """Rank (1 = highest coverage, ties share a rank) and percentile of each
+    country among all countries with data for `vaccine` in `year`; `year`
+    defaults to the vaccine's latest. Without countries, every country in
+    that year is ranked. Raises ValueError on unknown countries."""
+    codes: List[str] = []
+    if countries:
+        codes, invalid = resolve_countries(countries)
+        if invalid:
+            raise ValueError("Unknown country code(s)/name(s): " + ", ".join(invalid))
+    v = norm_vaccine(vaccine) or "MMR"
+    index = rank_index()
+    y = _norm_year(year)
+    if y is None:
+        y = index.latest_year(v)
+    if y is None:
+        return {"vaccine": v, "year": None, "of": 0, "count": 0, "ranks": [], "missing": codes}
+
+    ranked, missing = index.rank(v, y, codes or index.countries(v, y))
+    ranked.sort(key=lambda r: (r["rank"], r["country"]))
+    for r in ranked:
+        r["country_name"] = country_name(r["country"])
     return {
         "vaccine": v,
-        "countries": cs,
-        "points": points,
-        "count": len(points),
+        "year": y,
+        "of": index.size(v, y),
+        "count": len(ranked),
+        "ranks": ranked,
+        "missing": missing,
     }
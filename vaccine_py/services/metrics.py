@@ -0,0 +1,152 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Observations are a lock, a bisect and a few additions, cheap enough to leave
+on. Values are per process: under `vaccine_py.serve` each worker reports its
+own, distinguished by the `pid` in `vaccine_process_info`.
+"""
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds; a final +Inf bucket is implied.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram; not locked itself, see its owner."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> "Histogram":
+        c = Histogram(self.buckets)
+        c.counts = list(self.counts)
+        c.sum, c.count = self.sum, self.count
+        return c
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        out, running = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            out.append(("+Inf" if bound == float("inf") else repr(bound), running))
+        return out
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_histograms(name: str, help_text: str, series: Dict[Labels, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, h in sorted(series.items()):
+        for le, n in h.cumulative():
+            lines.append(f"{name}_bucket{format_labels(labels, ('le', le))} {n}")
+        lines.append(f"{name}_sum{format_labels(labels)} {h.sum!r}")
+        lines.append(f"{name}_count{format_labels(labels)} {h.count}")
+    return lines
+
+
+def render_values(name: str, kind: str, help_text: str, series: Dict[Labels, float]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in sorted(series.items()):
+        lines.append(f"{name}{format_labels(labels)} {value!r}" if isinstance(value, float)
+                     else f"{name}{format_labels(labels)} {value}")
+    return lines
+
+
+# ---- SQL statement shapes ----
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(sql: str) -> str:
+    """`sql` with literals replaced by `?`, `IN (?, ?, ...)` collapsed and
+    whitespace squeezed, so queries differing only in values or list length
+    share one shape."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _SPACE.sub(" ", shape).strip().rstrip(";").strip()
+
+
+class StatementStats:
+    """Duration histogram, row and error counts per statement shape."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Histogram] = {}
+        self._rows: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    def observe(self, sql: str, seconds: float, rows: int, error: bool = False) -> str:
+        shape = statement_shape(sql)
+        with self._lock:
+            h = self._durations.get(shape)
+            if h is None:
+                h = self._durations[shape] = Histogram(self.buckets)
+            h.observe(seconds)
+            self._rows[shape] = self._rows.get(shape, 0) + rows
+            if error:
+                self._errors[shape] = self._errors.get(shape, 0) + 1
+        return shape
+
+    def clear(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._rows.clear()
+            self._errors.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                shape: {
+                    "count": h.count,
+                    "seconds": round(h.sum, 6),
+                    "rows": self._rows.get(shape, 0),
+                    "errors": self._errors.get(shape, 0),
+                }
+                for shape, h in self._durations.items()
+            }
+
+    def exposition(self, prefix: str = "vaccine_sql") -> List[str]:
+        with self._lock:
+            durations = {(("statement", s),): h.copy() for s, h in self._durations.items()}
+            rows = {(("statement", s),): n for s, n in self._rows.items()}
+            errors = {(("statement", s),): n for s, n in self._errors.items()}
+        lines = render_histograms(f"{prefix}_statement_duration_seconds", "SQL statement time by shape.", durations)
+        lines += render_values(f"{prefix}_rows_total", "counter", "Rows returned by SQL statement shape.", rows)
+        lines += render_values(f"{prefix}_errors_total", "counter", "Failed SQL statements by shape.", errors)
+        return lines
+
+
+def render(lines: Iterable[str]) -> str:
+    return "\n".join(lines) + "\n"
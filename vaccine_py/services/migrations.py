@@ -0,0 +1,218 @@
+"""Versioned schema migrations.
+
+    python -m vaccine_py.services.migrations status|migrate|check
+
+`database.sql` is schema version 1 (the baseline). Later changes live in
+`migrations/NNNN_<name>.sql` (or `.py` files defining `upgrade(conn)`), and
+are applied in order, each in its own `BEGIN IMMEDIATE` transaction against
+the live database. Open connections pick up the new tables and indexes on
+their next statement, so running servers need no restart or data reload.
+
+The applied version is kept in `PRAGMA user_version`, so checking that a
+database is current is a single integer read. `schema_migrations` records
+each applied file's checksum; editing an applied migration is an error.
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+BASELINE_VERSION = 1
+
+_FILENAME = re.compile(r"^(\d{4})_([A-Za-z0-9_]+)\.(sql|py)$")
+
+_CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     INTEGER PRIMARY KEY,
+        name        TEXT    NOT NULL,
+        checksum    TEXT    NOT NULL,
+        applied_at  INTEGER NOT NULL
+    );
+"""
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def checksum(self) -> str:
+        return checksum(self.path)
+
+
+def checksum(path: Path) -> str:
+    # Line endings are normalized so a CRLF checkout hashes the same.
+    data = Path(path).read_bytes().replace(b"\r\n", b"\n")
+    return hashlib.sha256(data).hexdigest()
+
+
+def discover(directory: Optional[Path]) -> List[Migration]:
+    """Migrations in `directory`, ordered by version; the listing only reads
+    file names."""
+    if directory is None or not Path(directory).is_dir():
+        return []
+    found: Dict[int, Migration] = {}
+    for path in sorted(Path(directory).iterdir()):
+        m = _FILENAME.match(path.name)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version <= BASELINE_VERSION:
+            raise MigrationError(f"{path.name}: versions up to {BASELINE_VERSION} are database.sql")
+        if version in found:
+            raise MigrationError(f"duplicate migration version {version}: {found[version].path.name}, {path.name}")
+        found[version] = Migration(version, m.group(2), path)
+    return [found[v] for v in sorted(found)]
+
+
+def latest_version(migrations: List[Migration]) -> int:
+    return migrations[-1].version if migrations else BASELINE_VERSION
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def split_statements(sql: str) -> Iterator[str]:
+    """Complete SQL statements in `sql`, trigger bodies included."""
+    buf = ""
+    for piece in re.split(r"(?<=;)", sql):
+        buf += piece
+        if sqlite3.complete_statement(buf):
+            yield buf.strip()
+            buf = ""
+    rest = "\n".join(line for line in buf.splitlines() if not line.strip().startswith("--"))
+    if rest.strip():
+        raise MigrationError(f"incomplete SQL statement: {rest.strip()[:80]!r}")
+
+
+def _run_sql(conn: sqlite3.Connection, sql: str) -> None:
+    for stmt in split_statements(sql):
+        conn.execute(stmt)
+
+
+def _run_python(conn: sqlite3.Connection, path: Path) -> None:
+    spec = importlib.util.spec_from_file_location(f"_migration_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+
+def applied(conn: sqlite3.Connection) -> Dict[int, Dict[str, object]]:
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations';"
+    ).fetchone()
+    if not exists:
+        return {}
+    rows = conn.execute("SELECT version, name, checksum, applied_at FROM schema_migrations;").fetchall()
+    return {r[0]: {"name": r[1], "checksum": r[2], "applied_at": r[3]} for r in rows}
+
+
+def verify(conn: sqlite3.Connection, baseline: Path, migrations: List[Migration]) -> List[str]:
+    """Problems with the applied history: edited or missing migration files."""
+    problems = []
+    files = {BASELINE_VERSION: Migration(BASELINE_VERSION, "baseline", Path(baseline))}
+    files.update((m.version, m) for m in migrations)
+    for version, row in sorted(applied(conn).items()):
+        m = files.get(version)
+        if m is None:
+            problems.append(f"version {version} ({row['name']}) is applied but its file is missing")
+        elif m.checksum != row["checksum"]:
+            problems.append(f"{m.path.name} changed after it was applied (version {version})")
+    return problems
+
+
+def _apply(conn: sqlite3.Connection, migration: Migration) -> bool:
+    """Apply one migration unless another process got there first."""
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        if schema_version(conn) >= migration.version:
+            conn.execute("ROLLBACK;")
+            return False
+        if migration.path.suffix == ".py":
+            _run_python(conn, migration.path)
+        else:
+            _run_sql(conn, migration.path.read_text(encoding="utf-8"))
+        _run_sql(conn, _CREATE_TABLE)
+        conn.execute(
+            "INSERT OR REPLACE INTO schema_migrations (version, name, checksum, applied_at) VALUES (?, ?, ?, ?);",
+            (migration.version, migration.name, migration.checksum, int(time.time())),
+        )
+        conn.execute(f"PRAGMA user_version = {int(migration.version)};")
+        conn.execute("COMMIT;")
+        return True
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK;")
+        raise
+
+
+def migrate(conn: sqlite3.Connection, baseline: Path, migrations: List[Migration]) -> List[int]:
+    """Bring `conn`'s database up to the newest migration; returns the
+    versions applied. A database without a version (new, or created before
+    migrations existed) first gets `baseline`, which is idempotent."""
+    isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        problems = verify(conn, baseline, migrations)
+        if problems:
+            raise MigrationError("; ".join(problems))
+        done = []
+        if schema_version(conn) < BASELINE_VERSION:
+            base = Migration(BASELINE_VERSION, "baseline", Path(baseline))
+            if _apply(conn, base):
+                done.append(BASELINE_VERSION)
+        for m in migrations:
+            if schema_version(conn) < m.version and _apply(conn, m):
+                done.append(m.version)
+        return done
+    finally:
+        conn.isolation_level = isolation
+
+
+def main(argv: List[str]) -> int:
+    try:
+        from vaccine_py.services import coverage
+    except ImportError:
+        from . import coverage
+
+    cmd = argv[0] if argv else "status"
+    if cmd not in ("status", "migrate", "check"):
+        print("usage: python -m vaccine_py.services.migrations status|migrate|check", file=sys.stderr)
+        return 2
+
+    migrations = discover(coverage.MIGRATIONS_DIR)
+    if cmd == "migrate":
+        coverage.init_db()
+
+    conn = sqlite3.connect(str(coverage.DB_PATH))
+    try:
+        current = schema_version(conn)
+        latest = latest_version(migrations)
+        print(f"{coverage.DB_PATH}: schema version {current}, latest {latest}")
+        for m in migrations:
+            if m.version > current:
+                print(f"  pending {m.path.name}")
+        problems = verify(conn, coverage.SQL_PATH, migrations)
+    finally:
+        conn.close()
+    for p in problems:
+        print(f"  error: {p}")
+    if cmd == "check" and (problems or current != latest):
+        return 1
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
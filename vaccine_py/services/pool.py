@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Pragmas applied once, when a pooled connection is opened. Read connections
+# are `query_only`, so a bug in a query path can never write to the database.
+READ_PRAGMAS: Tuple[str, ...] = (
+    "PRAGMA query_only = ON;",
+    "PRAGMA mmap_size = 268435456;",
+    "PRAGMA cache_size = -16000;",
+    "PRAGMA temp_store = MEMORY;",
+)
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of read-only SQLite connections shared across threads.
+
+    A thread that already holds a connection gets the same one back when it
+    re-enters `connection()`, so nested reads never deadlock on a full pool.
+    With `immutable=True` the file is opened `mode=ro&immutable=1`: SQLite
+    takes no locks and never checks it for changes (see services/snapshots.py).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_size: int = 8,
+        timeout: float = 5.0,
+        check_after: float = 30.0,
+        pragmas: Tuple[str, ...] = READ_PRAGMAS,
+        immutable: bool = False,
+    ) -> None:
+        self.path = Path(path)
+        self.immutable = immutable
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.check_after = check_after
+        self.pragmas = pragmas
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle: List[Tuple[sqlite3.Connection, float]] = []
+        self._size = 0
+        self._local = threading.local()
+        self._closed = False
+
+        self._opened = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+
+    # ---- connection lifecycle ----
+    def _open(self) -> sqlite3.Connection:
+        if self.immutable:
+            uri = self.path.resolve().as_uri() + "?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        self._opened += 1
+        return conn
+
+    def _healthy(self, conn: sqlite3.Connection, idle_since: float) -> bool:
+        if time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._discarded += 1
+
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout("connection pool is closed")
+            waited = False
+            while True:
+                while self._idle:
+                    conn, idle_since = self._idle.pop()
+                    if self._healthy(conn, idle_since):
+                        return self._checked_out(conn)
+                    self._size -= 1
+                    self._discard(conn)
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"no SQLite connection available within {self.timeout}s "
+                        f"(max_size={self.max_size})"
+                    )
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        try:
+            conn = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            return self._checked_out(conn)
+
+    def _checked_out(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        self._checkouts += 1
+        self._in_use += 1
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False) -> None:
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        broken = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError as exc:
+            broken = not isinstance(exc, sqlite3.OperationalError)
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn, broken=broken)
+
+    @contextmanager
+    def dedicated(self) -> Iterator[sqlite3.Connection]:
+        """A connection opened like the pooled ones but outside the pool, closed
+        on exit: for long readers such as exports, which would otherwise hold a
+        pool slot for as long as their client takes to read."""
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "path": str(self.path),
+                "immutable": self.immutable,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "opened": self._opened,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
+
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def new_pool(path: Path, immutable: bool = False) -> ConnectionPool:
+    """A pool for `path` sized by VACCINE_POOL_SIZE and VACCINE_POOL_TIMEOUT."""
+    return ConnectionPool(
+        path,
+        max_size=int(os.environ.get("VACCINE_POOL_SIZE", "8")),
+        timeout=float(os.environ.get("VACCINE_POOL_TIMEOUT", "5")),
+        immutable=immutable,
+    )
+
+
+def get_pool(path: Path) -> ConnectionPool:
+    """Process-wide read pool for `path`; rebuilt after a fork or path change."""
+    global _POOL
+    pool = _POOL
+    if pool is not None and pool.path == Path(path) and pool.pid == os.getpid():
+        return pool
+    with _POOL_LOCK:
+        pool = _POOL
+        if pool is None or pool.path != Path(path) or pool.pid != os.getpid():
+            if pool is not None and pool.pid == os.getpid():
+                pool.close()
+            pool = new_pool(path)
+            _POOL = pool
+        return pool
+
+
+def reset_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL.pid == os.getpid():
+            _POOL.close()
+        _POOL = None
@@ -0,0 +1,71 @@
+"""Rank and percentile of a country's coverage within one (vaccine, year).
+
+`RankIndex` keeps, per (vaccine, year), the coverage values sorted ascending
+in an `array('d')` plus each country's own value, so a lookup is a dict get
+and a `bisect`: O(log n) per country, with nothing sorted per request.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class RankIndex:
+    """Immutable per-(vaccine, year) sorted coverage arrays."""
+
+    def __init__(self, rows: Iterable[Tuple[str, int, str, float]]) -> None:
+        """`rows` are (vaccine, year, country, coverage) in any order."""
+        cells: Dict[Tuple[str, int], Dict[str, float]] = {}
+        for vaccine, year, country, cov in rows:
+            cells.setdefault((vaccine, year), {})[country] = cov
+        self._values: Dict[Tuple[str, int], array] = {
+            key: array("d", sorted(by_country.values())) for key, by_country in cells.items()
+        }
+        self._coverage: Dict[Tuple[str, int], Dict[str, float]] = cells
+        latest: Dict[str, int] = {}
+        for vaccine, year in cells:
+            if vaccine not in latest or year > latest[vaccine]:
+                latest[vaccine] = year
+        self._latest = latest
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def latest_year(self, vaccine: str) -> Optional[int]:
+        return self._latest.get(vaccine)
+
+    def size(self, vaccine: str, year: int) -> int:
+        values = self._values.get((vaccine, year))
+        return len(values) if values is not None else 0
+
+    def rank_value(self, vaccine: str, year: int, value: float) -> Optional[Dict[str, Any]]:
+        """Where `value` would stand: `rank` is 1 + the number of strictly
+        higher values (ties share a rank), `percentile` the share of values
+        at or below it."""
+        values = self._values.get((vaccine, year))
+        if not values:
+            return None
+        n = len(values)
+        at_or_below = bisect_right(values, value)
+        return {
+            "rank": n - at_or_below + 1,
+            "of": n,
+            "percentile": round(100.0 * at_or_below / n, 1),
+        }
+
+    def rank(self, vaccine: str, year: int, countries: Iterable[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """`(ranked, missing)` for `countries`; `missing` lists those without
+        a value in this (vaccine, year)."""
+        by_country = self._coverage.get((vaccine, year), {})
+        ranked, missing = [], []
+        for c in countries:
+            cov = by_country.get(c)
+            if cov is None:
+                missing.append(c)
+                continue
+            ranked.append(dict(self.rank_value(vaccine, year, cov), country=c, coverage=cov))
+        return ranked, missing
+
+    def countries(self, vaccine: str, year: int) -> List[str]:
+        return sorted(self._coverage.get((vaccine, year), {}))
@@ -0,0 +1,121 @@
+"""Slow-query log with the plan SQLite chose for each slow statement shape.
+
+A statement slower than the threshold is logged with its shape, parameters
+and duration. The first time a shape is slow, `EXPLAIN QUERY PLAN` is run on
+the same connection and kept with the shape, together with the tables it
+scans without an index, so full scans stand out.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List
+
+try:
+    from vaccine_py.services.metrics import statement_shape
+except ImportError:
+    from .metrics import statement_shape
+
+log = logging.getLogger("vaccine_py.slow_query")
+
+# Statements at least this slow are recorded; a negative value disables the log.
+SLOW_QUERY_MS = float(os.environ.get("VACCINE_SLOW_QUERY_MS", "100"))
+RECENT_SIZE = 200
+MAX_PARAMS = 20
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: tuple) -> List[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.row_factory = None
+    rows = cur.execute("EXPLAIN QUERY PLAN " + sql.strip().rstrip(";"), params).fetchall()
+    return [{"id": r[0], "parent": r[1], "detail": r[3]} for r in rows]
+
+
+def full_scans(plan: List[Dict[str, Any]], tables: Iterable[str]) -> List[str]:
+    """Tables read in full: `SCAN <table>` steps without an index. Scans of
+    subqueries and CTEs are not listed."""
+    tables = set(tables)
+    out = []
+    for step in plan:
+        detail = step["detail"]
+        if detail.startswith("SCAN ") and " INDEX " not in detail:
+            name = detail[5:].split(" ")[0]
+            if name in tables:
+                out.append(name)
+    return out
+
+
+def _params(params: tuple) -> list:
+    kept = list(params[:MAX_PARAMS])
+    if len(params) > MAX_PARAMS:
+        kept.append(f"... {len(params) - MAX_PARAMS} more")
+    return kept
+
+
+class SlowQueryLog:
+    """Per-shape totals and plans, plus the most recent slow statements."""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, recent: int = RECENT_SIZE) -> None:
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms >= 0
+
+    def is_slow(self, seconds: float) -> bool:
+        return self.enabled and seconds * 1000.0 >= self.threshold_ms
+
+    def record(self, conn: sqlite3.Connection, sql: str, params: tuple, seconds: float, rows: int) -> None:
+        shape = statement_shape(sql)
+        ms = round(seconds * 1000.0, 3)
+        with self._lock:
+            entry = self._shapes.get(shape)
+            first = entry is None
+            if first:
+                entry = self._shapes[shape] = {
+                    "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "first_seen": time.time(), "plan": None, "full_scans": [],
+                }
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + ms, 3)
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["last_seen"] = time.time()
+            entry["last_params"] = _params(params)
+            self._recent.append(
+                {"shape": shape, "params": _params(params), "ms": ms, "rows": rows, "at": time.time()}
+            )
+        if first:
+            # Outside the lock: the plan is captured once per shape, on the
+            # connection the statement ran on.
+            try:
+                plan = explain(conn, sql, params)
+                tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")]
+            except sqlite3.Error as exc:
+                plan, tables = [{"id": 0, "parent": 0, "detail": f"EXPLAIN failed: {exc}"}], []
+            with self._lock:
+                entry["plan"] = plan
+                entry["full_scans"] = full_scans(plan, tables)
+        log.warning("slow query %.1f ms, %d rows: %s %s", ms, rows, shape, _params(params))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self._recent.clear()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            shapes = sorted((dict(e) for e in self._shapes.values()), key=lambda e: -e["total_ms"])
+            recent = list(self._recent)[::-1]
+        return {
+            "threshold_ms": self.threshold_ms,
+            "enabled": self.enabled,
+            "shapes": shapes,
+            "recent": recent,
+        }
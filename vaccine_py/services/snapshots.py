@@ -0,0 +1,327 @@
+"""Immutable read snapshots, swapped in atomically when new data is published.
+
+In snapshot mode request handlers never read the live database. `publish()`
+copies it with SQLite's backup API into the next `coverage-<version>.db`
+beside the current one, takes it out of WAL mode and fsyncs it, then points
+`CURRENT` at it with an atomic rename. Readers open snapshots
+`mode=ro&immutable=1` (no locks, no change checks) with mmap enabled.
+
+`SnapshotSet` is one process's view of the directory. A request pins the
+snapshot that is current when it starts and reads only that one, so a swap
+affects requests that start after it. Every process holds a shared `flock`
+on each snapshot it still uses; `collect()` deletes a superseded snapshot
+once it can take that lock exclusively, i.e. when nothing uses it any more.
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # no flock: collect() falls back to keeping one old snapshot
+    fcntl = None
+
+try:
+    from vaccine_py.services.columnar import drop_engine
+    from vaccine_py.services.pool import ConnectionPool, new_pool
+    from vaccine_py.services.watch import forget_watch
+except ImportError:
+    from .columnar import drop_engine
+    from .pool import ConnectionPool, new_pool
+    from .watch import forget_watch
+
+POINTER = "CURRENT"
+PUBLISH_LOCK = ".publish.lock"
+_NAME = re.compile(r"^coverage-(\d{8})\.db$")
+
+# The snapshot pinned by the request running in this context, if any.
+_PINNED: contextvars.ContextVar[Optional[Path]] = contextvars.ContextVar("vaccine_snapshot", default=None)
+
+
+def snapshot_name(version: int) -> str:
+    return f"coverage-{version:08d}.db"
+
+
+def snapshot_version(path: Path) -> Optional[int]:
+    m = _NAME.match(Path(path).name)
+    return int(m.group(1)) if m else None
+
+
+def snapshot_files(directory: Path) -> List[Path]:
+    """Snapshot files in `directory`, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(Path(directory) / n for n in names if _NAME.match(n))
+
+
+def read_pointer(directory: Path) -> Optional[Path]:
+    """The snapshot `CURRENT` names, or None before the first publish."""
+    try:
+        name = (Path(directory) / POINTER).read_text(encoding="ascii").strip()
+    except FileNotFoundError:
+        return None
+    return Path(directory) / name if _NAME.match(name) else None
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _publish_lock(directory: Path) -> Iterator[None]:
+    fd = os.open(directory / PUBLISH_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def publish(conn: sqlite3.Connection, directory: Path) -> Path:
+    """Copy `conn`'s database into the next snapshot and make it current;
+    returns its path. Publishers are serialized on a lock file."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _publish_lock(directory):
+        latest = max((snapshot_version(p) for p in snapshot_files(directory)), default=0)
+        path = directory / snapshot_name(latest + 1)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.unlink(missing_ok=True)
+        dst = sqlite3.connect(str(tmp))
+        try:
+            conn.backup(dst)
+            # Immutable readers must not need a -wal or -shm file.
+            dst.execute("PRAGMA journal_mode = DELETE;")
+        finally:
+            dst.close()
+        _fsync(tmp)
+        os.replace(tmp, path)
+
+        pointer = directory / (POINTER + ".tmp")
+        pointer.write_text(path.name + "\n", encoding="ascii")
+        _fsync(pointer)
+        os.replace(pointer, directory / POINTER)
+        if os.name == "posix":
+            _fsync(directory)
+    return path
+
+
+def _remove_if_unused(path: Path, current: Path) -> bool:
+    if fcntl is None:
+        if snapshot_version(path) >= snapshot_version(current) - 1:
+            return False
+        path.unlink(missing_ok=True)
+        return True
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        # Unlinked while locked, so a reader blocked on the lock sees
+        # st_nlink == 0 and looks for the current snapshot instead.
+        path.unlink(missing_ok=True)
+        return True
+    finally:
+        os.close(fd)
+
+
+def collect(directory: Path) -> List[Path]:
+    """Delete superseded snapshots that no process holds, and leftovers of
+    interrupted publishes; returns the snapshots removed."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    removed = []
+    with _publish_lock(directory):
+        current = read_pointer(directory)
+        if current is None:
+            return []
+        for path in snapshot_files(directory):
+            if path != current and _remove_if_unused(path, current):
+                removed.append(path)
+        for stale in directory.glob("*.tmp"):
+            stale.unlink(missing_ok=True)
+    return removed
+
+
+class _Held:
+    __slots__ = ("fd", "pool", "pins")
+
+    def __init__(self, fd: int, pool: ConnectionPool) -> None:
+        self.fd = fd
+        self.pool = pool
+        self.pins = 0
+
+
+class SnapshotSet:
+    """The snapshots of one directory this process holds: the current one
+    plus any still pinned by a request or an open connection."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._current: Optional[Path] = None
+        self._held: Dict[Path, _Held] = {}
+        self.swaps = 0
+        self.retired = 0
+
+    def _pointer_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.directory / POINTER)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _open(self, path: Path) -> Optional[_Held]:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if os.fstat(fd).st_nlink == 0:
+                os.close(fd)
+                return None
+        return _Held(fd, new_pool(path, immutable=True))
+
+    def _refresh(self) -> None:
+        """Follow `CURRENT` if it moved; called with the lock held."""
+        stamp = self._pointer_stamp()
+        if stamp == self._stamp:
+            return
+        path = read_pointer(self.directory)
+        if path is not None and path not in self._held:
+            held = self._open(path)
+            if held is None:  # collected already: CURRENT has moved on again
+                return
+            self._held[path] = held
+        old, self._current, self._stamp = self._current, path, stamp
+        if old is not None and old != path:
+            self.swaps += 1
+            self._retire_if_unused(old)
+
+    def _retire_if_unused(self, path: Path) -> None:
+        held = self._held.get(path)
+        if held is None or held.pins or path == self._current:
+            return
+        del self._held[path]
+        held.pool.close()
+        os.close(held.fd)
+        forget_watch(path)
+        drop_engine(path)
+        self.retired += 1
+        # The last process to let go of a superseded snapshot deletes it.
+        if self._current is not None:
+            _remove_if_unused(path, self._current)
+
+    def current(self) -> Optional[Path]:
+        with self._lock:
+            self._refresh()
+            return self._current
+
+    def path(self) -> Optional[Path]:
+        """The snapshot pinned by the running request, else the current one."""
+        pinned = _PINNED.get()
+        if pinned is not None and pinned in self._held:
+            return pinned
+        return self.current()
+
+    @contextmanager
+    def held(self) -> Iterator[Optional[Path]]:
+        """`path()`, kept open for the with-block even if it is superseded."""
+        with self._lock:
+            path = _PINNED.get()
+            if path is None or path not in self._held:
+                self._refresh()
+                path = self._current
+            if path is not None:
+                self._held[path].pins += 1
+        try:
+            yield path
+        finally:
+            if path is not None:
+                with self._lock:
+                    held = self._held.get(path)
+                    if held is not None:  # None after close()
+                        held.pins -= 1
+                        self._retire_if_unused(path)
+
+    @contextmanager
+    def pinned(self) -> Iterator[Optional[Path]]:
+        """Read one snapshot for the whole with-block (a request)."""
+        with self.held() as path:
+            token = _PINNED.set(path)
+            try:
+                yield path
+            finally:
+                _PINNED.reset(token)
+
+    def pool(self, path: Path) -> ConnectionPool:
+        """The pool of a snapshot the caller holds (see `held()`)."""
+        return self._held[path].pool
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self.held() as path:
+            if path is None:
+                raise FileNotFoundError(f"no snapshot published in {self.directory}")
+            with self._held[path].pool.connection() as conn:
+                yield conn
+
+    def close(self) -> None:
+        with self._lock:
+            self._current, self._stamp = None, None
+            for path in list(self._held):
+                self._held[path].pins = 0
+                self._retire_if_unused(path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": str(self.directory),
+                "current": self._current.name if self._current else None,
+                "held": {p.name: h.pins for p, h in sorted(self._held.items())},
+                "swaps": self.swaps,
+                "retired": self.retired,
+            }
+
+
+_SETS: Dict[Tuple[int, str], SnapshotSet] = {}
+_SETS_LOCK = threading.Lock()
+
+
+def get_snapshots(directory: Path) -> SnapshotSet:
+    key = (os.getpid(), str(directory))
+    snaps = _SETS.get(key)
+    if snaps is None:
+        with _SETS_LOCK:
+            snaps = _SETS.setdefault(key, SnapshotSet(directory))
+    return snaps
+
+
+def reset_snapshots() -> None:
+    """Release every snapshot this process holds, e.g. before fork()."""
+    with _SETS_LOCK:
+        mine = [k for k in _SETS if k[0] == os.getpid()]
+        sets = [_SETS.pop(k) for k in mine]
+    for snaps in sets:
+        snaps.close()
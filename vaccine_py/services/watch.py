@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import contextvars
+import itertools
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Generations come from one process-wide counter, so a watch created after a
+# fork never reuses a number that caches inherited from the parent hold.
+_GENERATIONS = itertools.count(1)
+
+# Generations already read in this context (one request), by path; see
+# `pin_generations()`.
+_SEEN: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("vaccine_generations", default=None)
+
+
+class DataWatch:
+    """Cheap "has the coverage data changed?" probe for one database file.
+
+    Combines SQLite's `PRAGMA data_version` (bumped when another connection
+    commits) with the file's inode/mtime/size (bumped when the file itself is
+    replaced). `generation()` returns a number that increases whenever either
+    of them moves; caches compare it instead of re-reading data. Inside
+    `pin_generations()` the probe runs once per file for the whole block.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inode: Optional[int] = None
+        self._state: Optional[Tuple] = None
+        self._generation = 0
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _data_version(self, inode: Optional[int]) -> Optional[int]:
+        if inode is None:
+            return None
+        if self._conn is None or self._inode != inode:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._inode = inode
+        try:
+            return self._conn.execute("PRAGMA data_version;").fetchone()[0]
+        except sqlite3.Error:
+            self._conn.close()
+            self._conn = None
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def generation(self) -> int:
+        seen = _SEEN.get()
+        if seen is None:
+            return self._check()
+        key = str(self.path)
+        gen = seen.get(key)
+        if gen is None:
+            gen = seen[key] = self._check()
+        return gen
+
+    def _check(self) -> int:
+        with self._lock:
+            stamp = self._file_stamp()
+            state = (stamp, self._data_version(stamp[0] if stamp else None))
+            if state != self._state:
+                self._state = state
+                self._generation = next(_GENERATIONS)
+            return self._generation
+
+
+@contextmanager
+def pin_generations() -> Iterator[None]:
+    """Probe each database at most once in the with-block (a request): every
+    cache it consults sees the generation of the first read."""
+    token = _SEEN.set({})
+    try:
+        yield
+    finally:
+        _SEEN.reset(token)
+
+
+_WATCHES: Dict[Tuple[int, str], DataWatch] = {}
+_WATCHES_LOCK = threading.Lock()
+
+
+def get_watch(path: Path) -> DataWatch:
+    key = (os.getpid(), str(path))
+    watch = _WATCHES.get(key)
+    if watch is None:
+        with _WATCHES_LOCK:
+            watch = _WATCHES.setdefault(key, DataWatch(path))
+    return watch
+
+
+def forget_watch(path: Path) -> None:
+    """Drop this process's watch of `path` and close its connection."""
+    with _WATCHES_LOCK:
+        watch = _WATCHES.pop((os.getpid(), str(path)), None)
+    if watch is not None:
+        watch.close()
@@ -0,0 +1,36 @@
+import pytest
+
+from vaccine_py.services import coverage
+from vaccine_py.services.coverage import init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _database():
+    init_db()
+
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    """A private, seeded copy of the database for tests that write."""
+    path = tmp_path / "database.db"
+    monkeypatch.setattr(coverage, "DB_PATH", path)
+    init_db()
+    return path
+
+
+def _both(fn, *args, **kwargs):
+    coverage.set_backend("sql")
+    try:
+        sql = fn(*args, **kwargs)
+        coverage.set_backend("memory")
+        mem = fn(*args, **kwargs)
+    finally:
+        coverage.set_backend("sql")
+    return sql, mem
+
+
+@pytest.fixture
+def both_backends():
+    """`both_backends(fn, *args, **kwargs)` runs `fn` on the sql then the
+    memory backend and returns `(sql_result, memory_result)`."""
+    return _both
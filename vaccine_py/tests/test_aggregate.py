@@ -0,0 +1,91 @@
+import sqlite3
+import statistics
+
+import pytest
+
+from vaccine_py import app as app_module
+from vaccine_py.ingest import ingest
+from vaccine_py.services import coverage
+from vaccine_py.services.aggregates import check_coverage_rollup, rebuild_coverage_rollup
+from vaccine_py.services.alerts import get_alerts
+
+
+@pytest.fixture
+def db(tmp_db, monkeypatch):
+    monkeypatch.setattr(coverage.RESULT_CACHE, "maxsize", 0)
+    conn = sqlite3.connect(str(tmp_db))
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def test_country_meta_covers_every_named_country(db):
+    meta = {r["country"]: (r["region"], r["income_group"]) for r in db.execute("SELECT * FROM country_meta;")}
+    assert set(meta) == set(coverage.ISO_TO_NAME)
+    assert coverage.country_groups("region") == tuple(sorted({region for region, _ in meta.values()}))
+    assert coverage.country_groups("income") == tuple(sorted({income for _, income in meta.values()}))
+
+
+def test_alerts_and_rollups_share_country_meta(db):
+    with db:
+        db.execute("INSERT INTO country_meta VALUES ('PER', 'Andes', 'Upper middle income');")
+    ingest(db, [("PER", "MMR", 2023, 80.0), ("PER", "MMR", 2024, 70.0)])
+
+    (alert,) = get_alerts(threshold=0, region="andes")["alerts"]
+    assert (alert["country"], alert["region"]) == ("PER", "Andes")
+    assert coverage.get_aggregate("region", "MMR", 2024, "Andes")["rows"][0]["n"] == 1
+
+
+def test_cube_matches_a_live_group_by(db):
+    assert check_coverage_rollup(db) == []
+    europe = {r["country"] for r in db.execute("SELECT country FROM country_meta WHERE region = 'Europe';")}
+    values = [
+        r["coverage"]
+        for r in db.execute("SELECT country, coverage FROM coverage WHERE vaccine = 'MMR' AND year = 2024;")
+        if r["country"] in europe
+    ]
+    (row,) = coverage.get_aggregate("region", "MMR", 2024, "europe")["rows"]
+    assert row["n"] == len(values)
+    assert row["mean"] == round(statistics.fmean(values), 1)
+    assert row["stddev"] == round(statistics.pstdev(values), 1)
+    assert (row["min"], row["max"]) == (min(values), max(values))
+
+
+def test_ingest_refreshes_touched_vaccines(db):
+    before = coverage.get_aggregate("income", "MMR", 2024)["rows"]
+    ingest(db, [("PER", "MMR", 2024, 70.0), ("AUS", "MMR", 2024, 50.0)])
+    assert check_coverage_rollup(db) == []
+
+    after = coverage.get_aggregate("income", "MMR", 2024)
+    assert coverage.UNASSIGNED in after["groups"]
+    unassigned = next(r for r in after["rows"] if r["group"] == coverage.UNASSIGNED)
+    assert (unassigned["n"], unassigned["mean"]) == (1, 70.0)
+    assert after["rows"] != before
+
+    with db:
+        db.execute("UPDATE coverage_rollup SET n = n + 1 WHERE vaccine = 'MMR';")
+    assert check_coverage_rollup(db)
+    with db:
+        rebuild_coverage_rollup(db)
+    assert check_coverage_rollup(db) == []
+
+
+def test_unknown_dimension_or_group():
+    with pytest.raises(ValueError):
+        coverage.get_aggregate("continent")
+    with pytest.raises(ValueError):
+        coverage.get_aggregate("income", groups="Europe")
+
+
+def test_aggregate_endpoint(db):
+    c = app_module.app.test_client()
+    rv = c.get("/aggregate?group_by=income&vaccine=MMR&year=2024&groups=high%20income")
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["groups"] == ["High income"] and body["count"] == 1
+    assert body["rows"][0]["n"] > 0
+
+    assert c.get("/aggregate?vaccine=MMR").get_json()["group_by"] == "region"
+    assert c.get("/aggregate?group_by=continent").status_code == 400
+    assert c.get("/aggregate?groups=Atlantis").status_code == 400
+    assert c.get("/aggregate?year=latest").status_code == 400
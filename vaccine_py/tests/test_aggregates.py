@@ -0,0 +1,39 @@
+import sqlite3
+
+from vaccine_py.services import coverage
+from vaccine_py.services.aggregates import check_coverage_agg, rebuild_coverage_agg
+
+
+def _conn(path):
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_triggers_keep_agg_consistent(tmp_db):
+    with _conn(tmp_db) as conn:
+        assert check_coverage_agg(conn) == []
+        conn.execute("INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('AUS','MMR',2023,90.0);")
+        conn.execute("INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('NZL','MMR',2023,80.0);")
+        conn.execute("UPDATE coverage SET coverage = 50.0 WHERE country='AUS' AND vaccine='MMR' AND year=2024;")
+        conn.execute("UPDATE coverage SET year = 2022 WHERE country='GBR' AND vaccine='POL';")
+        conn.execute("DELETE FROM coverage WHERE country='NZL' AND year=2023;")
+        assert check_coverage_agg(conn) == []
+        row = conn.execute("SELECT n, avg FROM coverage_agg WHERE vaccine='MMR' AND year=2023;").fetchone()
+        assert (row["n"], row["avg"]) == (1, 90.0)
+
+
+def test_check_detects_drift_and_rebuild_fixes_it(tmp_db):
+    with _conn(tmp_db) as conn:
+        conn.execute("UPDATE coverage_agg SET avg = avg + 1 WHERE vaccine='MMR' AND year=2024;")
+        assert len(check_coverage_agg(conn)) == 1
+        rebuild_coverage_agg(conn)
+        assert check_coverage_agg(conn) == []
+
+
+def test_compare_uses_maintained_average(tmp_db):
+    with _conn(tmp_db) as conn:
+        live = conn.execute("SELECT AVG(coverage) FROM coverage WHERE vaccine='DTP3' AND year=2024;").fetchone()[0]
+    result = coverage.compare_country("AUS", 2024)
+    assert result["vaccine"] == "DTP3"
+    assert result["global_avg"] == round(live, 1)
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.ingest import ingest
+from vaccine_py.services.alerts import detect_alerts, get_alerts
+
+HISTORY = [
+    ("AUS", "MMR", 2022, 96.0),
+    ("AUS", "MMR", 2023, 93.0),
+    ("GBR", "MMR", 2023, 93.5),
+    ("KEN", "DTP3", 2023, 89.3),
+]
+
+
+@pytest.fixture
+def conn(tmp_db):
+    conn = sqlite3.connect(str(tmp_db))
+    yield conn
+    conn.close()
+
+
+def _stored(conn):
+    return sorted(conn.execute("SELECT country, vaccine, year, drop_pp FROM coverage_alerts;").fetchall())
+
+
+def test_ingest_detects_drops(conn):
+    ingest(conn, HISTORY)
+    assert _stored(conn) == [("AUS", "MMR", 2023, 3.0), ("KEN", "DTP3", 2024, 0.4)]
+
+
+def test_only_touched_series_are_rescanned(conn):
+    ingest(conn, HISTORY)
+    # A change made outside ingest is invisible until its series is touched.
+    conn.execute("UPDATE coverage SET coverage = 50 WHERE country='NZL' AND vaccine='MMR';")
+    conn.execute("INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('NZL','MMR',2023,60);")
+    conn.commit()
+    ingest(conn, [("AUS", "MMR", 2023, 97.0)])
+    assert _stored(conn) == [("AUS", "MMR", 2024, 1.9), ("KEN", "DTP3", 2024, 0.4)]
+    detect_alerts(conn, [("NZL", "MMR")])
+    assert ("NZL", "MMR", 2024, 10.0) in _stored(conn)
+
+
+def test_threshold_and_region_filters(conn):
+    ingest(conn, HISTORY)
+    assert [a["country"] for a in get_alerts(threshold=0)["alerts"]] == ["AUS", "KEN"]
+    assert [a["country"] for a in get_alerts(threshold=1)["alerts"]] == ["AUS"]
+    africa = get_alerts(threshold=0, region="africa & middle east")["alerts"]
+    assert [(a["country"], a["region"]) for a in africa] == [("KEN", "Africa & Middle East")]
+    with pytest.raises(ValueError):
+        get_alerts(region="Atlantis")
+
+
+def test_regions_come_from_country_meta(conn):
+    conn.execute("INSERT INTO country_meta VALUES ('PER', 'Andes', 'Upper middle income');")
+    conn.execute("UPDATE country_meta SET region = 'Pacific' WHERE country = 'AUS';")
+    conn.commit()
+    ingest(conn, HISTORY + [("PER", "MMR", 2023, 80.0), ("PER", "MMR", 2024, 70.0)])
+    andes = get_alerts(threshold=0, region="andes")["alerts"]
+    assert [(a["country"], a["region"]) for a in andes] == [("PER", "Andes")]
+    assert [a["country"] for a in get_alerts(threshold=0, region="Pacific")["alerts"]] == ["AUS"]
+
+
+def test_unassigned_selects_countries_without_a_region(conn):
+    ingest(conn, HISTORY + [("PER", "MMR", 2023, 80.0), ("PER", "MMR", 2024, 70.0)])
+    unassigned = get_alerts(threshold=0, region="unassigned")["alerts"]
+    assert [(a["country"], a["region"]) for a in unassigned] == [("PER", None)]
+
+
+def test_alerts_endpoint(conn):
+    ingest(conn, HISTORY)
+    c = app.test_client()
+    js = c.get("/alerts?threshold=2&region=Oceania").get_json()
+    assert js["count"] == 1
+    assert js["alerts"][0]["drop_pp"] == 3.0
+    assert c.get("/alerts?region=Mars").status_code == 400
+    assert c.get("/alerts?threshold=-1").status_code == 400
@@ -0,0 +1,40 @@
+import sqlite3
+
+from vaccine_py.bench import generate, micro
+from vaccine_py.services import coverage
+
+
+def test_generator_is_deterministic_and_exact():
+    rows = list(generate.synthetic_rows(1234, seed=7))
+    assert rows == list(generate.synthetic_rows(1234, seed=7))
+    assert rows != list(generate.synthetic_rows(1234, seed=8))
+    assert len(rows) == len({r[:3] for r in rows}) == 1234
+    assert all(0 <= r[3] <= 100 for r in rows)
+    assert generate.parse_size("1e5") == 100_000
+
+
+def test_populated_database_has_only_synthetic_rows(tmp_path):
+    path = generate.cached_database(500, directory=tmp_path)
+    with sqlite3.connect(str(path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0] == 500
+        agg = conn.execute("SELECT SUM(n) FROM coverage_agg;").fetchone()[0]
+        assert agg == 500
+    assert generate.cached_database(500, directory=tmp_path) == path
+
+
+def test_run_times_every_case_and_restores_state(tmp_path):
+    before = (coverage.DB_PATH, coverage.BACKEND, coverage.RESULT_CACHE.maxsize)
+    report = micro.run(sizes=[300], repeat=1, min_time=0, data_dir=tmp_path)
+    assert (coverage.DB_PATH, coverage.BACKEND, coverage.RESULT_CACHE.maxsize) == before
+
+    names = {name for name, _ in micro.cases(300)}
+    assert {"filter_coverage_desc", "filter_country_asc", "compare", "trends_full"} <= names
+    assert set(report["results"]) == {f"{b}/300/{n}" for b in coverage.BACKENDS for n in names}
+    assert report["results"]["sql/300/compare"]["result_size"] == 1
+
+
+def test_compare_flags_regressions_past_the_budget():
+    base = {"results": {"a": {"median_ms": 10.0}, "b": {"median_ms": 0.1}, "c": {"median_ms": 10.0}}}
+    now = {"results": {"a": {"median_ms": 14.0}, "b": {"median_ms": 0.4}, "c": {"median_ms": 11.0},
+                       "new": {"median_ms": 99.0}}}
+    assert [r["case"] for r in micro.compare(now, base, tolerance=0.25, floor_ms=0.5)] == ["a"]
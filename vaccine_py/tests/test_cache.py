@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+import pytest
+
+from vaccine_py.services import coverage
+from vaccine_py.services.cache import MISSING, ResultCache
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = ResultCache(maxsize=16, ttl=60)
+    monkeypatch.setattr(coverage, "RESULT_CACHE", cache)
+    return cache
+
+
+def test_lru_bound_and_ttl():
+    cache = ResultCache(maxsize=2, ttl=0.01)
+    cache.put("a", 1, 0)
+    cache.put("b", 2, 0)
+    assert cache.get("a", 0) == 1
+    cache.put("c", 3, 0)
+    assert cache.get("b", 0) is MISSING
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.02)
+    assert cache.get("a", 0) is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def test_resolved_parameters_share_an_entry(fresh_cache):
+    first = coverage.get_filtered_data("Australia, nzl", "mmr", 2024)
+    second = coverage.get_filtered_data("NZL,aus", "MMR", "2024")
+    assert first is second
+    coverage.compare_country("aus", 2024)
+    coverage.compare_country("Australia", "2024")
+    coverage.get_trends("MMR", ["UK", "GBR"])
+    coverage.get_trends("mmr", ["United Kingdom", "gbr"])
+    stats = fresh_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 3)
+
+
+def test_data_change_invalidates(tmp_db, fresh_cache):
+    before = coverage.compare_country("AUS", 2024)
+    with sqlite3.connect(str(tmp_db)) as conn:
+        conn.execute("UPDATE coverage SET coverage = 10 WHERE country='AUS' AND vaccine='DTP3';")
+    after = coverage.compare_country("AUS", 2024)
+    assert after["local"] == 10.0 != before["local"]
+    assert fresh_cache.stats()["invalidations"] == 1
+
+
+def test_disabled_cache_always_computes(monkeypatch):
+    monkeypatch.setattr(coverage, "RESULT_CACHE", ResultCache(maxsize=0))
+    assert coverage.get_filtered_data("AUS") is not coverage.get_filtered_data("AUS")
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from vaccine_py.services import coverage
+from vaccine_py.services.columnar import get_engine
+from vaccine_py.services.watch import get_watch, pin_generations
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(coverage, "BACKEND", "memory")
+
+
+@pytest.mark.parametrize(
+    "sort",
+    ["coverage_desc", "coverage_asc", "year_desc", "year_asc", "country_desc", "country_asc"],
+)
+def test_filter_matches_sql(sort, both_backends):
+    sql, mem = both_backends(coverage.get_filtered_data, None, "MMR", None, sort)
+    assert mem == sql
+    sql, mem = both_backends(coverage.get_filtered_data, "AUS,GBR,Japan", None, 2024, sort)
+    assert mem == sql
+
+
+def test_compare_and_trends_match_sql(both_backends):
+    sql, mem = both_backends(coverage.compare_country, "AUS", 2024)
+    assert mem == sql
+    for latest in (True, False):
+        sql, mem = both_backends(coverage.get_trends, "MMR", ["AUS", "NZL", "GBR"], latest)
+        assert mem == sql
+        sql, mem = both_backends(coverage.get_trends, None, ["AUS", "CHN"], latest)
+        assert mem == sql
+
+
+def test_snapshot_reloads_only_on_change(tmp_db, memory_backend):
+    engine = get_engine(tmp_db)
+    assert coverage.get_filtered_data("AUS", "MMR", 2024)[0]["coverage"] == 95.1
+    coverage.get_filtered_data("NZL")
+    assert engine.loads == 1
+
+    with sqlite3.connect(str(tmp_db)) as conn:
+        conn.execute("UPDATE coverage SET coverage = 80.5 WHERE country='AUS' AND vaccine='MMR';")
+    assert coverage.get_filtered_data("AUS", "MMR", 2024)[0]["coverage"] == 80.5
+    assert engine.loads == 2
+
+
+def test_generation_is_probed_once_per_request(tmp_db, memory_backend, monkeypatch):
+    watch = get_watch(tmp_db)
+    probes = []
+    check = watch._check
+    monkeypatch.setattr(watch, "_check", lambda: probes.append(1) or check())
+    with pin_generations():
+        coverage.get_filtered_data("AUS", "MMR", 2024)
+        with sqlite3.connect(str(tmp_db)) as conn:
+            conn.execute("UPDATE coverage SET coverage = 80.5 WHERE country='AUS' AND vaccine='MMR';")
+        assert coverage.get_filtered_data("AUS", "MMR", 2024)[0]["coverage"] == 95.1
+        coverage.get_trends("MMR", ["AUS"])
+    assert len(probes) == 1
+    assert coverage.get_filtered_data("AUS", "MMR", 2024)[0]["coverage"] == 80.5
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        coverage.set_backend("redis")
+    env = dict(os.environ, VACCINE_BACKEND="memroy")
+    proc = subprocess.run(
+        [sys.executable, "-c", "import vaccine_py.services.coverage"], env=env, capture_output=True, text=True
+    )
+    assert proc.returncode != 0 and "Unknown backend: 'memroy'" in proc.stderr
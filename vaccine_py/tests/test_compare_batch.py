@@ -0,0 +1,62 @@
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.services import coverage
+
+
+def test_compare_honours_vaccine():
+    c = app.test_client()
+    js = c.get("/compare.json?country=AUS&year=2024&vaccine=POL").get_json()
+    assert js["vaccine"] == "POL"
+    assert js["local"] == 95.0
+    assert coverage.compare_country("AUS", 2024, "BCG")["error"].startswith("No BCG data")
+
+
+def test_batch_matrix_matches_single_compares():
+    c = app.test_client()
+    js = c.get("/coverage/compare/batch?countries=AUS,New Zealand&vaccines=MMR,POL&years=2024,2023").get_json()
+    assert js["count"] == 2 * 2 * 2
+    by_key = {(x["country"], x["vaccine"], x["year"]): x for x in js["cells"]}
+    for code in ("AUS", "NZL"):
+        for vac in ("MMR", "POL"):
+            single = coverage.compare_country(code, 2024, vac)
+            cell = by_key[(code, vac, 2024)]
+            assert (cell["local"], cell["global_avg"]) == (single["local"], single["global_avg"])
+            assert cell["delta"] is not None
+        assert by_key[(code, "MMR", 2023)]["local"] is None
+
+
+def test_batch_defaults_to_every_country():
+    js = app.test_client().post("/coverage/compare/batch", json={"vaccines": ["MMR"], "years": [2024]}).get_json()
+    assert js["count"] == len(coverage.get_filtered_data(vaccine="MMR", year=2024))
+
+
+def test_batch_memory_backend_matches_sql(both_backends):
+    sql, mem = both_backends(coverage.compare_batch, ["AUS", "GBR", "CHN"], ["MMR", "DTP3"], [2024])
+    assert mem == sql
+
+
+@pytest.mark.parametrize("backend", ["sql", "memory"])
+@pytest.mark.parametrize("args", [([], [], []), ([], ["MMR"], []), ([], [], [2023, 2024]), (["AUS"], [], [2024])])
+def test_batch_size_is_checked_before_the_join(backend, args, monkeypatch):
+    monkeypatch.setattr(coverage, "BACKEND", backend)
+    monkeypatch.setattr(coverage.RESULT_CACHE, "maxsize", 0)
+    cells = coverage.compare_batch(*args)["count"]
+    monkeypatch.setattr(coverage, "MAX_BATCH_CELLS", cells)
+    assert coverage.compare_batch(*args)["count"] == cells
+    monkeypatch.setattr(coverage, "MAX_BATCH_CELLS", cells - 1)
+    real = coverage.select_rows
+
+    def no_join(sql, params=()):
+        assert "JOIN" not in sql
+        return real(sql, params)
+
+    monkeypatch.setattr(coverage, "select_rows", no_join)
+    monkeypatch.setattr(coverage.ColumnarSnapshot, "compare_matrix", lambda *a: pytest.fail("join ran"))
+    assert "Too many cells" in coverage.compare_batch(*args)["error"]
+
+
+def test_batch_rejects_bad_input():
+    c = app.test_client()
+    assert c.get("/coverage/compare/batch?countries=Atlantis").status_code == 400
+    assert c.get("/coverage/compare/batch?years=soon").status_code == 400
@@ -0,0 +1,54 @@
+import gzip
+import json
+import zlib
+
+from vaccine_py import compression
+from vaccine_py.app import app
+
+QUERY = "/coverage/query?country=AUS,NZL,GBR,USA,CAN,JPN"
+
+
+def test_large_json_is_gzipped_and_revalidates():
+    c = app.test_client()
+    plain = c.get(QUERY)
+    assert "Content-Encoding" not in plain.headers
+    assert len(plain.data) > compression.COMPRESS_MIN_SIZE
+
+    gz = c.get(QUERY, headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in gz.headers["Vary"]
+    assert len(gz.data) < len(plain.data)
+    assert json.loads(gzip.decompress(gz.data)) == plain.get_json()
+    assert gz.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+    again = c.get(QUERY, headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == gz.headers["ETag"]
+
+
+def test_deflate_when_gzip_is_not_accepted():
+    c = app.test_client()
+    rv = c.get(QUERY, headers={"Accept-Encoding": "deflate, gzip;q=0"})
+    assert rv.headers["Content-Encoding"] == "deflate"
+    assert json.loads(zlib.decompress(rv.data)) == c.get(QUERY).get_json()
+
+
+def test_small_responses_are_sent_as_is():
+    rv = app.test_client().get("/countries/suggest?q=zz", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in rv.headers
+    assert "Accept-Encoding" in rv.headers["Vary"]
+
+
+def test_streamed_export_is_compressed_per_chunk():
+    c = app.test_client()
+    plain = c.get("/coverage/export?format=ndjson")
+    rv = c.get("/coverage/export?format=ndjson", headers={"Accept-Encoding": "gzip"})
+    assert rv.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in rv.headers
+    assert gzip.decompress(rv.data) == plain.data
+
+
+def test_level_zero_disables_compression(monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESS_LEVEL", 0)
+    rv = app.test_client().get(QUERY, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in rv.headers
@@ -0,0 +1,73 @@
+import sqlite3
+
+from vaccine_py.app import app
+from vaccine_py.services.coverage import country_index, resolve_country
+from vaccine_py.services.countries import CountryIndex, normalize
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("  Türkiye ") == "turkiye"
+    assert normalize("U.K.") == "uk"
+    assert normalize("united   STATES") == "united states"
+
+
+def test_resolve_accepts_codes_names_and_aliases():
+    index = CountryIndex.build()
+    for token in ("gbr", "United Kingdom", "uk", "U.K.", "england"):
+        assert index.resolve(token) == "GBR"
+    assert index.resolve("turkey") == "TUR"
+    assert index.resolve("Turkiye") == "TUR"
+    assert index.resolve("XYZ") is None
+    assert index.resolve("Austr") is None
+
+
+def test_resolve_list_keeps_order_and_reports_invalid():
+    codes, invalid = CountryIndex.build().resolve_list("nz, Australia, NZL, Atlantis, ,uk")
+    assert codes == ["AUS", "NZL", "GBR"]
+    assert invalid == ["nz", "Atlantis"]
+
+
+def test_suggest_ranks_exact_then_prefix_then_word():
+    index = CountryIndex.build()
+    assert [s["code"] for s in index.suggest("aus")][:2] == ["AUS", "AUT"]
+    assert index.suggest("aus")[0]["match"] == "exact"
+    zealand = index.suggest("zeal")
+    assert zealand[0] == {"code": "NZL", "name": "New Zealand", "match": "word"}
+    assert [s["code"] for s in index.suggest("s", limit=3)] == ["SAU", "ZAF", "KOR"]
+
+
+def test_suggest_falls_back_to_trigrams_for_typos():
+    hits = CountryIndex.build().suggest("austrlia")
+    assert hits[0]["code"] == "AUS"
+    assert hits[0]["match"] == "fuzzy"
+
+
+def test_index_includes_codes_present_in_the_database(tmp_db):
+    assert resolve_country("ZZZ") is None
+    with sqlite3.connect(str(tmp_db)) as conn:
+        conn.execute("INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('ZZZ','MMR',2024,90);")
+    assert resolve_country("zzz") == "ZZZ"
+    assert "ZZZ" in country_index().codes
+
+
+def test_http_layer_accepts_service_aliases():
+    client = app.test_client()
+    res = client.get("/compare.json?country=UK&year=2024")
+    assert res.status_code == 200
+    assert res.get_json()["country_code"] == "GBR"
+
+    res = client.get("/trends?countries=uk,Vietnam&vaccine=MMR")
+    assert res.status_code == 200
+    assert {p["country"] for p in res.get_json()["points"]} <= {"GBR", "VNM"}
+
+
+def test_suggest_endpoint():
+    client = app.test_client()
+    res = client.get("/countries/suggest?q=new")
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body["suggestions"][0]["code"] == "NZL"
+    assert body["count"] == len(body["suggestions"])
+
+    assert client.get("/countries/suggest?q=").get_json()["suggestions"] == []
+    assert client.get("/countries/suggest?q=a&limit=x").status_code == 400
@@ -0,0 +1,45 @@
+import csv
+import io
+import json
+
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.services import coverage
+from vaccine_py.services.coverage import get_filtered_data, iter_filtered_rows
+
+
+def test_export_csv_streams_filtered_rows():
+    rv = app.test_client().get("/coverage/export?vaccine=MMR&sort=country_asc")
+    assert rv.status_code == 200
+    assert rv.is_streamed
+    assert rv.mimetype == "text/csv"
+    assert "attachment" in rv.headers["Content-Disposition"]
+    rows = list(csv.reader(io.StringIO(rv.get_data(as_text=True))))
+    assert rows[0] == ["country", "vaccine", "year", "coverage"]
+    expected = get_filtered_data(vaccine="MMR", sort="country_asc")
+    assert [r[0] for r in rows[1:]] == [r["country"] for r in expected]
+
+
+def test_export_ndjson():
+    rv = app.test_client().get("/coverage/export?format=ndjson&country=Australia,NZL")
+    lines = [json.loads(x) for x in rv.get_data(as_text=True).splitlines()]
+    assert {x["country"] for x in lines} == {"AUS", "NZL"}
+    assert len(lines) == 6
+
+
+def test_export_rejects_bad_input():
+    c = app.test_client()
+    assert c.get("/coverage/export?format=xml").status_code == 400
+    assert c.get("/coverage/export?country=Atlantis").status_code == 400
+
+
+@pytest.mark.parametrize("backend", ["sql", "memory"])
+def test_export_streams_in_batches_without_a_pool_slot(backend, monkeypatch):
+    monkeypatch.setattr(coverage, "BACKEND", backend)
+    monkeypatch.setattr(coverage, "EXPORT_FETCH_SIZE", 4)
+    rows = iter_filtered_rows(vaccine="MMR", sort="year_desc")
+    first = next(rows)
+    assert coverage.pool_stats()["in_use"] == 0
+    expected = get_filtered_data(vaccine="MMR", sort="year_desc")
+    assert [first, *rows] == [(r["country"], r["vaccine"], r["year"], r["coverage"]) for r in expected]
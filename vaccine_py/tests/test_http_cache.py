@@ -0,0 +1,87 @@
+import gzip
+import sqlite3
+
+from vaccine_py import vendor
+from vaccine_py.app import app
+
+
+def test_data_endpoints_revalidate_with_etag(tmp_db):
+    c = app.test_client()
+    rv = c.get("/trends?vaccine=MMR&countries=AUS,NZL")
+    etag = rv.headers["ETag"]
+    assert rv.status_code == 200
+    assert rv.headers["Cache-Control"] == "public, no-cache"
+    assert "Last-Modified" in rv.headers
+
+    again = c.get("/trends?vaccine=MMR&countries=AUS,NZL", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    other = c.get("/trends?vaccine=POL&countries=AUS,NZL", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    with sqlite3.connect(str(tmp_db)) as conn:
+        conn.execute("UPDATE coverage SET coverage = 70 WHERE country='AUS' AND vaccine='MMR';")
+    changed = c.get("/trends?vaccine=MMR&countries=AUS,NZL", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_pages_use_content_etags():
+    c = app.test_client()
+    rv = c.get("/explorer")
+    assert rv.headers["Cache-Control"] == "public, max-age=300"
+    assert c.get("/explorer", headers={"If-None-Match": rv.headers["ETag"]}).status_code == 304
+
+
+def test_errors_and_health_are_not_stored():
+    c = app.test_client()
+    assert c.get("/health").headers["Cache-Control"] == "no-store, max-age=0"
+    bad = c.get("/trends?countries=Atlantis")
+    assert bad.status_code == 400
+    assert "ETag" not in bad.headers
+    assert bad.headers["Cache-Control"] == "no-store, max-age=0"
+
+
+def test_pages_are_served_precompressed():
+    c = app.test_client()
+    plain = c.get("/trends-ui")
+    gz = c.get("/trends-ui", headers={"Accept-Encoding": "gzip, deflate"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in gz.headers["Vary"]
+    assert gzip.decompress(gz.data) == plain.data
+    assert gz.headers["ETag"] != plain.headers["ETag"]
+    assert not gz.headers["ETag"].startswith("W/")
+
+    again = c.get("/trends-ui", headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["ETag"]})
+    assert again.status_code == 304
+    refused = c.get("/trends-ui", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in refused.headers
+
+
+def test_pages_rerender_when_countries_change(tmp_db):
+    c = app.test_client()
+    assert b'"ZZZ"' not in c.get("/explorer").data
+    with sqlite3.connect(str(tmp_db)) as conn:
+        conn.execute("INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('ZZZ','MMR',2024,90);")
+    assert b'"ZZZ"' in c.get("/explorer").data
+
+
+def test_vendored_bootstrap(tmp_path, monkeypatch):
+    (tmp_path / "bootstrap.min.css").write_text("body{color:red}" * 50)
+    (tmp_path / "bootstrap.bundle.min.js").write_text("/* js */")
+    monkeypatch.setattr(vendor, "BOOTSTRAP_MODE", "local")
+    monkeypatch.setattr(vendor, "VENDOR_DIR", tmp_path)
+    c = app.test_client()
+
+    page = c.get("/compare").data.decode()
+    assert "cdn.jsdelivr.net" not in page
+    assert "/vendor/bootstrap.min.css?v=" in page
+    css = c.get("/vendor/bootstrap.min.css", headers={"Accept-Encoding": "gzip"})
+    assert css.status_code == 200
+    assert css.headers["Cache-Control"] == vendor.VENDOR_POLICY
+    assert gzip.decompress(css.data) == b"body{color:red}" * 50
+    assert c.get("/vendor/other.js").status_code == 404
+
+    monkeypatch.setattr(vendor, "VENDOR_DIR", tmp_path / "missing")
+    assert "cdn.jsdelivr.net" in c.get("/compare").data.decode()
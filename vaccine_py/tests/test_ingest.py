@@ -0,0 +1,68 @@
+import io
+import sqlite3
+
+import pytest
+
+from vaccine_py.ingest import IngestError, ingest, read_rows
+from vaccine_py.services.aggregates import check_coverage_agg
+
+CSV = """iso3,country,vaccine,year,coverage
+AUS,Australia,MMR,2023,93.7
+NZL,New Zealand,MMR,2023,95.2
+AUS,Australia,MMR,2024,91.0
+GBR,United Kingdom,MMR,2023,104
+X1,Nowhere,MMR,2023,90
+"""
+
+
+def _schema(conn):
+    return sorted(
+        r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name='coverage' AND type IN ('index','trigger');"
+        )
+    )
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_ingest_upserts_and_keeps_schema(tmp_db, bulk):
+    conn = sqlite3.connect(str(tmp_db))
+    conn.row_factory = sqlite3.Row
+    before = _schema(conn)
+    rejects = {}
+
+    stats = ingest(conn, read_rows(io.StringIO(CSV), rejects=rejects), batch_size=2, bulk=bulk)
+
+    assert stats["rows"] == 3
+    assert rejects["count"] == 2
+    assert _schema(conn) == before
+    assert check_coverage_agg(conn) == []
+    got = conn.execute(
+        "SELECT coverage FROM coverage WHERE country='AUS' AND vaccine='MMR' AND year=2024;"
+    ).fetchone()[0]
+    assert got == 91.0
+    conn.close()
+
+
+def test_ingest_rolls_back_on_error(tmp_db):
+    conn = sqlite3.connect(str(tmp_db))
+    count = conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0]
+
+    def rows():
+        yield ("AUS", "MMR", 2020, 90.0)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        ingest(conn, rows(), bulk=True)
+    assert conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0] == count
+    assert "idx_cov_country" in _schema(conn)
+    conn.close()
+
+
+def test_who_portal_headers_and_category_filter():
+    csv_text = "CODE,NAME,YEAR,ANTIGEN,COVERAGE_CATEGORY,COVERAGE\nAUS,Australia,2023,MCV1,WUENIC,94\nAUS,Australia,2023,MCV1,ADMIN,99\n"
+    assert list(read_rows(io.StringIO(csv_text))) == [("AUS", "MCV1", 2023, 94.0)]
+
+
+def test_missing_columns_rejected():
+    with pytest.raises(IngestError):
+        list(read_rows(io.StringIO("country,year\nAUS,2023\n")))
@@ -0,0 +1,73 @@
+import itertools
+import sqlite3
+
+import pytest
+
+from vaccine_py.ingest import ingest
+from vaccine_py.services import coverage
+from vaccine_py.services.aggregates import check_coverage_latest, rebuild_coverage_latest
+
+VACCINES = (None, "MMR", "POL")
+COUNTRIES = ([], ["AUS", "NZL"], ["AUS", "GBR", "USA", "BRA"])
+YEARS_FROM = (None, 2023, 2025)
+
+
+@pytest.fixture
+def db(tmp_db, monkeypatch):
+    monkeypatch.setattr(coverage.RESULT_CACHE, "maxsize", 0)
+    conn = sqlite3.connect(str(tmp_db))
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def _assert_parity():
+    for v, cs, y_from in itertools.product(VACCINES, COUNTRIES, YEARS_FROM):
+        fast = coverage.get_trends(v, cs, latest_only=True, year_from=y_from)
+        # An upper bound keeps get_trends on the original window over `coverage`.
+        full = coverage.get_trends(v, cs, latest_only=True, year_from=y_from, year_to=9999)
+        assert fast["points"] == full["points"], (v, cs, y_from)
+
+
+def test_latest_trends_match_the_full_scan(db):
+    assert check_coverage_latest(db) == []
+    _assert_parity()
+    assert any("FROM coverage_latest" in shape for shape in coverage.sql_stats())
+
+
+def test_triggers_follow_every_kind_of_change(db):
+    steps = [
+        "INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('AUS', 'MMR', 2025, 91.0);",
+        "INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('AUS', 'POL', 2019, 80.0);",
+        "INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('NZL', 'MMR', 2023, 90.0);",
+        "UPDATE coverage SET coverage = 88.8 WHERE country = 'AUS' AND vaccine = 'MMR' AND year = 2025;",
+        "UPDATE coverage SET year = 2026 WHERE country = 'NZL' AND vaccine = 'MMR' AND year = 2023;",
+        "UPDATE coverage SET vaccine = 'BCG' WHERE country = 'GBR' AND vaccine = 'POL';",
+        "DELETE FROM coverage WHERE country = 'AUS' AND vaccine = 'MMR' AND year = 2025;",
+        "DELETE FROM coverage WHERE country = 'USA';",
+    ]
+    for sql in steps:
+        with db:
+            db.execute(sql)
+        assert check_coverage_latest(db) == [], sql
+    _assert_parity()
+    row = db.execute("SELECT year, coverage FROM coverage_latest WHERE country = 'NZL' AND vaccine = 'MMR';").fetchone()
+    assert tuple(row) == (2026, 90.0)
+    assert not db.execute("SELECT 1 FROM coverage_latest WHERE country = 'USA';").fetchone()
+
+
+def test_bulk_ingest_and_backfill(db):
+    rows = [("AUS", "MMR", 2026, 97.0), ("PER", "MMR", 2024, 70.0), ("PER", "MMR", 2020, 60.0)]
+    ingest(db, rows, bulk=True)
+    assert check_coverage_latest(db) == []
+    _assert_parity()
+
+    with db:
+        db.execute("DELETE FROM coverage_latest WHERE country = 'PER';")
+        db.execute("UPDATE coverage_latest SET coverage = 1.0 WHERE country = 'AUS' AND vaccine = 'MMR';")
+    stale = {(m["country"], m["vaccine"]) for m in check_coverage_latest(db)}
+    assert stale == {("PER", "MMR"), ("AUS", "MMR")}
+    with db:
+        series = rebuild_coverage_latest(db)
+    assert series == db.execute("SELECT COUNT(*) FROM (SELECT DISTINCT country, vaccine FROM coverage);").fetchone()[0]
+    assert check_coverage_latest(db) == []
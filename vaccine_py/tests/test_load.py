@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from vaccine_py.app import app
+from vaccine_py.bench import load
+from vaccine_py.services import coverage
+
+
+def test_parse_mix():
+    assert load.parse_mix("query=3, compare") == {"query": 3.0, "compare": 1.0}
+    with pytest.raises(ValueError, match="unknown endpoint"):
+        load.parse_mix("query=1,upload=2")
+    with pytest.raises(ValueError):
+        load.parse_mix("query=0")
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert load.percentile(values, 50) == 50.0
+    assert load.percentile(values, 99) == 99.0
+    assert load.percentile([7.0], 95) == 7.0
+    assert load.percentile([], 50) is None
+
+
+def test_in_process_run_with_writer(tmp_db):
+    report = load.run(
+        load.InProcessTarget(app), tmp_db, load.parse_mix(load.DEFAULT_MIX),
+        concurrency=3, duration=30, requests=60, writers=1, checkpoint_every=0.01,
+    )
+    endpoints = report["endpoints"]
+    assert endpoints["total"]["requests"] == 60
+    assert endpoints["total"]["errors"] == 0, report["error_samples"]
+    assert sum(endpoints[n]["requests"] for n in load.ENDPOINTS if n in endpoints) == 60
+    assert endpoints["write"]["requests"] >= 1
+    total = endpoints["total"]
+    assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"] <= total["max_ms"]
+
+
+def test_http_target_against_a_server():
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        target = load.HttpTarget(f"http://127.0.0.1:{server.server_port}")
+        report = load.run(target, coverage.DB_PATH, {"compare": 1, "page": 1}, concurrency=2, requests=20)
+    finally:
+        server.shutdown()
+    assert report["endpoints"]["total"]["requests"] == 20
+    assert report["endpoints"]["total"]["error_rate"] == 0.0
+    assert set(report["endpoints"]) == {"compare", "page", "total"}
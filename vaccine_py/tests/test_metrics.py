@@ -0,0 +1,71 @@
+import re
+
+from vaccine_py.app import app
+from vaccine_py.httpmetrics import REQUEST_METRICS, RequestMetrics
+from vaccine_py.services import coverage
+from vaccine_py.services.metrics import Histogram, StatementStats, statement_shape
+
+
+def _value(text, name, **labels):
+    want = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    m = re.search(rf"^{re.escape(name)}{{{re.escape(want)}}} (\S+)$", text, re.M)
+    return float(m.group(1)) if m else None
+
+
+def test_statement_shape_ignores_values_and_list_length():
+    a = statement_shape("SELECT *  FROM coverage\n WHERE country IN (?,?,?) AND year = 2024;")
+    b = statement_shape("SELECT * FROM coverage WHERE country IN (?) AND year = 1999")
+    assert a == b == "SELECT * FROM coverage WHERE country IN (...) AND year = ?"
+    assert statement_shape("SELECT 'O''Brien', idx_cov_2 FROM t") == "SELECT ?, idx_cov_2 FROM t"
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram((0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v)
+    assert h.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert h.count == 4 and abs(h.sum - 3.65) < 1e-9
+
+
+def test_statement_stats_count_rows_and_errors():
+    stats = StatementStats()
+    stats.observe("SELECT a FROM t WHERE x IN (?, ?)", 0.002, 5)
+    shape = stats.observe("SELECT a FROM t WHERE x IN (?)", 0.004, 1)
+    stats.observe("SELECT a FROM t WHERE x IN (?)", 0.001, 0, error=True)
+    assert stats.stats()[shape] == {"count": 3, "seconds": 0.007, "rows": 6, "errors": 1}
+
+
+def test_metrics_endpoint_reports_routes_and_sql():
+    REQUEST_METRICS.clear()
+    coverage.SQL_STATS.clear()
+    coverage.RESULT_CACHE.clear()
+    c = app.test_client()
+    c.get("/coverage/query?country=AUS,NZL&vaccine=MMR")
+    c.get("/coverage/query?country=GBR&vaccine=MMR&sort=year_asc")
+    c.get("/no/such/page")
+
+    rv = c.get("/metrics")
+    assert rv.status_code == 200
+    assert rv.content_type.startswith("text/plain; version=0.0.4")
+    text = rv.get_data(as_text=True)
+    route = {"method": "GET", "route": "/coverage/query"}
+    assert _value(text, "vaccine_http_requests_total", **route, status="200") == 2
+    assert _value(text, "vaccine_http_request_duration_seconds_count", **route) == 2
+    assert _value(text, "vaccine_http_request_duration_seconds_bucket", **route, le="+Inf") == 2
+    assert _value(text, "vaccine_http_requests_in_flight", method="GET", route="/metrics") == 1
+    assert _value(text, "vaccine_http_requests_total", method="GET", route="<unmatched>", status="404") == 1
+
+    shapes = [s for s in coverage.sql_stats() if "country IN (...)" in s and "FROM coverage" in s]
+    assert len(shapes) == 2  # one per sort order, not per country list
+    assert sum(coverage.sql_stats()[s]["rows"] for s in shapes) == 3
+    assert "vaccine_sql_statement_duration_seconds_bucket{statement=" in text
+
+
+def test_errors_and_in_flight_gauge():
+    metrics = RequestMetrics()
+    metrics.start("GET", "/x")
+    metrics.start("GET", "/x")
+    metrics.finish("GET", "/x", 503, 0.01)
+    text = "\n".join(metrics.exposition())
+    assert _value(text, "vaccine_http_request_errors_total", method="GET", route="/x") == 1
+    assert _value(text, "vaccine_http_requests_in_flight", method="GET", route="/x") == 1
@@ -0,0 +1,130 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from vaccine_py.services import coverage, migrations
+from vaccine_py.services.migrations import MigrationError, discover, latest_version, migrate, schema_version
+
+# Test migrations go after the ones shipped in migrations/.
+LATEST = latest_version(discover(coverage.MIGRATIONS_DIR))
+NEXT = LATEST + 1
+
+TRIGGER = """
+CREATE TABLE coverage_audit (id INTEGER PRIMARY KEY, coverage_id INTEGER NOT NULL);
+-- a trigger body holds semicolons of its own
+CREATE TRIGGER coverage_audit_ins AFTER INSERT ON coverage BEGIN
+    INSERT INTO coverage_audit (coverage_id) VALUES (NEW.id);
+END;
+"""
+
+
+@pytest.fixture
+def mig_dir(tmp_path, monkeypatch):
+    path = tmp_path / "migrations"
+    path.mkdir()
+    for m in discover(coverage.MIGRATIONS_DIR):
+        shutil.copy(m.path, path / m.path.name)
+    monkeypatch.setattr(coverage, "MIGRATIONS_DIR", path)
+    return path
+
+
+def _name(rest, version=NEXT):
+    return f"{version:04d}_{rest}"
+
+
+def _connect(path):
+    return sqlite3.connect(str(path))
+
+
+def test_fresh_database_gets_baseline(tmp_db):
+    with _connect(tmp_db) as conn:
+        assert schema_version(conn) == LATEST
+        assert sorted(migrations.applied(conn)) == list(range(1, LATEST + 1))
+        assert conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0] > 0
+
+
+def test_legacy_database_is_adopted(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    with _connect(path) as conn:
+        conn.executescript(coverage.SQL_PATH.read_text(encoding="utf-8"))
+        rows = conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0]
+    monkeypatch.setattr(coverage, "DB_PATH", path)
+    coverage.init_db()
+    with _connect(path) as conn:
+        assert schema_version(conn) == LATEST
+        assert conn.execute("SELECT COUNT(*) FROM coverage;").fetchone()[0] == rows
+
+
+def test_current_database_is_a_version_read(tmp_db, monkeypatch):
+    monkeypatch.setattr(migrations, "_apply", lambda *a, **k: pytest.fail("nothing to apply"))
+    coverage.init_db()
+
+
+def test_sql_migration_applies_to_open_connections(tmp_db, mig_dir):
+    reader = _connect(tmp_db)
+    try:
+        (mig_dir / _name("coverage_audit.sql")).write_text(TRIGGER, encoding="utf-8")
+        coverage.init_db()
+        with coverage.get_connection() as conn:
+            conn.execute(
+                "INSERT INTO coverage (country, vaccine, year, coverage) VALUES ('AUS', 'MMR', 2030, 95.0);"
+            )
+        assert reader.execute("SELECT COUNT(*) FROM coverage_audit;").fetchone()[0] == 1
+        assert schema_version(reader) == NEXT
+    finally:
+        reader.close()
+
+
+def test_python_migration(tmp_db, mig_dir):
+    (mig_dir / _name("flags.py")).write_text(
+        "def upgrade(conn):\n"
+        "    conn.execute('CREATE TABLE flags (name TEXT PRIMARY KEY)')\n"
+        "    conn.execute(\"INSERT INTO flags VALUES ('ready')\")\n",
+        encoding="utf-8",
+    )
+    coverage.init_db()
+    with _connect(tmp_db) as conn:
+        assert conn.execute("SELECT name FROM flags;").fetchall() == [("ready",)]
+        assert migrations.applied(conn)[NEXT]["name"] == "flags"
+
+
+def test_failed_migration_rolls_back(tmp_db, mig_dir):
+    (mig_dir / _name("broken.sql")).write_text(
+        "CREATE TABLE half (id INTEGER);\nINSERT INTO missing_table VALUES (1);\n", encoding="utf-8"
+    )
+    with pytest.raises(sqlite3.OperationalError):
+        coverage.init_db()
+    with _connect(tmp_db) as conn:
+        assert schema_version(conn) == LATEST
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half';").fetchone()
+
+
+def test_edited_migration_is_refused(tmp_db, mig_dir):
+    path = mig_dir / _name("coverage_audit.sql")
+    path.write_text(TRIGGER, encoding="utf-8")
+    coverage.init_db()
+    path.write_text(TRIGGER + "\nCREATE INDEX idx_audit ON coverage_audit (coverage_id);\n", encoding="utf-8")
+    (mig_dir / _name("next.sql", NEXT + 1)).write_text("SELECT 1;\n", encoding="utf-8")
+    with pytest.raises(MigrationError, match="changed after it was applied"):
+        coverage.init_db()
+    assert migrations.main(["check"]) == 1
+
+
+def test_discover_rejects_bad_versions(tmp_path):
+    (tmp_path / "0002_a.sql").write_text("", encoding="utf-8")
+    (tmp_path / "0002_b.sql").write_text("", encoding="utf-8")
+    with pytest.raises(MigrationError, match="duplicate"):
+        discover(tmp_path)
+    for p in tmp_path.iterdir():
+        p.unlink()
+    (tmp_path / "0001_early.sql").write_text("", encoding="utf-8")
+    with pytest.raises(MigrationError, match="database.sql"):
+        discover(tmp_path)
+
+
+def test_migrate_is_idempotent(tmp_db, mig_dir):
+    (mig_dir / _name("coverage_audit.sql")).write_text(TRIGGER, encoding="utf-8")
+    with _connect(tmp_db) as conn:
+        assert migrate(conn, coverage.SQL_PATH, discover(mig_dir)) == [NEXT]
+        assert migrate(conn, coverage.SQL_PATH, discover(mig_dir)) == []
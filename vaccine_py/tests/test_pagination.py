@@ -0,0 +1,64 @@
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.services import coverage
+from vaccine_py.services.coverage import SORTS, CursorError, encode_cursor, get_filtered_data, get_filtered_page
+
+
+def _walk(backend, sort, limit):
+    coverage.set_backend(backend)
+    try:
+        rows, cursor, pages = [], None, 0
+        while True:
+            page = get_filtered_page(sort=sort, limit=limit, cursor=cursor, with_total=pages == 0)
+            rows.extend(page["rows"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if not cursor:
+                return rows, pages
+    finally:
+        coverage.set_backend("sql")
+
+
+@pytest.mark.parametrize("backend", ["sql", "memory"])
+@pytest.mark.parametrize("sort", sorted(SORTS))
+def test_pages_concatenate_to_full_result(backend, sort):
+    full = get_filtered_data(sort=sort)
+    rows, pages = _walk(backend, sort, limit=7)
+    assert rows == full
+    assert pages == -(-len(full) // 7)
+
+
+@pytest.mark.parametrize("sort, value", [("coverage_desc", 90.05), ("year_asc", 2020), ("country_desc", "JPN")])
+def test_memory_seek_matches_sql_for_any_cursor(sort, value, both_backends):
+    # A cursor need not name a row that still exists: both backends resume
+    # right after where its (value, id) would sort.
+    cursor = encode_cursor(sort, value, 0)
+    sql, memory = both_backends(get_filtered_page, sort=sort, limit=5, cursor=cursor)
+    assert memory["rows"] and memory == sql
+
+
+def test_total_is_optional():
+    page = get_filtered_page(vaccine="MMR", limit=5)
+    assert page["total"] == len(get_filtered_data(vaccine="MMR"))
+    assert "total" not in get_filtered_page(vaccine="MMR", limit=5, with_total=False)
+
+
+def test_cursor_must_match_sort():
+    cursor = get_filtered_page(limit=2, sort="coverage_desc")["next_cursor"]
+    with pytest.raises(CursorError):
+        get_filtered_page(limit=2, sort="year_asc", cursor=cursor)
+
+
+@pytest.mark.parametrize("backend", ["sql", "memory"])
+def test_query_endpoint_pages(backend, monkeypatch):
+    monkeypatch.setattr(coverage, "BACKEND", backend)
+    c = app.test_client()
+    first = c.get("/coverage/query?vaccine=MMR&limit=10&total=false").get_json()
+    assert first["count"] == 10 and "total" not in first
+    second = c.post("/coverage/query", json={"vaccine": "MMR", "limit": 10, "cursor": first["next_cursor"]}).get_json()
+    assert second["rows"][0] != first["rows"][-1]
+    assert c.get("/coverage/query?limit=10&cursor=garbage").status_code == 400
+    for sort, value in (("coverage_desc", "abc"), ("year_desc", "x"), ("country_asc", 5), ("year_asc", True)):
+        cursor = encode_cursor(sort, value, 1)
+        assert c.get(f"/coverage/query?limit=5&sort={sort}&cursor={cursor}").status_code == 400
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.services.coverage import DB_PATH
+from vaccine_py.services.pool import ConnectionPool, PoolTimeout
+
+
+def test_pool_reuses_connections():
+    pool = ConnectionPool(DB_PATH, max_size=2)
+    with pool.connection() as a:
+        pass
+    with pool.connection() as b:
+        pass
+    assert a is b
+    assert pool.stats()["opened"] == 1
+    pool.close()
+
+
+def test_pool_connections_are_read_only():
+    pool = ConnectionPool(DB_PATH, max_size=1)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("DELETE FROM coverage;")
+    pool.close()
+
+
+def test_pool_bounds_and_times_out():
+    pool = ConnectionPool(DB_PATH, max_size=1, timeout=0.05)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait(2)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(2)
+    with pytest.raises(PoolTimeout):
+        with pool.connection():
+            pass
+    release.set()
+    t.join()
+    assert pool.stats()["timeouts"] == 1
+    pool.close()
+
+
+def test_health_reports_pool_stats():
+    js = app.test_client().get("/health").get_json()
+    assert js["pool"]["max_size"] >= 1
@@ -0,0 +1,85 @@
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.services import coverage
+
+
+def _transpose(rows, keys):
+    return {k: [r[k] for r in rows] for k in keys}
+
+
+def test_fields_project_rows():
+    full = coverage.get_filtered_data(vaccine="MMR", sort="country_asc")
+    rows = coverage.get_filtered_data(vaccine="MMR", sort="country_asc", fields="coverage, country")
+    assert rows == [{"country": r["country"], "coverage": r["coverage"]} for r in full]
+    names = coverage.get_filtered_data(vaccine="MMR", sort="country_asc", fields=["country_name"])
+    assert names == [{"country_name": r["country_name"]} for r in full]
+
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ValueError, match="Unknown field"):
+        coverage.get_filtered_data(fields="country,population")
+    with pytest.raises(ValueError):
+        coverage.get_trends("MMR", ["AUS"], latest_only=True, fields="delta")
+
+
+@pytest.mark.parametrize("fields", [None, "year,coverage", "country_name,coverage"])
+def test_columns_match_rows_on_both_backends(fields, both_backends):
+    rows = coverage.get_filtered_data(vaccine="MMR", fields=fields)
+    sql, mem = both_backends(coverage.get_filtered_columns, vaccine="MMR", fields=fields)
+    assert sql == mem
+    keys = [k for k in rows[0] if k != "country_name"]
+    assert sql["columns"] == _transpose(rows, keys)
+    assert sql["count"] == len(rows)
+    if "country_name" in rows[0]:
+        assert sql["country_names"]["AUS"] == "Australia"
+        assert len(sql["country_names"]) == len({r["country_name"] for r in rows})
+    else:
+        assert "country_names" not in sql
+
+
+@pytest.mark.parametrize("backend", ["sql", "memory"])
+def test_pages_project_without_the_sort_column(backend):
+    coverage.set_backend(backend)
+    try:
+        values, cursor = [], None
+        while True:
+            page = coverage.get_filtered_page(limit=9, cursor=cursor, fields="country", columns=True)
+            assert list(page["columns"]) == ["country"]
+            values.extend(page["columns"]["country"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+    finally:
+        coverage.set_backend("sql")
+    assert values == [r["country"] for r in coverage.get_filtered_data()]
+
+
+def test_trend_series_columns(both_backends):
+    rows = coverage.get_trends("MMR", ["AUS", "NZL"], latest_only=False)
+    sql, mem = both_backends(
+        coverage.get_trends, "MMR", ["AUS", "NZL"], latest_only=False, fields="year,delta,country", columns=True
+    )
+    assert sql == mem
+    assert sql["columns"] == _transpose(rows["points"], ["country", "year", "delta"])
+    assert sql["series"] == rows["series"]
+    assert "points" not in sql
+
+
+def test_http_formats():
+    c = app.test_client()
+    js = c.get("/coverage/query?vaccine=MMR&format=columns&fields=country,coverage").get_json()
+    assert set(js) == {"count", "columns"}
+    assert len(js["columns"]["country"]) == js["count"]
+
+    page = c.post("/coverage/query", json={"limit": 5, "format": "columns"}).get_json()
+    assert len(page["columns"]["year"]) == 5 and page["next_cursor"]
+
+    latest = c.get("/trends?countries=AUS,NZL&format=columns&fields=country,country_name").get_json()
+    assert latest["columns"] == {"country": ["AUS", "NZL"]}
+    assert latest["country_names"] == {"AUS": "Australia", "NZL": "New Zealand"}
+
+    assert c.get("/coverage/query?fields=bogus").status_code == 400
+    assert c.get("/coverage/query?limit=5&fields=bogus").status_code == 400
+    assert c.get("/coverage/query?format=xml").status_code == 400
+    assert c.get("/trends?fields=delta").status_code == 400
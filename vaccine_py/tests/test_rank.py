@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from vaccine_py import app as app_module
+from vaccine_py.ingest import ingest
+from vaccine_py.services import coverage
+from vaccine_py.services.ranking import RankIndex
+
+
+@pytest.fixture
+def db(tmp_db, monkeypatch):
+    monkeypatch.setattr(coverage.RESULT_CACHE, "maxsize", 0)
+    conn = sqlite3.connect(str(tmp_db))
+    yield conn
+    conn.close()
+
+
+def test_ties_share_a_rank():
+    index = RankIndex([("MMR", 2024, c, cov) for c, cov in (("A", 90.0), ("B", 95.0), ("C", 90.0), ("D", 80.0))])
+    ranked, missing = index.rank("MMR", 2024, ["A", "B", "C", "D", "E"])
+    assert [(r["country"], r["rank"], r["percentile"]) for r in ranked] == [
+        ("A", 2, 75.0), ("B", 1, 100.0), ("C", 2, 75.0), ("D", 4, 25.0),
+    ]
+    assert missing == ["E"]
+    assert index.rank_value("MMR", 2024, 99.0)["rank"] == 1
+    assert index.rank_value("MMR", 2023, 99.0) is None
+    assert index.latest_year("MMR") == 2024 and index.latest_year("BCG") is None
+
+
+def test_rank_matches_a_sort_of_the_query_result(db):
+    rows = coverage.get_filtered_data(vaccine="MMR", year=2024)
+    result = coverage.get_rank(vaccine="MMR", year=2024)
+    assert result["of"] == result["count"] == len(rows)
+    for r in result["ranks"]:
+        higher = sum(1 for x in rows if x["coverage"] > r["coverage"])
+        assert r["rank"] == higher + 1, r
+    assert [r["rank"] for r in result["ranks"]] == sorted(r["rank"] for r in result["ranks"])
+
+
+def test_index_follows_ingest(db):
+    before = coverage.rank_index()
+    assert coverage.get_rank("AUS", "MMR", 2024)["ranks"][0]["rank"] > 1
+    ingest(db, [("AUS", "MMR", 2024, 100.0), ("PER", "MMR", 2030, 70.0)])
+    assert coverage.rank_index() is not before
+    assert coverage.get_rank("AUS", "MMR", 2024)["ranks"][0]["rank"] == 1
+    latest = coverage.get_rank("PER,AUS", "MMR")
+    assert latest["year"] == 2030 and latest["of"] == 1 and latest["missing"] == ["AUS"]
+
+
+def test_rank_endpoint(db):
+    c = app_module.app.test_client()
+    body = c.get("/coverage/rank?countries=Australia,NZL&vaccine=mmr&year=2024").get_json()
+    assert {r["country"] for r in body["ranks"]} == {"AUS", "NZL"}
+    assert body["ranks"][0]["rank"] <= body["ranks"][1]["rank"]
+    assert body["vaccine"] == "MMR" and body["ranks"][0]["country_name"]
+
+    rv = c.post("/coverage/rank", json={"countries": ["AUS"], "year": 2024})
+    assert rv.status_code == 200 and rv.get_json()["count"] == 1
+    assert c.get("/coverage/rank?countries=Atlantis").status_code == 400
+    assert c.get("/coverage/rank?year=soon").status_code == 400
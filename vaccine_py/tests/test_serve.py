@@ -0,0 +1,74 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork server needs os.fork")
+
+
+def _health(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as rv:
+        return json.load(rv)["workers"]
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.2)
+    raise AssertionError("condition not met in time")
+
+
+@pytest.fixture
+def server(tmp_path):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "vaccine_py.serve", "--workers", "2", "--port", "0",
+         "--status-file", str(tmp_path / "status.json")],
+        cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=str(ROOT)),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        line = proc.stdout.readline()
+        port = int(line.split(":")[2].split()[0])
+        yield proc, port
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait(timeout=10)
+
+
+def _ready_pids(port):
+    workers = _health(port)["all"] or []
+    pids = {w["pid"] for w in workers if w["ready"] and not w["retiring"]}
+    return pids if len(pids) == 2 else None
+
+
+def test_workers_share_the_socket_and_restart(server):
+    proc, port = server
+    pids = _wait_for(lambda: _ready_pids(port))
+    assert os.getpid() not in pids
+    assert _health(port)["self"]["pid"] in pids
+
+    proc.send_signal(signal.SIGHUP)
+    new = _wait_for(lambda: (p := _ready_pids(port)) and not (p & pids) and p)
+    assert len(new) == 2
+
+    victim = sorted(new)[0]
+    os.kill(victim, signal.SIGKILL)
+    _wait_for(lambda: (p := _ready_pids(port)) and victim not in p)
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 0
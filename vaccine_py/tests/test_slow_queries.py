@@ -0,0 +1,69 @@
+import pytest
+
+from vaccine_py import app as app_module
+from vaccine_py.services import coverage
+from vaccine_py.services.slowlog import SlowQueryLog, full_scans
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    log = SlowQueryLog(threshold_ms=0)
+    monkeypatch.setattr(coverage, "SLOW_QUERIES", log)
+    return log
+
+
+def test_first_slow_shape_gets_a_plan(log_everything):
+    coverage.select_rows("SELECT country FROM coverage WHERE coverage + 0 > ?;", (90,))
+    coverage.select_rows("SELECT country FROM coverage WHERE coverage + 0 > ?;", (50,))
+    coverage.select_rows("SELECT country FROM coverage WHERE country = ?;", ("AUS",))
+
+    shapes = {e["shape"]: e for e in coverage.slow_queries()["shapes"]}
+    scan = shapes["SELECT country FROM coverage WHERE coverage + ? > ?"]
+    assert scan["count"] == 2
+    assert scan["last_params"] == [50]
+    assert scan["full_scans"] == ["coverage"]
+    assert any(step["detail"].startswith("SCAN coverage") for step in scan["plan"])
+
+    search = shapes["SELECT country FROM coverage WHERE country = ?"]
+    assert search["full_scans"] == []
+    assert [r["params"] for r in coverage.slow_queries()["recent"]][:2] == [["AUS"], [50]]
+
+
+def test_threshold_and_disable():
+    log = SlowQueryLog(threshold_ms=50)
+    assert not log.is_slow(0.049) and log.is_slow(0.05)
+    assert not SlowQueryLog(threshold_ms=-1).is_slow(100.0)
+
+
+def test_full_scans_ignores_indexes_and_subqueries():
+    plan = [
+        {"detail": "SCAN coverage USING COVERING INDEX idx_cov_country"},
+        {"detail": "SCAN (subquery-1)"},
+        {"detail": "SCAN d"},
+        {"detail": "SCAN coverage_alerts"},
+    ]
+    assert full_scans(plan, ["coverage", "coverage_alerts"]) == ["coverage_alerts"]
+
+
+def test_diagnostics_endpoint_needs_the_token(log_everything, monkeypatch):
+    c = app_module.app.test_client()
+    assert c.get("/diagnostics/slow-queries").status_code == 404
+
+    monkeypatch.setattr(app_module, "DIAGNOSTICS_TOKEN", TOKEN)
+    rv = c.get("/diagnostics/slow-queries")
+    assert rv.status_code == 401 and rv.headers["WWW-Authenticate"].startswith("Bearer")
+    assert c.get("/diagnostics/slow-queries", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+    coverage.RESULT_CACHE.clear()
+    c.get("/trends?countries=AUS,NZL")
+    auth = {"Authorization": f"Bearer {TOKEN}"}
+    rv = c.get("/diagnostics/slow-queries", headers=auth)
+    assert rv.status_code == 200
+    report = rv.get_json()
+    assert report["threshold_ms"] == 0 and report["shapes"]
+    assert rv.headers["Cache-Control"].startswith("no-store")
+
+    assert c.delete("/diagnostics/slow-queries", headers=auth).status_code == 204
+    assert c.get("/diagnostics/slow-queries", headers=auth).get_json()["shapes"] == []
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+
+import pytest
+
+from vaccine_py import app as app_module
+from vaccine_py.ingest import ingest
+from vaccine_py.services import coverage, snapshots
+
+
+@pytest.fixture
+def snap(tmp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(coverage.RESULT_CACHE, "maxsize", 0)
+    monkeypatch.setattr(coverage, "SNAPSHOTS", True)
+    monkeypatch.setattr(coverage, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    coverage.init_db()
+    yield coverage.SNAPSHOT_DIR
+    snapshots.reset_snapshots()
+
+
+def _aus_mmr_2024():
+    rows = coverage.get_filtered_data(country="AUS", vaccine="MMR", year=2024)
+    return rows[0]["coverage"] if rows else None
+
+
+def test_reads_go_to_an_immutable_snapshot(snap):
+    first = snap / snapshots.snapshot_name(1)
+    assert snapshots.read_pointer(snap) == first
+    assert coverage.read_path() == first
+    with open(first, "rb") as fh:
+        assert fh.read(20)[18] == 1  # rollback journal, not WAL
+    assert not os.path.exists(str(first) + "-wal")
+
+    before = _aus_mmr_2024()
+    with sqlite3.connect(str(coverage.DB_PATH)) as conn:
+        conn.execute("UPDATE coverage SET coverage = 12.5 WHERE country = 'AUS' AND vaccine = 'MMR' AND year = 2024;")
+    assert _aus_mmr_2024() == before  # not published yet
+    assert coverage.pool_stats()["immutable"]
+
+    coverage.publish_snapshot()
+    assert _aus_mmr_2024() == 12.5
+    assert snapshots.snapshot_files(snap) == [snap / snapshots.snapshot_name(2)]
+
+
+def test_in_flight_requests_keep_their_snapshot(snap):
+    before = _aus_mmr_2024()
+    with coverage.pin_snapshot() as pinned:
+        with sqlite3.connect(str(coverage.DB_PATH)) as conn:
+            stats = ingest(conn, [("AUS", "MMR", 2024, 11.0)])
+        assert stats["snapshot"] == snapshots.snapshot_name(2)
+        assert coverage.read_path() == pinned and _aus_mmr_2024() == before
+        assert pinned.exists()  # held by this request, so not collected
+
+    assert _aus_mmr_2024() == 11.0
+    assert not pinned.exists()
+    assert coverage.snapshot_stats()["swaps"] == 1
+
+
+@pytest.mark.skipif(snapshots.fcntl is None, reason="needs flock")
+def test_collect_skips_snapshots_other_processes_hold(snap):
+    old = snapshots.read_pointer(snap)
+    # flock is per open file: a second descriptor stands in for another process.
+    fd = os.open(old, os.O_RDONLY)
+    snapshots.fcntl.flock(fd, snapshots.fcntl.LOCK_SH)
+    try:
+        coverage.publish_snapshot()
+        assert old.exists()
+        assert snapshots.collect(snap) == []
+    finally:
+        os.close(fd)
+    assert snapshots.collect(snap) == [old]
+
+
+def test_health_reports_snapshots(snap):
+    c = app_module.app.test_client()
+    assert c.get("/coverage/query?country=AUS&vaccine=MMR").status_code == 200
+    body = c.get("/health").get_json()
+    assert body["snapshots"]["current"] == snapshots.snapshot_name(1)
+    assert body["snapshots"]["held"] == {snapshots.snapshot_name(1): 1}  # pinned by /health itself
+    assert coverage.snapshot_stats()["held"] == {snapshots.snapshot_name(1): 0}
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from vaccine_py.app import app
+from vaccine_py.services import coverage
+
+HISTORY = [
+    ("AUS", "MMR", 2021, 96.0),
+    ("AUS", "MMR", 2022, 93.5),
+    ("AUS", "MMR", 2023, 94.0),
+    ("NZL", "MMR", 2022, 90.0),
+    ("NZL", "MMR", 2023, 91.0),
+]
+
+
+@pytest.fixture
+def history(tmp_db):
+    with sqlite3.connect(str(tmp_db)) as conn:
+        conn.executemany("INSERT INTO coverage (country, vaccine, year, coverage) VALUES (?,?,?,?);", HISTORY)
+    return tmp_db
+
+
+def test_series_deltas_and_largest_decline(history):
+    js = app.test_client().get("/trends?vaccine=MMR&countries=AUS,NZL&mode=series").get_json()
+    aus = [p for p in js["points"] if p["country"] == "AUS"]
+    assert [p["year"] for p in aus] == [2021, 2022, 2023, 2024]
+    assert [p["delta"] for p in aus] == [None, -2.5, 0.5, 1.1]
+    series = {s["country"]: s for s in js["series"]}
+    assert (series["AUS"]["largest_decline"], series["AUS"]["largest_decline_year"]) == (2.5, 2022)
+    assert series["NZL"]["largest_decline"] is None
+    assert series["NZL"]["points"] == 3
+
+
+def test_year_range_limits_series_and_latest(history):
+    js = coverage.get_trends("MMR", ["AUS"], latest_only=False, year_from=2022, year_to=2023)
+    assert [p["year"] for p in js["points"]] == [2022, 2023]
+    assert [p["delta"] for p in js["points"]] == [-2.5, 0.5]  # 2022's delta is to 2021, outside the range
+    latest = coverage.get_trends("MMR", ["AUS", "NZL"], latest_only=True, year_to=2022)
+    assert [(p["country"], p["year"]) for p in latest["points"]] == [("AUS", 2022), ("NZL", 2022)]
+
+
+def test_delta_is_null_across_a_gap(history, both_backends):
+    with sqlite3.connect(str(history)) as conn:
+        conn.execute("DELETE FROM coverage WHERE country = 'AUS' AND vaccine = 'MMR' AND year = 2022;")
+    for js in both_backends(coverage.get_trends, "MMR", ["AUS"], latest_only=False):
+        assert [(p["year"], p["delta"]) for p in js["points"]] == [(2021, None), (2023, None), (2024, 1.1)]
+
+
+@pytest.mark.parametrize("latest", [True, False])
+@pytest.mark.parametrize("year_from", [2021, 2023])
+def test_memory_backend_matches_sql(history, latest, year_from, both_backends):
+    sql, mem = both_backends(coverage.get_trends, None, ["AUS", "NZL", "GBR"], latest, year_from, None)
+    assert mem == sql
+
+
+def test_trends_rejects_bad_range():
+    c = app.test_client()
+    assert c.get("/trends?mode=weekly").status_code == 400
+    assert c.get("/trends?mode=series&year_from=2024&year_to=2020").status_code == 400
+    assert c.get("/trends?year_from=later").status_code == 400
@@ -0,0 +1,65 @@
+"""Bootstrap assets: jsDelivr CDN by default, or a vendored copy served by the app.
+
+    VACCINE_BOOTSTRAP=local  VACCINE_VENDOR_DIR=/path/to/dir
+
+The vendored directory must hold `bootstrap.min.css` and
+`bootstrap.bundle.min.js`; if either is missing the pages fall back to the CDN.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from vaccine_py.compression import Precompressed
+except ImportError:
+    from .compression import Precompressed
+
+log = logging.getLogger(__name__)
+
+BOOTSTRAP_VERSION = "5.3.3"
+BOOTSTRAP_CDN = f"https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist"
+
+BOOTSTRAP_MODES = ("cdn", "local")
+BOOTSTRAP_MODE: str = os.environ.get("VACCINE_BOOTSTRAP", "cdn").strip().lower() or "cdn"
+VENDOR_DIR = Path(os.environ.get("VACCINE_VENDOR_DIR") or Path(__file__).resolve().parent / "static" / "vendor")
+
+VENDOR_FILES: Dict[str, str] = {
+    "bootstrap.min.css": "text/css",
+    "bootstrap.bundle.min.js": "text/javascript",
+}
+# Asset URLs carry the content digest, so clients may keep them forever.
+VENDOR_POLICY = "public, max-age=31536000, immutable"
+
+_ASSETS: Dict[str, Any] = {"dir": None, "assets": None}
+
+
+def vendor_assets() -> Optional[Dict[str, Precompressed]]:
+    """Precompressed vendored files, or None when local mode is off or incomplete."""
+    if BOOTSTRAP_MODE != "local":
+        return None
+    if _ASSETS["dir"] == VENDOR_DIR:
+        return _ASSETS["assets"]
+    assets: Optional[Dict[str, Precompressed]] = {}
+    for name, mimetype in VENDOR_FILES.items():
+        path = VENDOR_DIR / name
+        if not path.is_file():
+            log.warning("VACCINE_BOOTSTRAP=local but %s is missing; using the CDN", path)
+            assets = None
+            break
+        assets[name] = Precompressed(path.read_bytes(), mimetype)
+    _ASSETS.update(dir=VENDOR_DIR, assets=assets)
+    return assets
+
+
+def bootstrap_tags() -> str:
+    assets = vendor_assets()
+    if assets:
+        css = f"/vendor/bootstrap.min.css?v={assets['bootstrap.min.css'].digest}"
+        js = f"/vendor/bootstrap.bundle.min.js?v={assets['bootstrap.bundle.min.js'].digest}"
+    else:
+        css = f"{BOOTSTRAP_CDN}/css/bootstrap.min.css"
+        js = f"{BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js"
+    return f'\n<link href="{css}" rel="stylesheet">\n<script src="{js}"></script>'